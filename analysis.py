@@ -24,7 +24,8 @@ import scipy
 from miscellaneous.decomposition import (
     decompose,
     DECOMPOSITION_METHOD_NAMES,
-    DECOMPOSITION_METHOD_LABEL
+    DECOMPOSITION_METHOD_LABEL,
+    MAXIMUM_NUMBER_OF_EXAMPLES_FOR_TSNE
 )
 
 import sklearn.metrics.cluster
@@ -35,6 +36,8 @@ import matplotlib.patches
 import matplotlib.lines
 import matplotlib.gridspec
 import matplotlib.colors
+import matplotlib.cm
+import matplotlib.animation
 from matplotlib.ticker import LogFormatterSciNotation
 from mpl_toolkits.axes_grid1 import make_axes_locatable
 
@@ -44,7 +47,13 @@ from PIL import Image
 
 from pandas import DataFrame
 
-from data import createLabelSorter, standard_deviation, sparsity
+from data import (
+    DataSet,
+    createLabelSorter, moments,
+    attachSharedDataSet,
+    exportArrayToSharedMemory, attachArrayFromSharedMemory,
+    releaseSharedArraySegments
+)
 
 import os
 import gzip
@@ -52,6 +61,13 @@ import pickle
 
 import copy
 import re
+import functools
+import traceback
+import io
+import multiprocessing
+import hashlib
+import weakref
+import collections
 
 from time import time
 from auxiliary import (
@@ -61,7 +77,9 @@ from auxiliary import (
     formatTime, formatDuration,
     normaliseString, properString, capitaliseString, subheading
 )
-from miscellaneous.prediction import PREDICTION_METHOD_NAMES
+from miscellaneous.prediction import (
+    PREDICTION_METHOD_NAMES, contingencyMatrix
+)
 
 import warnings
 
@@ -100,6 +118,10 @@ reset_plot_look()
 figure_extension = ".png"
 image_extension = ".png"
 
+video_extension = ".mp4"
+video_writer = "ffmpeg"
+video_frame_rate = 10
+
 publication_figure_extension = ".tiff"
 publication_dpi = 350
 publication_copies = {
@@ -119,16 +141,19 @@ maximum_number_of_examples_before_sampling_silhouette_score = 20000
 
 maximum_number_of_bins_for_histograms = 20000
 
+maximum_number_of_pending_figures_per_worker = 2
+minimum_size_of_shared_figure_arrays = 2**20
+
 maximum_number_of_values_for_heat_maps = 5000 * 25000
 maximum_number_of_examples_for_heat_maps = 10000
 maximum_number_of_features_for_heat_maps = 10000
 maximum_number_of_examples_for_dendrogram = 1000
+maximum_size_for_pairwise_distance_cache = 1e9 # bytes
 
-maximum_number_of_features_for_t_sne = 100
-maximum_number_of_examples_for_t_sne = 200000
-maximum_number_of_pca_components_before_tsne = 50
 
 maximum_number_of_examples_for_large_points_in_scatter_plots = 1000
+minimum_number_of_examples_for_rasterised_scatter_plots = 100000
+rasterised_scatter_plot_resolution = 500
 
 number_of_random_examples = 100
 
@@ -335,47 +360,44 @@ def analyseData(data_sets,
             
             ## Feature value standard_deviations
             
-            time_start = time()
-            
-            figure, figure_name = plotSeries(
-                series = feature_value_standard_deviations,
-                x_label = data_set.tags["feature"] + "s",
-                y_label = "{} standard deviations".format(
-                    data_set.tags["type"]),
-                sort = True,
-                scale = "log",
-                name = ["feature value standard deviations", data_set.kind]
+            figure_executor.submit(
+                functools.partial(
+                    plotSeries,
+                    series = feature_value_standard_deviations,
+                    x_label = data_set.tags["feature"] + "s",
+                    y_label = "{} standard deviations".format(
+                        data_set.tags["type"]),
+                    sort = True,
+                    scale = "log",
+                    name = ["feature value standard deviations", data_set.kind]
+                ),
+                export_options,
+                feature_value_standard_deviations_directory,
+                message = "    Feature value standard deviations plotted and saved"
             )
-            saveFigure(figure, figure_name, export_options,
-                feature_value_standard_deviations_directory)
-            
-            duration = time() - time_start
-            print("    Feature value standard deviations plotted and saved",
-                      "({}).".format(formatDuration(duration)))
             
             ## Distribution of feature value standard deviations
             
-            time_start = time()
-            
-            figure, figure_name = plotHistogram(
-                series = feature_value_standard_deviations,
-                label = "{} {} standard deviations".format(
-                    data_set.tags["feature"], data_set.tags["type"]
+            figure_executor.submit(
+                functools.partial(
+                    plotHistogram,
+                    series = feature_value_standard_deviations,
+                    label = "{} {} standard deviations".format(
+                        data_set.tags["feature"], data_set.tags["type"]
+                    ),
+                    normed = True,
+                    x_scale = "linear",
+                    y_scale = "log",
+                    name = ["feature value standard deviations", data_set.kind]
                 ),
-                normed = True,
-                x_scale = "linear",
-                y_scale = "log",
-                name = ["feature value standard deviations", data_set.kind]
+                export_options,
+                feature_value_standard_deviations_directory,
+                message = "    Feature value standard deviation distribution plotted and saved"
             )
-            saveFigure(figure, figure_name, export_options,
-                feature_value_standard_deviations_directory)
-            
-            duration = time() - time_start
-            print("    Feature value standard deviation distribution",
-                      "plotted and saved ({}).".format(
-                          formatDuration(duration)))
             
             print()
+    
+    figure_executor.wait()
 
 def analyseModel(model, run_id = None, analyses = ["default"],
     analysis_level = "normal", export_options = [],
@@ -416,44 +438,81 @@ def analyseModel(model, run_id = None, analyses = ["default"],
             run_id = run_id
         )
         
-        figure, figure_name = plotLearningCurves(learning_curves, model.type)
-        saveFigure(figure, figure_name, export_options, results_directory)
+        figure_executor.submit(
+            functools.partial(plotLearningCurves, learning_curves, model.type),
+            export_options,
+            results_directory
+        )
         
         if "video" in export_options:
-            print("Plotting learning-curve evolutions for video.")
-            for epoch in range(number_of_epochs_trained):
-                figure, figure_name = plotLearningCurves(
-                    learning_curves,
-                    model.type,
-                    epoch_slice = slice(epoch + 1),
-                    global_y_lim = "video" in export_options
-                )
-                saveFigure(figure, figure_name, export_options,
-                    os.path.join(results_directory, "learning_curve_evolution"))
+            video_time_start = time()
+            figure, figure_name = plotLearningCurves(
+                learning_curves,
+                model.type,
+                global_y_lim = True
+            )
+            saveFigureAnimation(
+                figure,
+                figure_name,
+                animateLineEvolution(figure),
+                number_of_epochs_trained,
+                os.path.join(results_directory, "learning_curve_evolution")
+            )
+            video_duration = time() - video_time_start
+            print("Learning-curve evolution exported for video ({}).".format(
+                formatDuration(video_duration)))
         
         if model.type == "SNN":
-            figure, figure_name = plotSeparateLearningCurves(learning_curves,
-                loss = "log_likelihood")
-            saveFigure(figure, figure_name, export_options, results_directory)
+            figure_executor.submit(
+                functools.partial(
+                    plotSeparateLearningCurves,
+                    learning_curves,
+                    loss = "log_likelihood"
+                ),
+                export_options,
+                results_directory
+            )
         elif "VAE" in model.type:
-            figure, figure_name = plotSeparateLearningCurves(learning_curves,
-                loss = ["lower_bound", "reconstruction_error"])
-            saveFigure(figure, figure_name, export_options, results_directory)
-            if model.type in ["GMVAE"]:
-                figure, figure_name = plotSeparateLearningCurves(learning_curves,
-                    loss = "kl_divergence_z")
-                saveFigure(figure, figure_name, export_options,
-                    results_directory)
-                figure, figure_name = plotSeparateLearningCurves(
+            figure_executor.submit(
+                functools.partial(
+                    plotSeparateLearningCurves,
                     learning_curves,
-                    loss = "kl_divergence_y"
+                    loss = ["lower_bound", "reconstruction_error"]
+                ),
+                export_options,
+                results_directory
+            )
+            if model.type in ["GMVAE"]:
+                figure_executor.submit(
+                    functools.partial(
+                        plotSeparateLearningCurves,
+                        learning_curves,
+                        loss = "kl_divergence_z"
+                    ),
+                    export_options,
+                    results_directory
+                )
+                figure_executor.submit(
+                    functools.partial(
+                        plotSeparateLearningCurves,
+                        learning_curves,
+                        loss = "kl_divergence_y"
+                    ),
+                    export_options,
+                    results_directory
                 )
-                saveFigure(figure, figure_name, export_options, results_directory)
             else:
-                figure, figure_name = plotSeparateLearningCurves(learning_curves,
-                    loss = "kl_divergence")
-                saveFigure(figure, figure_name, export_options, results_directory)
+                figure_executor.submit(
+                    functools.partial(
+                        plotSeparateLearningCurves,
+                        learning_curves,
+                        loss = "kl_divergence"
+                    ),
+                    export_options,
+                    results_directory
+                )
     
+        figure_executor.wait()
         learning_curves_duration = time() - learning_curves_time_start
         print("Learning curves plotted and saved ({}).".format(
             formatDuration(learning_curves_duration)))
@@ -478,8 +537,11 @@ def analyseModel(model, run_id = None, analyses = ["default"],
             
             print("Plotting accuracies.")
             
-            figure, figure_name = plotAccuracies(accuracies)
-            saveFigure(figure, figure_name, export_options, results_directory)
+            figure_executor.submit(
+                functools.partial(plotAccuracies, accuracies),
+                export_options,
+                results_directory
+            )
             
             superset_accuracies = loadAccuracies(
                 model = model,
@@ -489,10 +551,17 @@ def analyseModel(model, run_id = None, analyses = ["default"],
             )
             
             if superset_accuracies is not None:
-                figure, figure_name = plotAccuracies(superset_accuracies,
-                    name = "superset")
-                saveFigure(figure, figure_name, export_options, results_directory)
+                figure_executor.submit(
+                    functools.partial(
+                        plotAccuracies,
+                        superset_accuracies,
+                        name = "superset"
+                    ),
+                    export_options,
+                    results_directory
+                )
             
+            figure_executor.wait()
             accuracies_duration = time() - accuracies_time_start
             print("Accuracies plotted and saved ({}).".format(
                 formatDuration(accuracies_duration)))
@@ -513,9 +582,13 @@ def analyseModel(model, run_id = None, analyses = ["default"],
         KL_neurons = numpy.sort(KL_neurons, axis = 1)
         log_KL_neurons = numpy.log(KL_neurons)
         
-        figure, figure_name = plotKLDivergenceEvolution(KL_neurons)
-        saveFigure(figure, figure_name, export_options, results_directory)
+        figure_executor.submit(
+            functools.partial(plotKLDivergenceEvolution, KL_neurons),
+            export_options,
+            results_directory
+        )
         
+        figure_executor.wait()
         heat_map_duration = time() - heat_map_time_start
         print("Heat map plotted and saved ({}).".format(
             formatDuration(heat_map_duration)))
@@ -568,18 +641,34 @@ def analyseModel(model, run_id = None, analyses = ["default"],
                 centroid_means_decomposed = \
                     distribution_centroids_decomposed["means"]
                 
-                figure, figure_name = plotEvolutionOfCentroidProbabilities(
-                    centroid_probabilities, distribution)
-                saveFigure(figure, figure_name, export_options, centroids_directory)
+                figure_executor.submit(
+                    functools.partial(
+                        plotEvolutionOfCentroidProbabilities,
+                        centroid_probabilities, distribution
+                    ),
+                    export_options,
+                    centroids_directory
+                )
                 
-                figure, figure_name = plotEvolutionOfCentroidMeans(
-                    centroid_means_decomposed, distribution, decomposed)
-                saveFigure(figure, figure_name, export_options, centroids_directory)
+                figure_executor.submit(
+                    functools.partial(
+                        plotEvolutionOfCentroidMeans,
+                        centroid_means_decomposed, distribution, decomposed
+                    ),
+                    export_options,
+                    centroids_directory
+                )
                 
-                figure, figure_name = plotEvolutionOfCentroidCovarianceMatrices(
-                    centroid_covariance_matrices, distribution)
-                saveFigure(figure, figure_name, export_options, centroids_directory)
+                figure_executor.submit(
+                    functools.partial(
+                        plotEvolutionOfCentroidCovarianceMatrices,
+                        centroid_covariance_matrices, distribution
+                    ),
+                    export_options,
+                    centroids_directory
+                )
                 
+                figure_executor.wait()
                 centroids_duration = time() - centroids_time_start
                 print("Evolution of latent {} parameters plotted and saved ({})"\
                     .format(distribution, formatDuration(centroids_duration)))
@@ -587,27 +676,35 @@ def analyseModel(model, run_id = None, analyses = ["default"],
                 print()
 
         if "video" in export_options:
-            print("Plotting evolution of latent class probabilities for video")
-            centroid_prior_probabilities = centroids["prior"]["probabilities"]
-            centroid_posterior_probabilities = centroids["posterior"]["probabilities"]
-            for i in range(number_of_epochs_trained):
-                figure, figure_name = plotEvolutionOfCentroidProbabilities(
-                    centroid_prior_probabilities[:(i+1), :],
-                    distribution = "prior",
-                    figure = None,
-                    linestyle = "dashed",
-                    name = ["epoch", i]
-                )                
-                figure, figure_name = plotEvolutionOfCentroidProbabilities(
-                    centroid_posterior_probabilities[:(i+1), :],
-                    distribution = "posterior",
-                    figure = figure,
-                    linestyle = "solid",
-                    name = ["epoch", i]
-                )
-                saveFigure(figure, figure_name, export_options, centroids_directory)
-
+            video_time_start = time()
+            figure, figure_name = plotEvolutionOfCentroidProbabilities(
+                centroids["prior"]["probabilities"],
+                distribution = "prior",
+                figure = None,
+                linestyle = "dashed",
+                name = "video"
+            )
+            figure, figure_name = plotEvolutionOfCentroidProbabilities(
+                centroids["posterior"]["probabilities"],
+                distribution = "posterior",
+                figure = figure,
+                linestyle = "solid",
+                name = "video"
+            )
+            saveFigureAnimation(
+                figure,
+                figure_name,
+                animateLineEvolution(figure),
+                number_of_epochs_trained,
+                centroids_directory
+            )
+            video_duration = time() - video_time_start
+            print("Evolution of latent class probabilities exported for video "
+                "({}).".format(formatDuration(video_duration)))
+            
             print()
+    
+    figure_executor.wait()
 
 def analyseIntermediateResults(learning_curves = None, epoch_start = None,
     epoch = None, latent_values = None, data_set = None, label_mask = None, 
@@ -1170,45 +1267,51 @@ def analyseResults(evaluation_set, reconstructed_evaluation_set,
                     else:
                         sort_name_part = "unsorted"
                     example_name_parts.append(sort_name_part)
-                    figure, figure_name = plotProfileComparison(
-                        observed_series,
-                        expected_series,
-                        expected_series_total_standard_deviations,
-                        expected_series_explained_standard_deviations,
-                        x_name = evaluation_set.tags["feature"],
-                        y_name = evaluation_set.tags["value"],
-                        sort = sort_profile_comparison,
-                        sort_by = "expected",
-                        sort_direction = "descending",
-                        x_scale = "log",
-                        y_scale = y_scale,
-                        name = example_name_parts
+                    figure_executor.submit(
+                        functools.partial(
+                            plotProfileComparison,
+                            observed_series,
+                            expected_series,
+                            expected_series_total_standard_deviations,
+                            expected_series_explained_standard_deviations,
+                            x_name = evaluation_set.tags["feature"],
+                            y_name = evaluation_set.tags["value"],
+                            sort = sort_profile_comparison,
+                            sort_by = "expected",
+                            sort_direction = "descending",
+                            x_scale = "log",
+                            y_scale = y_scale,
+                            name = example_name_parts
+                        ),
+                        export_options,
+                        profile_comparisons_directory
                     )
-                    saveFigure(figure, figure_name, export_options,
-                        profile_comparisons_directory)
             
             if maximum_count > 3 * y_cutoff:
                 for y_scale in ["linear", "log", "both"]:
                     example_name_parts = example_name_base_parts.copy()
                     example_name_parts.append("cutoff")
                     example_name_parts.append(y_scale)
-                    figure, figure_name = plotProfileComparison(
-                        observed_series,
-                        expected_series,
-                        expected_series_total_standard_deviations,
-                        expected_series_explained_standard_deviations,
-                        x_name = evaluation_set.tags["feature"],
-                        y_name = evaluation_set.tags["value"],
-                        sort = True,
-                        sort_by = "expected",
-                        sort_direction = "descending",
-                        x_scale = "log",
-                        y_scale = y_scale,
-                        y_cutoff = y_cutoff,
-                        name = example_name_parts
+                    figure_executor.submit(
+                        functools.partial(
+                            plotProfileComparison,
+                            observed_series,
+                            expected_series,
+                            expected_series_total_standard_deviations,
+                            expected_series_explained_standard_deviations,
+                            x_name = evaluation_set.tags["feature"],
+                            y_name = evaluation_set.tags["value"],
+                            sort = True,
+                            sort_by = "expected",
+                            sort_direction = "descending",
+                            x_scale = "log",
+                            y_scale = y_scale,
+                            y_cutoff = y_cutoff,
+                            name = example_name_parts
+                        ),
+                        export_options,
+                        profile_comparisons_directory
                     )
-                    saveFigure(figure, figure_name, export_options,
-                        profile_comparisons_directory)
             
             # Plot image examples for subset
             if evaluation_set.example_type == "images":
@@ -1326,43 +1429,41 @@ def analyseResults(evaluation_set, reconstructed_evaluation_set,
             
             ## Differences
         
-            heat_maps_time_start = time()
-            
-            figure, figure_name = plotHeatMap(
-                x_diff,
-                labels = reconstructed_evaluation_set.labels,
-                x_name = evaluation_set.tags["feature"].capitalize() + "s",
-                y_name = evaluation_set.tags["example"].capitalize() + "s",
-                z_name = "Differences",
-                z_symbol = "\\tilde{{x}} - x",
-                name = "difference",
-                center = 0
+            figure_executor.submit(
+                functools.partial(
+                    plotHeatMap,
+                    x_diff,
+                    labels = reconstructed_evaluation_set.labels,
+                    x_name = evaluation_set.tags["feature"].capitalize() + "s",
+                    y_name = evaluation_set.tags["example"].capitalize() + "s",
+                    z_name = "Differences",
+                    z_symbol = "\\tilde{{x}} - x",
+                    name = "difference",
+                    center = 0
+                ),
+                export_options,
+                heat_maps_directory,
+                message = "    Difference heat map plotted and saved"
             )
-            saveFigure(figure, figure_name, export_options, heat_maps_directory)
-            
-            heat_maps_duration = time() - heat_maps_time_start
-            print("    Difference heat map plotted and saved ({})." \
-                .format(formatDuration(heat_maps_duration)))
             
             ## log-ratios
             
-            heat_maps_time_start = time()
-            
-            figure, figure_name = plotHeatMap(
-                x_log_ratio,
-                labels = reconstructed_evaluation_set.labels,
-                x_name = evaluation_set.tags["feature"].capitalize() + "s",
-                y_name = evaluation_set.tags["example"].capitalize() + "s",
-                z_name = "log-ratios",
-                z_symbol = "\\log \\frac{{\\tilde{{x}} + 1}}{{x + 1}}",
-                name = "log_ratio",
-                center = 0
+            figure_executor.submit(
+                functools.partial(
+                    plotHeatMap,
+                    x_log_ratio,
+                    labels = reconstructed_evaluation_set.labels,
+                    x_name = evaluation_set.tags["feature"].capitalize() + "s",
+                    y_name = evaluation_set.tags["example"].capitalize() + "s",
+                    z_name = "log-ratios",
+                    z_symbol = "\\log \\frac{{\\tilde{{x}} + 1}}{{x + 1}}",
+                    name = "log_ratio",
+                    center = 0
+                ),
+                export_options,
+                heat_maps_directory,
+                message = "    log-ratio heat map plotted and saved"
             )
-            saveFigure(figure, figure_name, export_options, heat_maps_directory)
-            
-            heat_maps_duration = time() - heat_maps_time_start
-            print("    log-ratio heat map plotted and saved ({})." \
-                .format(formatDuration(heat_maps_duration)))
     
     print()
     
@@ -1449,15 +1550,19 @@ def analyseResults(evaluation_set, reconstructed_evaluation_set,
             correlations_time_start = time()
             
             latent_evaluation_set = latent_evaluation_sets[set_name]
-            figure, figure_name = plotVariableCorrelations(
-                latent_evaluation_set.values,
-                latent_evaluation_set.feature_names,
-                latent_evaluation_set,
-                name = ["latent correlations", set_name]
+            figure_executor.submit(
+                functools.partial(
+                    plotVariableCorrelations,
+                    latent_evaluation_set.values,
+                    latent_evaluation_set.feature_names,
+                    latent_evaluation_set,
+                    name = ["latent correlations", set_name]
+                ),
+                export_options,
+                correlations_directory
             )
-            saveFigure(figure, figure_name, export_options,
-                correlations_directory)
             
+            figure_executor.wait()
             correlations_duration = time() - correlations_time_start
             print("    Latent correlations for {} plotted ({}).".format(
                 set_name,
@@ -1465,6 +1570,8 @@ def analyseResults(evaluation_set, reconstructed_evaluation_set,
             ))
         
         print()
+    
+    figure_executor.wait()
 
 def analyseDistributions(data_set, colouring_data_set = None,
     cutoffs = None, preprocessed = False, original_maximum_count = None,
@@ -1519,41 +1626,39 @@ def analyseDistributions(data_set, colouring_data_set = None,
     if data_set.number_of_classes and data_set.number_of_classes < 100 \
         and colouring_data_set == data_set:
         
-        distribution_time_start = time()
-        
-        figure, figure_name = plotClassHistogram(
-            labels = data_set.labels,
-            class_names = data_set.class_names,
-            class_palette = data_set.class_palette,
-            normed = True,
-            scale = "linear",
-            label_sorter = data_set.label_sorter,
-            name = data_set_name
+        figure_executor.submit(
+            functools.partial(
+                plotClassHistogram,
+                labels = data_set.labels,
+                class_names = data_set.class_names,
+                class_palette = data_set.class_palette,
+                normed = True,
+                scale = "linear",
+                label_sorter = data_set.label_sorter,
+                name = data_set_name
+            ),
+            export_options,
+            distribution_directory,
+            message = "    Class distribution plotted and saved"
         )
-        saveFigure(figure, figure_name, export_options, distribution_directory)
-        
-        distribution_duration = time() - distribution_time_start
-        print("    Class distribution plotted and saved ({})."\
-            .format(formatDuration(distribution_duration)))
     
     if data_set.label_superset and colouring_data_set == data_set:
         
-        distribution_time_start = time()
-        
-        figure, figure_name = plotClassHistogram(
-            labels = data_set.superset_labels,
-            class_names = data_set.superset_class_names,
-            class_palette = data_set.superset_class_palette,
-            normed = True,
-            scale = "linear",
-            label_sorter = data_set.superset_label_sorter,
-            name = [data_set_name, "superset"]
+        figure_executor.submit(
+            functools.partial(
+                plotClassHistogram,
+                labels = data_set.superset_labels,
+                class_names = data_set.superset_class_names,
+                class_palette = data_set.superset_class_palette,
+                normed = True,
+                scale = "linear",
+                label_sorter = data_set.superset_label_sorter,
+                name = [data_set_name, "superset"]
+            ),
+            export_options,
+            distribution_directory,
+            message = "    Superset class distribution plotted and saved"
         )
-        saveFigure(figure, figure_name, export_options, distribution_directory)
-        
-        distribution_duration = time() - distribution_time_start
-        print("    Superset class distribution plotted and saved ({})."\
-            .format(formatDuration(distribution_duration)))
     
     ## Count distribution
     
@@ -1579,19 +1684,22 @@ def analyseDistributions(data_set, colouring_data_set = None,
             count_histogram_name = ["counts", data_set_name]
         
         for x_scale in ["linear", "log"]:
-            figure, figure_name = plotHistogram(
-                series = series,
-                excess_zero_count = excess_zero_count,
-                label = data_set.tags["value"].capitalize() + "s",
-                discrete = data_set_discreteness,
-                normed = True,
-                x_scale = x_scale,
-                y_scale = "log",
-                maximum_count = maximum_count,
-                name = count_histogram_name
+            figure_executor.submit(
+                functools.partial(
+                    plotHistogram,
+                    series = series,
+                    excess_zero_count = excess_zero_count,
+                    label = data_set.tags["value"].capitalize() + "s",
+                    discrete = data_set_discreteness,
+                    normed = True,
+                    x_scale = x_scale,
+                    y_scale = "log",
+                    maximum_count = maximum_count,
+                    name = count_histogram_name
+                ),
+                export_options,
+                distribution_directory
             )
-            saveFigure(figure, figure_name, export_options,
-                distribution_directory)
         
         if maximum_count:
             maximum_count_string = " (with a maximum count of {:d})".format(
@@ -1599,6 +1707,7 @@ def analyseDistributions(data_set, colouring_data_set = None,
         else:
             maximum_count_string = ""
         
+        figure_executor.wait()
         distribution_duration = time() - distribution_time_start
         print("    Count distribution{} plotted and saved ({})."\
             .format(maximum_count_string,
@@ -1612,39 +1721,42 @@ def analyseDistributions(data_set, colouring_data_set = None,
         distribution_time_start = time()
 
         for cutoff in cutoffs:
-            figure, figure_name = plotCutOffCountHistogram(
-                series = series,
-                excess_zero_count = excess_zero_count,
-                cutoff = cutoff,
-                normed = True,
-                scale = "log",
-                name = data_set_name
+            figure_executor.submit(
+                functools.partial(
+                    plotCutOffCountHistogram,
+                    series = series,
+                    excess_zero_count = excess_zero_count,
+                    cutoff = cutoff,
+                    normed = True,
+                    scale = "log",
+                    name = data_set_name
+                ),
+                export_options,
+                distribution_directory + "-counts"
             )
-            saveFigure(figure, figure_name, export_options,
-                distribution_directory + "-counts")
 
+        figure_executor.wait()
         distribution_duration = time() - distribution_time_start
         print("    Count distributions with cut-offs plotted and saved ({})."\
             .format(formatDuration(distribution_duration)))
     
     ## Count sum distribution
     
-    distribution_time_start = time()
-    
-    figure, figure_name = plotHistogram(
-        series = data_set.count_sum,
-        label = "Total number of {}s per {}".format(
-            data_set.tags["item"], data_set.tags["example"]
+    figure_executor.submit(
+        functools.partial(
+            plotHistogram,
+            series = data_set.count_sum,
+            label = "Total number of {}s per {}".format(
+                data_set.tags["item"], data_set.tags["example"]
+            ),
+            normed = True,
+            y_scale = "log",
+            name = ["count sum", data_set_name]
         ),
-        normed = True,
-        y_scale = "log",
-        name = ["count sum", data_set_name]
+        export_options,
+        distribution_directory,
+        message = "    Count sum distribution plotted and saved"
     )
-    saveFigure(figure, figure_name, export_options, distribution_directory)
-    
-    distribution_duration = time() - distribution_time_start
-    print("    Count sum distribution plotted and saved ({})."\
-        .format(formatDuration(distribution_duration)))
     
     ## Count distributions and count sum distributions for each class
     
@@ -1692,19 +1804,23 @@ def analyseDistributions(data_set, colouring_data_set = None,
                 series = data_set.values.reshape(-1)
                 excess_zero_count = 0
             
-            figure, figure_name = plotHistogram(
-                series = series,
-                excess_zero_count = excess_zero_count,
-                label = data_set.tags["value"].capitalize() + "s",
-                discrete = data_set_discreteness,
-                normed = True,
-                y_scale = "log",
-                colour = class_palette[class_name],
-                name = ["counts", data_set_name, "class", class_name]
+            figure_executor.submit(
+                functools.partial(
+                    plotHistogram,
+                    series = series,
+                    excess_zero_count = excess_zero_count,
+                    label = data_set.tags["value"].capitalize() + "s",
+                    discrete = data_set_discreteness,
+                    normed = True,
+                    y_scale = "log",
+                    colour = class_palette[class_name],
+                    name = ["counts", data_set_name, "class", class_name]
+                ),
+                export_options,
+                class_count_distribution_directory
             )
-            saveFigure(figure, figure_name, export_options,
-                class_count_distribution_directory)
     
+        figure_executor.wait()
         distribution_duration = time() - distribution_time_start
         print("    Count distributions for each class plotted and saved ({})."\
             .format(formatDuration(distribution_duration)))
@@ -1715,24 +1831,30 @@ def analyseDistributions(data_set, colouring_data_set = None,
             class_indices = labels == class_name
             if not class_indices.any():
                 continue
-            figure, figure_name = plotHistogram(
-                series = data_set.count_sum[class_indices],
-                label = "Total number of {}s per {}".format(
-                    data_set.tags["item"], data_set.tags["example"]
+            figure_executor.submit(
+                functools.partial(
+                    plotHistogram,
+                    series = data_set.count_sum[class_indices],
+                    label = "Total number of {}s per {}".format(
+                        data_set.tags["item"], data_set.tags["example"]
+                    ),
+                    normed = True,
+                    y_scale = "log",
+                    colour = class_palette[class_name],
+                    name = ["count sum", data_set_name, "class", class_name]
                 ),
-                normed = True,
-                y_scale = "log",
-                colour = class_palette[class_name],
-                name = ["count sum", data_set_name, "class", class_name]
+                export_options,
+                class_count_distribution_directory
             )
-            saveFigure(figure, figure_name, export_options,
-                class_count_distribution_directory)
     
+        figure_executor.wait()
         distribution_duration = time() - distribution_time_start
         print("    " + \
             "Count sum distributions for each class plotted and saved ({})."\
             .format(formatDuration(distribution_duration)))
     
+    figure_executor.wait()
+    
     print()
 
 def analyseMatrices(data_set, plot_distances=False,
@@ -1842,8 +1964,6 @@ def analyseMatrices(data_set, plot_distances=False,
         
         for distance_metric in distance_metrics:
             
-            start_time = time()
-            
             if sorting_method == "hierarchical_clustering" \
                 and data_set.number_of_examples \
                     > maximum_number_of_examples_for_dendrogram:
@@ -1866,30 +1986,14 @@ def analyseMatrices(data_set, plot_distances=False,
                     sample_size, data_set.tags["example"] + "s"
                 )
             
-            figure, figure_name = plotMatrix(
-                feature_matrix=data_set.values[indices],
-                plot_distances=plot_distances,
-                example_label=example_label,
-                feature_label=feature_label,
-                value_label=value_label,
-                sorting_method=sorting_method,
-                distance_metric=distance_metric,
-                labels=data_set.labels[indices]
-                    if data_set.labels is not None else None,
-                label_kind=data_set.tags["class"],
-                class_palette=class_palette,
-                feature_indices_for_plotting=feature_indices_for_plotting,
-                name_parts=name + [
-                    data_set.version,
-                    distance_metric,
-                    sorting_method
-                ]
-            )
-            saveFigure(figure, figure_name, export_options, results_directory)
-            
-            duration = time() - start_time
-            
-            plot_string_parts = []
+            if distance_metric:
+                distances = pairwise_distance_cache.distances(
+                    data_set.values,
+                    indices,
+                    metric=distance_metric.lower()
+                )
+            else:
+                distances = None
             
             plot_kind_string = "Heat map for {} values".format(data_set.version)
             
@@ -1913,14 +2017,42 @@ def analyseMatrices(data_set, plot_distances=False,
                 and sorting_method == "hierarchical_clustering":
                     sort_string += " (with {} distances)".format(distance_metric)
             
-            print("    " + " ".join([s for s in [
+            plot_message = "    " + " ".join([s for s in [
                 plot_kind_string,
                 subsampling_string,
                 sort_string,
-                "plotted and saved",
-                "({})".format(formatDuration(duration))
-            ] if s]) + ".")
+                "plotted and saved"
+            ] if s])
+            
+            figure_executor.submit(
+                functools.partial(
+                    plotMatrix,
+                    feature_matrix=data_set.values[indices],
+                    distances=distances,
+                    plot_distances=plot_distances,
+                    example_label=example_label,
+                    feature_label=feature_label,
+                    value_label=value_label,
+                    sorting_method=sorting_method,
+                    distance_metric=distance_metric,
+                    labels=data_set.labels[indices]
+                        if data_set.labels is not None else None,
+                    label_kind=data_set.tags["class"],
+                    class_palette=class_palette,
+                    feature_indices_for_plotting=feature_indices_for_plotting,
+                    name_parts=name + [
+                        data_set.version,
+                        distance_metric,
+                        sorting_method
+                    ]
+                ),
+                export_options,
+                results_directory,
+                message = plot_message
+            )
         
+    figure_executor.wait()
+    
     print()
 
 def analyseDecompositions(data_sets, other_data_sets = [], centroids = None,
@@ -2011,64 +2143,18 @@ def analyseDecompositions(data_sets, other_data_sets = [], centroids = None,
                 other_values_decomposed = other_values
                 centroids_decomposed = centroids
                 
-                if decomposition_method == "t-SNE":
-                    if data_set.number_of_examples \
-                        > maximum_number_of_examples_for_t_sne:
-                        
-                        print(
-                            "The number of examples for {}".format(
-                                title_with_ID),
-                            "is too large to decompose it",
-                            "using {}. Skipping.".format(decomposition_method)
-                        )
-                        print()
-                        continue
-                        
-                    elif data_set.number_of_features > \
-                        maximum_number_of_features_for_t_sne:
-                        
-                        number_of_pca_components_before_tsne = min(
-                            maximum_number_of_pca_components_before_tsne,
-                            data_set.number_of_examples - 1
-                        )
-                        
-                        print(
-                            "The number of features for {}".format(
-                                title_with_ID),
-                            "is too large to decompose it",
-                            "using {} in due time.".format(
-                                decomposition_method)
-                        )
-                        print("Decomposing {} to {} components using PCA"
-                            .format(
-                                title_with_ID,
-                                number_of_pca_components_before_tsne
-                            ),
-                            "beforehand."
-                        )
-                        decompose_time_start = time()
-                        
-                        values_decomposed, other_values_decomposed, \
-                            centroids_decomposed = decompose(
-                                values_decomposed,
-                                other_value_sets = other_values_decomposed,
-                                centroids = centroids_decomposed,
-                                method = "pca",
-                                number_of_components = 
-                                    number_of_pca_components_before_tsne
-                            )
-                        
-                        decompose_duration = time() - decompose_time_start
-                        print("{} pre-decomposed ({}).".format(
-                            capitaliseString(title_with_ID),
-                            formatDuration(decompose_duration)
-                        ))
+                if decomposition_method == "t-SNE" \
+                    and data_set.number_of_examples \
+                    > MAXIMUM_NUMBER_OF_EXAMPLES_FOR_TSNE:
                     
-                    else:
-                        if scipy.sparse.issparse(values_decomposed):
-                            values_decomposed = values_decomposed.A
-                        if scipy.sparse.issparse(other_values_decomposed):
-                            other_values_decomposed = values_decomposed.A
+                    print(
+                        "The number of examples for {}".format(
+                            title_with_ID),
+                        "is too large to decompose it",
+                        "using {}. Skipping.".format(decomposition_method)
+                    )
+                    print()
+                    continue
                 
                 print("Decomposing {} using {}.".format(
                     title_with_ID, decomposition_method))
@@ -2214,69 +2300,62 @@ def analyseDecompositions(data_sets, other_data_sets = [], centroids = None,
             
                 ## No colour-coding
             
-                plot_time_start = time()
-            
-                figure, figure_name = plotValues(
-                    plot_values_decomposed,
-                    centroids = centroids_decomposed,
-                    figure_labels = figure_labels,
-                    axis_limits = axis_limits,
-                    example_tag = data_set.tags["example"],
-                    name = plot_name
-                )
-                saveFigure(figure, figure_name, export_options,
-                    decompositions_directory)
-            
-                plot_duration = time() - plot_time_start
-                print("    {} plotted and saved ({}).".format(
-                    capitaliseString(title_with_ID),
-                    formatDuration(plot_duration)
-                ))
-        
-                # Labels
-        
-                if colouring_data_set.labels is not None:
-                    plot_time_start = time()
-            
-                    figure, figure_name = plotValues(
+                figure_executor.submit(
+                    functools.partial(
+                        plotValues,
                         plot_values_decomposed,
-                        colour_coding = "labels",
-                        colouring_data_set = colouring_data_set,
                         centroids = centroids_decomposed,
                         figure_labels = figure_labels,
                         axis_limits = axis_limits,
                         example_tag = data_set.tags["example"],
                         name = plot_name
+                    ),
+                    export_options,
+                    decompositions_directory,
+                    message = "    {} plotted and saved".format(
+                        capitaliseString(title_with_ID)
                     )
-                    saveFigure(figure, figure_name, export_options,
-                        decompositions_directory)
+                )
         
-                    plot_duration = time() - plot_time_start
-                    print("    {} (with labels) plotted and saved ({}).".format(
-                        capitaliseString(title_with_ID), formatDuration(plot_duration)))
-                
-                    if colouring_data_set.superset_labels is not None:
-                        plot_time_start = time()
-                    
-                        figure, figure_name = plotValues(
+                # Labels
+        
+                if colouring_data_set.labels is not None:
+                    figure_executor.submit(
+                        functools.partial(
+                            plotValues,
                             plot_values_decomposed,
-                            colour_coding = "superset labels",
+                            colour_coding = "labels",
                             colouring_data_set = colouring_data_set,
                             centroids = centroids_decomposed,
                             figure_labels = figure_labels,
                             axis_limits = axis_limits,
                             example_tag = data_set.tags["example"],
                             name = plot_name
+                        ),
+                        export_options,
+                        decompositions_directory,
+                        message = "    {} (with labels) plotted and saved".format(
+                            capitaliseString(title_with_ID)
                         )
-                        saveFigure(figure, figure_name, export_options,
-                            decompositions_directory)
-                    
-                        plot_duration = time() - plot_time_start
-                        print("    " +
-                            "{} (with superset labels) plotted and saved ({})."\
-                                .format(
-                                    capitaliseString(title_with_ID),
-                                    formatDuration(plot_duration)
+                    )
+                
+                    if colouring_data_set.superset_labels is not None:
+                        figure_executor.submit(
+                            functools.partial(
+                                plotValues,
+                                plot_values_decomposed,
+                                colour_coding = "superset labels",
+                                colouring_data_set = colouring_data_set,
+                                centroids = centroids_decomposed,
+                                figure_labels = figure_labels,
+                                axis_limits = axis_limits,
+                                example_tag = data_set.tags["example"],
+                                name = plot_name
+                            ),
+                            export_options,
+                            decompositions_directory,
+                            message = "    {} (with superset labels) plotted and saved".format(
+                                capitaliseString(title_with_ID)
                             )
                         )
                     
@@ -2286,20 +2365,24 @@ def analyseDecompositions(data_sets, other_data_sets = [], centroids = None,
                             plot_time_start = time()
                         
                             for class_name in colouring_data_set.class_names:
-                                figure, figure_name = plotValues(
-                                    plot_values_decomposed,
-                                    colour_coding = "class",
-                                    colouring_data_set = colouring_data_set,
-                                    centroids = centroids_decomposed,
-                                    class_name = class_name,
-                                    figure_labels = figure_labels,
-                                    axis_limits = axis_limits,
-                                    example_tag = data_set.tags["example"],
-                                    name = plot_name
+                                figure_executor.submit(
+                                    functools.partial(
+                                        plotValues,
+                                        plot_values_decomposed,
+                                        colour_coding = "class",
+                                        colouring_data_set = colouring_data_set,
+                                        centroids = centroids_decomposed,
+                                        class_name = class_name,
+                                        figure_labels = figure_labels,
+                                        axis_limits = axis_limits,
+                                        example_tag = data_set.tags["example"],
+                                        name = plot_name
+                                    ),
+                                    export_options,
+                                    decompositions_directory
                                 )
-                                saveFigure(figure, figure_name, export_options,
-                                    decompositions_directory)
                         
+                            figure_executor.wait()
                             plot_duration = time() - plot_time_start
                             print("    {} (for each class) plotted and saved ({})."\
                                 .format(
@@ -2314,20 +2397,24 @@ def analyseDecompositions(data_sets, other_data_sets = [], centroids = None,
                         
                             for superset_class_name in \
                                 colouring_data_set.superset_class_names:
-                                figure, figure_name = plotValues(
-                                    plot_values_decomposed,
-                                    colour_coding = "superset class",
-                                    colouring_data_set = colouring_data_set,
-                                    centroids = centroids_decomposed,
-                                    class_name = superset_class_name,
-                                    figure_labels = figure_labels,
-                                    axis_limits = axis_limits,
-                                    example_tag = data_set.tags["example"],
-                                    name = plot_name
+                                figure_executor.submit(
+                                    functools.partial(
+                                        plotValues,
+                                        plot_values_decomposed,
+                                        colour_coding = "superset class",
+                                        colouring_data_set = colouring_data_set,
+                                        centroids = centroids_decomposed,
+                                        class_name = superset_class_name,
+                                        figure_labels = figure_labels,
+                                        axis_limits = axis_limits,
+                                        example_tag = data_set.tags["example"],
+                                        name = plot_name
+                                    ),
+                                    export_options,
+                                    decompositions_directory
                                 )
-                                saveFigure(figure, figure_name, export_options,
-                                    decompositions_directory)
                         
+                            figure_executor.wait()
                             plot_duration = time() - plot_time_start
                             print("    " +
                                 "{} (for each superset class) plotted and saved ({})."\
@@ -2339,134 +2426,117 @@ def analyseDecompositions(data_sets, other_data_sets = [], centroids = None,
                 ## Predictions
                 
                 if colouring_data_set.has_predicted_cluster_ids:
-                    plot_time_start = time()
-                    
-                    figure, figure_name = plotValues(
-                        plot_values_decomposed,
-                        colour_coding = "predicted cluster IDs",
-                        colouring_data_set = colouring_data_set,
-                        centroids = centroids_decomposed,
-                        figure_labels = figure_labels,
-                        prediction_details = prediction_details,
-                        axis_limits = axis_limits,
-                        example_tag = data_set.tags["example"],
-                        name = plot_name,
-                    )
-                    saveFigure(figure, figure_name, export_options,
-                        decompositions_directory)
-                
-                    plot_duration = time() - plot_time_start
-                    print("    " +
-                        "{} (with predicted cluster IDs) plotted and saved ({})."\
-                            .format(
-                                capitaliseString(title_with_ID),
-                                formatDuration(plot_duration)
+                    figure_executor.submit(
+                        functools.partial(
+                            plotValues,
+                            plot_values_decomposed,
+                            colour_coding = "predicted cluster IDs",
+                            colouring_data_set = colouring_data_set,
+                            centroids = centroids_decomposed,
+                            figure_labels = figure_labels,
+                            prediction_details = prediction_details,
+                            axis_limits = axis_limits,
+                            example_tag = data_set.tags["example"],
+                            name = plot_name,
+                        ),
+                        export_options,
+                        decompositions_directory,
+                        message = "    {} (with predicted cluster IDs) plotted and saved".format(
+                            capitaliseString(title_with_ID)
                         )
                     )
                 
                 if colouring_data_set.has_predicted_labels:
-                    plot_time_start = time()
-                    
-                    figure, figure_name = plotValues(
-                        plot_values_decomposed,
-                        colour_coding = "predicted labels",
-                        colouring_data_set = colouring_data_set,
-                        centroids = centroids_decomposed,
-                        figure_labels = figure_labels,
-                        prediction_details = prediction_details,
-                        axis_limits = axis_limits,
-                        example_tag = data_set.tags["example"],
-                        name = plot_name,
-                    )
-                    saveFigure(figure, figure_name, export_options,
-                        decompositions_directory)
-                    
-                    plot_duration = time() - plot_time_start
-                    print("    " +
-                        "{} (with predicted labels) plotted and saved ({})."\
-                            .format(
-                                capitaliseString(title_with_ID),
-                                formatDuration(plot_duration)
+                    figure_executor.submit(
+                        functools.partial(
+                            plotValues,
+                            plot_values_decomposed,
+                            colour_coding = "predicted labels",
+                            colouring_data_set = colouring_data_set,
+                            centroids = centroids_decomposed,
+                            figure_labels = figure_labels,
+                            prediction_details = prediction_details,
+                            axis_limits = axis_limits,
+                            example_tag = data_set.tags["example"],
+                            name = plot_name,
+                        ),
+                        export_options,
+                        decompositions_directory,
+                        message = "    {} (with predicted labels) plotted and saved".format(
+                            capitaliseString(title_with_ID)
                         )
                     )
                 
                 if colouring_data_set.has_predicted_superset_labels:
-                    plot_time_start = time()
-                    
-                    figure, figure_name = plotValues(
+                    figure_executor.submit(
+                        functools.partial(
+                            plotValues,
+                            plot_values_decomposed,
+                            colour_coding = "predicted superset labels",
+                            colouring_data_set = colouring_data_set,
+                            centroids = centroids_decomposed,
+                            figure_labels = figure_labels,
+                            prediction_details = prediction_details,
+                            axis_limits = axis_limits,
+                            example_tag = data_set.tags["example"],
+                            name = plot_name,
+                        ),
+                        export_options,
+                        decompositions_directory,
+                        message = "    {} (with predicted superset labels) plotted and saved".format(
+                            capitaliseString(title_with_ID)
+                        )
+                    )
+                
+                # Count sum
+                
+                figure_executor.submit(
+                    functools.partial(
+                        plotValues,
                         plot_values_decomposed,
-                        colour_coding = "predicted superset labels",
+                        colour_coding = "count sum",
                         colouring_data_set = colouring_data_set,
                         centroids = centroids_decomposed,
                         figure_labels = figure_labels,
-                        prediction_details = prediction_details,
                         axis_limits = axis_limits,
                         example_tag = data_set.tags["example"],
-                        name = plot_name,
-                    )
-                    saveFigure(figure, figure_name, export_options,
-                        decompositions_directory)
-                    
-                    plot_duration = time() - plot_time_start
-                    print("    " +
-                        "{} (with predicted superset labels) plotted and saved ({})."\
-                            .format(
-                                capitaliseString(title_with_ID),
-                                formatDuration(plot_duration)
-                        )
+                        name = plot_name
+                    ),
+                    export_options,
+                    decompositions_directory,
+                    message = "    {} (with count sum) plotted and saved".format(
+                        capitaliseString(title_with_ID)
                     )
-                
-                # Count sum
-                
-                plot_time_start = time()
-        
-                figure, figure_name = plotValues(
-                    plot_values_decomposed,
-                    colour_coding = "count sum",
-                    colouring_data_set = colouring_data_set,
-                    centroids = centroids_decomposed,
-                    figure_labels = figure_labels,
-                    axis_limits = axis_limits,
-                    example_tag = data_set.tags["example"],
-                    name = plot_name
                 )
-                saveFigure(figure, figure_name, export_options,
-                    decompositions_directory)
-        
-                plot_duration = time() - plot_time_start
-                print("    {} (with count sum) plotted and saved ({}).".format(
-                    capitaliseString(title_with_ID),
-                    formatDuration(plot_duration)
-                ))
                 
                 # Features
                 
                 for feature_index in highlight_feature_indices:
             
-                    plot_time_start = time()
-            
-                    figure, figure_name = plotValues(
-                        plot_values_decomposed,
-                        colour_coding = "feature",
-                        colouring_data_set = colouring_data_set,
-                        centroids = centroids_decomposed,
-                        feature_index = feature_index,
-                        figure_labels = figure_labels,
-                        axis_limits = axis_limits,
-                        example_tag = data_set.tags["example"],
-                        name = plot_name
+                    figure_executor.submit(
+                        functools.partial(
+                            plotValues,
+                            plot_values_decomposed,
+                            colour_coding = "feature",
+                            colouring_data_set = colouring_data_set,
+                            centroids = centroids_decomposed,
+                            feature_index = feature_index,
+                            figure_labels = figure_labels,
+                            axis_limits = axis_limits,
+                            example_tag = data_set.tags["example"],
+                            name = plot_name
+                        ),
+                        export_options,
+                        decompositions_directory,
+                        message = "    {} (with {}) plotted and saved".format(
+                            capitaliseString(title_with_ID),
+                            data_set.feature_names[feature_index]
+                        )
                     )
-                    saveFigure(figure, figure_name, export_options,
-                        decompositions_directory)
-            
-                    plot_duration = time() - plot_time_start
-                    print("    {} (with {}) plotted and saved ({}).".format(
-                        capitaliseString(title_with_ID),
-                        data_set.feature_names[feature_index],
-                        formatDuration(plot_duration)
-                    ))
                 
                 print()
+    
+    figure_executor.wait()
 
 def analyseCentroidProbabilities(centroids, name = None,
     analysis_level = "normal", export_options = [], results_directory = "results"):
@@ -2574,18 +2644,24 @@ def statistics(x, name = "", tolerance = 1e-3, skip_sparsity = False):
     if x.size > maximum_size_for_normal_statistics_computation:
         batch_size = 1000
     
-    x_mean = x.mean()
-    x_std = standard_deviation(x, ddof=1, batch_size=batch_size)
+    # All statistics are computed in one pass over chunks of rows
+    x_moments = moments(
+        x,
+        tolerance = tolerance,
+        ddof = 1,
+        batch_size = batch_size,
+        skip_sparsity = skip_sparsity
+    )
+    
+    x_mean = x_moments["mean"]
+    x_std = numpy.sqrt(x_moments["variance"])
     
-    x_min  = x.min()
-    x_max  = x.max()
+    x_min  = x_moments["minimum"]
+    x_max  = x_moments["maximum"]
     
     x_dispersion = x_std**2 / x_mean
     
-    if skip_sparsity:
-        x_sparsity = nan
-    else:
-        x_sparsity = sparsity(x, tolerance=tolerance, batch_size=batch_size)
+    x_sparsity = x_moments["sparsity"]
     
     statistics = {
         "name": name,
@@ -2620,17 +2696,94 @@ def accuracy(labels, predicted_labels, excluded_classes = []):
         labels, predicted_labels, excluded_classes = excluded_classes)
     return numpy.mean(predicted_labels == labels)
 
-def adjusted_rand_index(labels, predicted_labels, excluded_classes = []):
-    labels, predicted_labels = excludeClassesFromLabelSet(
-        labels, predicted_labels, excluded_classes = excluded_classes)
-    return sklearn.metrics.cluster.adjusted_rand_score(labels,
-        predicted_labels)
+def labelContingencyMatrix(labels, predicted_labels, excluded_classes = []):
+    
+    # Examples of excluded classes are left out by removing their columns
+    
+    contingency_matrix, _, unique_labels, _ = contingencyMatrix(
+        labels, predicted_labels)
+    
+    contingency_matrix = contingency_matrix[
+        :, ~numpy.isin(unique_labels, excluded_classes)]
+    contingency_matrix = contingency_matrix[
+        contingency_matrix.getnnz(axis = 1) > 0]
+    
+    return contingency_matrix
 
-def adjusted_mutual_information(labels, predicted_labels, excluded_classes = []):
-    labels, predicted_labels = excludeClassesFromLabelSet(
-        labels, predicted_labels, excluded_classes = excluded_classes)
-    return sklearn.metrics.cluster.adjusted_mutual_info_score(labels,
-        predicted_labels)
+def adjusted_rand_index(contingency_matrix):
+    
+    # Same as `sklearn.metrics.cluster.adjusted_rand_score` computed from a
+    # contingency matrix
+    
+    N = contingency_matrix.sum()
+    number_of_clusters, number_of_classes = contingency_matrix.shape
+    
+    if number_of_classes == number_of_clusters == 1 \
+        or number_of_classes == number_of_clusters == 0 \
+        or number_of_classes == number_of_clusters == N:
+        return 1.0
+    
+    number_of_pairs = lambda n: n * (n - 1) / 2
+    
+    cluster_sizes = numpy.asarray(contingency_matrix.sum(axis = 1)).ravel()
+    class_sizes = numpy.asarray(contingency_matrix.sum(axis = 0)).ravel()
+    
+    index = number_of_pairs(contingency_matrix.data.astype(numpy.float64)).sum()
+    cluster_index = number_of_pairs(cluster_sizes.astype(numpy.float64)).sum()
+    class_index = number_of_pairs(class_sizes.astype(numpy.float64)).sum()
+    
+    expected_index = cluster_index * class_index / number_of_pairs(N)
+    maximum_index = (cluster_index + class_index) / 2
+    
+    if maximum_index == expected_index:
+        return 1.0
+    
+    return (index - expected_index) / (maximum_index - expected_index)
+
+def adjusted_mutual_information(contingency_matrix):
+    
+    # Same as `sklearn.metrics.cluster.adjusted_mutual_info_score` computed
+    # from a contingency matrix using the arithmetic mean of the entropies
+    
+    N = contingency_matrix.sum()
+    number_of_clusters, number_of_classes = contingency_matrix.shape
+    
+    if number_of_classes == number_of_clusters == 1 \
+        or number_of_classes == number_of_clusters == 0:
+        return 1.0
+    
+    mutual_information = sklearn.metrics.cluster.mutual_info_score(
+        None, None, contingency = contingency_matrix)
+    expected_mutual_information = \
+        sklearn.metrics.cluster.expected_mutual_information(
+            contingency_matrix, N)
+    
+    cluster_entropy = entropyOfCounts(contingency_matrix.sum(axis = 1))
+    class_entropy = entropyOfCounts(contingency_matrix.sum(axis = 0))
+    
+    denominator = numpy.mean([cluster_entropy, class_entropy]) \
+        - expected_mutual_information
+    
+    epsilon = numpy.finfo(numpy.float64).eps
+    
+    if denominator < 0:
+        denominator = min(denominator, -epsilon)
+    else:
+        denominator = max(denominator, epsilon)
+    
+    return (mutual_information - expected_mutual_information) / denominator
+
+def entropyOfCounts(counts):
+    
+    counts = numpy.asarray(counts, dtype = numpy.float64).ravel()
+    counts = counts[counts > 0]
+    
+    if counts.size == 0:
+        return 1.0
+    
+    probabilities = counts / counts.sum()
+    
+    return - numpy.sum(probabilities * numpy.log(probabilities))
 
 def silhouette_score(values, predicted_labels):
     
@@ -2689,7 +2842,8 @@ def formatStatistics(statistics_sets, name = "Data set"):
     
     return table
 
-def computeCountAccuracies(x, x_tilde, method = None):
+def computeCountAccuracies(x, x_tilde, method = None, batch_size = 1000,
+    maximum_order_of_magnitude = 10):
     """
     Compute accuracies for every count in original data set
     using reconstructed data set.
@@ -2700,12 +2854,102 @@ def computeCountAccuracies(x, x_tilde, method = None):
     count_accuracies = {}
     M, N = x.shape
     
-    ## Round data sets to be able to compare
-    x = numpy.round(x)
-    x_tilde = numpy.round(x_tilde)
+    # A reconstructed count agrees with an original count at an order of
+    # magnitude, l, if both are the same when floored to multiples of 10^l.
+    # Agreeing at one order of magnitude implies agreeing at higher ones, so
+    # for each pair of counts only the lowest order of magnitude they agree
+    # at is needed. These are binned for each original count in one pass
+    # over chunks of rows, and the accuracies for both single counts and
+    # orders of magnitude are computed from this histogram.
+    
+    number_of_levels = maximum_order_of_magnitude + 2
+    no_agreement_level = number_of_levels - 1
+    
+    def agreementLevels(x_values, x_tilde_values):
+        
+        levels = numpy.full(x_tilde_values.shape, no_agreement_level)
+        disagreeing = numpy.ones(x_tilde_values.shape, bool)
+        
+        for l in range(maximum_order_of_magnitude + 1):
+            scale = pow(10, l)
+            agreeing = disagreeing & (
+                x_values // scale == x_tilde_values // scale)
+            levels[agreeing] = l
+            disagreeing &= ~agreeing
+            if not disagreeing.any():
+                break
+        
+        return levels
+    
+    histogram = numpy.zeros(number_of_levels, numpy.int64)
+    
+    def addToHistogram(histogram, x_values, levels):
+        
+        chunk_histogram = numpy.bincount(
+            x_values * number_of_levels + levels,
+            minlength = number_of_levels
+        )
+        
+        if chunk_histogram.size > histogram.size:
+            chunk_histogram[:histogram.size] += histogram
+            return chunk_histogram
+        else:
+            histogram[:chunk_histogram.size] += chunk_histogram
+            return histogram
+    
+    for i in range(0, M, batch_size):
+        
+        ## Round data sets to be able to compare
+        
+        x_tilde_chunk = x_tilde[i:i+batch_size]
+        
+        if scipy.sparse.issparse(x_tilde_chunk):
+            x_tilde_chunk = x_tilde_chunk.A
+        
+        x_tilde_chunk = numpy.round(
+            numpy.asarray(x_tilde_chunk)).astype(numpy.int64)
+        
+        x_chunk = x[i:i+batch_size]
+        
+        if scipy.sparse.issparse(x_chunk):
+            
+            x_chunk = x_chunk.tocoo()
+            
+            x_values = numpy.round(x_chunk.data).astype(numpy.int64)
+            x_tilde_values = x_tilde_chunk[x_chunk.row, x_chunk.col]
+            
+            histogram = addToHistogram(
+                histogram,
+                x_values,
+                agreementLevels(x_values, x_tilde_values)
+            )
+            
+            # Zeros not stored are counted by subtracting the agreement
+            # levels of stored counts from those of all counts
+            zero_histogram = numpy.bincount(
+                agreementLevels(0, x_tilde_chunk).reshape(-1),
+                minlength = number_of_levels
+            ) - numpy.bincount(
+                agreementLevels(0, x_tilde_values),
+                minlength = number_of_levels
+            )
+            histogram[:number_of_levels] += zero_histogram
+        
+        else:
+            x_values = numpy.round(
+                numpy.asarray(x_chunk)).astype(numpy.int64).reshape(-1)
+            x_tilde_values = x_tilde_chunk.reshape(-1)
+            
+            histogram = addToHistogram(
+                histogram,
+                x_values,
+                agreementLevels(x_values, x_tilde_values)
+            )
+    
+    histogram = histogram.reshape(-1, number_of_levels)
     
     ## Compute the max count value
-    k_max = x.max().astype(int)
+    k_max = numpy.nonzero(histogram.sum(axis = 1))[0].max()
     
     if method == "orders of magnitude":
         
@@ -2713,10 +2957,7 @@ def computeCountAccuracies(x, x_tilde, method = None):
         
         for l in range(log_k_max_floored + 1):
             
-            x_scaled_floored = numpy.floor(x / pow(10, l))
-            x_tilde_scaled_floored = numpy.floor(x_tilde / pow(10, l))
-            
-            k_max_scaled_floored = x_scaled_floored.max().astype(int)
+            k_max_scaled_floored = k_max // pow(10, l)
             
             k_start = 1
             
@@ -2725,32 +2966,22 @@ def computeCountAccuracies(x, x_tilde, method = None):
             
             for k in range(k_start, min(10, k_max_scaled_floored + 1)):
                 
-                with warnings.catch_warnings():
-                    warnings.simplefilter(
-                        "ignore",
-                        category = scipy.sparse.SparseEfficiencyWarning
-                    )
-                    k_indices = x_scaled_floored == k
-                
-                k_size = k_indices.sum()
+                k_real = k * pow(10, l)
+                k_real_end = min(k_max, k_real + pow(10, l) - 1)
                 
-                if scipy.sparse.issparse(x):
-                    k_indices = k_indices.tocoo()
-                    k_indices = (k_indices.row, k_indices.col)
+                k_histogram = histogram[k_real:k_real_end + 1]
                 
-                k_sum = (x_tilde_scaled_floored[k_indices] == k).sum()
+                k_size = k_histogram.sum()
+                k_sum = k_histogram[:, :l + 1].sum()
                 
                 if k_size != 0:
                     f = k_sum / k_size
                 else:
                     f = numpy.nan
                 
-                k_real = k * pow(10, l)
-                
                 if l == 0:
                     k_string = str(k_real)
                 else:
-                    k_real_end = min(k_max, k_real + pow(10, l) - 1)
                     k_string = "{}-{}".format(k_real, k_real_end)
                 
                 count_accuracies[k_string] = f
@@ -2759,20 +2990,8 @@ def computeCountAccuracies(x, x_tilde, method = None):
         
         for k in range(k_max + 1):
             
-            with warnings.catch_warnings():
-                warnings.simplefilter(
-                    "ignore",
-                    category = scipy.sparse.SparseEfficiencyWarning
-                )
-                k_indices = x == k
-            
-            k_size = k_indices.sum()
-            
-            if scipy.sparse.issparse(x):
-                k_indices = k_indices.tocoo()
-                k_indices = (k_indices.row, k_indices.col)
-            
-            k_sum = (x_tilde[k_indices] == k).sum()
+            k_size = histogram[k].sum()
+            k_sum = histogram[k, 0]
             
             if k_size != 0:
                 f = k_sum / k_size
@@ -2832,6 +3051,44 @@ def computeClusteringMetrics(evaluation_set):
         for metric in clustering_metrics
     }
     
+    # Contingency matrices shared by supervised metrics
+    
+    contingency_matrices = {}
+    
+    if evaluation_set.has_labels:
+        
+        if evaluation_set.has_predicted_cluster_ids:
+            contingency_matrices["clusters"] = labelContingencyMatrix(
+                evaluation_set.labels,
+                evaluation_set.predicted_cluster_ids,
+                evaluation_set.excluded_classes
+            )
+        
+        if evaluation_set.has_predicted_labels:
+            contingency_matrices["labels"] = labelContingencyMatrix(
+                evaluation_set.labels,
+                evaluation_set.predicted_labels,
+                evaluation_set.excluded_classes
+            )
+    
+    if evaluation_set.has_superset_labels:
+        
+        if evaluation_set.has_predicted_cluster_ids:
+            contingency_matrices["clusters; superset"] = \
+                labelContingencyMatrix(
+                    evaluation_set.superset_labels,
+                    evaluation_set.predicted_cluster_ids,
+                    evaluation_set.excluded_superset_classes
+                )
+        
+        if evaluation_set.has_predicted_superset_labels:
+            contingency_matrices["labels; superset"] = \
+                labelContingencyMatrix(
+                    evaluation_set.superset_labels,
+                    evaluation_set.predicted_superset_labels,
+                    evaluation_set.excluded_superset_classes
+                )
+    
     for metric_name, metric_attributes in clustering_metrics.items():
         
         metric_values = clustering_metric_values[metric_name]
@@ -2840,37 +3097,11 @@ def computeClusteringMetrics(evaluation_set):
         
         if metric_kind == "supervised":
             
-            if evaluation_set.has_labels:
-                
-                if evaluation_set.has_predicted_cluster_ids:
-                    metric_values["clusters"] = metric_function(
-                        evaluation_set.labels,
-                        evaluation_set.predicted_cluster_ids,
-                        evaluation_set.excluded_classes
-                    )
+            for label_kind, contingency_matrix \
+                in contingency_matrices.items():
                 
-                if evaluation_set.has_predicted_labels:
-                    metric_values["labels"] = metric_function(
-                        evaluation_set.labels,
-                        evaluation_set.predicted_labels,
-                        evaluation_set.excluded_classes
-                    )
-            
-            if evaluation_set.has_superset_labels:
-                
-                if evaluation_set.has_predicted_cluster_ids:
-                    metric_values["clusters; superset"] = metric_function(
-                        evaluation_set.superset_labels,
-                        evaluation_set.predicted_cluster_ids,
-                        evaluation_set.excluded_superset_classes
-                    )
-                
-                if evaluation_set.has_predicted_superset_labels:
-                    metric_values["labels; superset"] = metric_function(
-                        evaluation_set.superset_labels,
-                        evaluation_set.predicted_superset_labels,
-                        evaluation_set.excluded_superset_classes
-                    )
+                metric_values[label_kind] = metric_function(
+                    contingency_matrix)
         
         elif metric_kind == "unsupervised":
             
@@ -2894,8 +3125,94 @@ def computeClusteringMetrics(evaluation_set):
     
     return clustering_metric_values
 
-def computePairwiseDistances(values, metric="euclidean"):
-    return sklearn.metrics.pairwise_distances(values, metric=metric)
+def computePairwiseDistances(values, metric="euclidean", condensed=False,
+    batch_size=1000):
+    
+    # Distances are computed in single precision for blocks of rows against
+    # all following rows, so only the upper triangle is computed and, in
+    # condensed form, stored
+    
+    if scipy.sparse.issparse(values):
+        values = values.astype(numpy.float32)
+    else:
+        values = numpy.asarray(values, dtype=numpy.float32)
+    
+    M = values.shape[0]
+    
+    condensed_distances = numpy.empty(M * (M - 1) // 2, numpy.float32)
+    
+    j = 0
+    
+    for i in range(0, M, batch_size):
+        
+        block_distances = sklearn.metrics.pairwise_distances(
+            values[i:i+batch_size],
+            values[i:],
+            metric=metric
+        )
+        
+        for k in range(block_distances.shape[0]):
+            row_distances = block_distances[k, k+1:]
+            condensed_distances[j:j+row_distances.size] = row_distances
+            j += row_distances.size
+    
+    if condensed:
+        return condensed_distances
+    else:
+        return scipy.spatial.distance.squareform(condensed_distances)
+
+class PairwiseDistanceCache(object):
+    
+    # Condensed pairwise distances for subsamples of values kept during an
+    # analysis run, so the same distances are not computed again for other
+    # sorting methods or plots of the same values
+    
+    def __init__(self, maximum_size=maximum_size_for_pairwise_distance_cache):
+        self.maximum_size = maximum_size
+        self.entries = collections.OrderedDict()
+    
+    def distances(self, values, indices, metric="euclidean"):
+        
+        key = (
+            id(values),
+            hashlib.sha1(numpy.ascontiguousarray(indices)).hexdigest(),
+            metric
+        )
+        
+        entry = self.entries.get(key)
+        
+        # Identities of values can be reused after these are released
+        if entry is not None and entry[0]() is values:
+            self.entries.move_to_end(key)
+            return entry[1]
+        
+        distances = computePairwiseDistances(
+            values[indices],
+            metric=metric,
+            condensed=True
+        )
+        
+        self.entries[key] = (weakref.ref(values), distances)
+        self.removeReleasedEntries()
+        
+        while len(self.entries) > 1 and self.size > self.maximum_size:
+            self.entries.popitem(last=False)
+        
+        return distances
+    
+    @property
+    def size(self):
+        return sum(distances.nbytes for _, distances in self.entries.values())
+    
+    def removeReleasedEntries(self):
+        for key, (values_reference, _) in list(self.entries.items()):
+            if values_reference() is None:
+                del self.entries[key]
+    
+    def clear(self):
+        self.entries.clear()
+
+pairwise_distance_cache = PairwiseDistanceCache()
 
 def plotClassHistogram(labels, class_names = None, class_palette = None,
     normed = False, scale = "linear", label_sorter = None, name = None):
@@ -4010,7 +4327,8 @@ def plotELBOHeatMap(data_frame, x_label, y_label, z_label = None, z_symbol = Non
     
     return figure, figure_name
 
-def plotMatrix(feature_matrix, plot_distances=False, center_value=None,
+def plotMatrix(feature_matrix, distances=None,
+    plot_distances=False, center_value=None,
     example_label=None, feature_label=None, value_label=None,
     sorting_method=None, distance_metric="Euclidean",
     labels=None, label_kind=None, class_palette=None,
@@ -4044,14 +4362,22 @@ def plotMatrix(feature_matrix, plot_distances=False, center_value=None,
     
     # Distances (if needed)
     
-    distances = None
+    # Distances are kept in condensed form, which is used directly for
+    # hierarchical clustering
     
-    if plot_distances or sorting_method == "hierarchical_clustering":
+    if distances is None and (
+        plot_distances or sorting_method == "hierarchical_clustering"):
+        
         distances = computePairwiseDistances(
             feature_matrix,
-            metric=distance_metric.lower()
+            metric=distance_metric.lower(),
+            condensed=True
         )
     
+    elif distances is not None and distances.ndim == 2:
+        distances = scipy.spatial.distance.squareform(
+            distances, checks=False)
+    
     # Figure initialisation
     
     figure = pyplot.figure()
@@ -4113,11 +4439,13 @@ def plotMatrix(feature_matrix, plot_distances=False, center_value=None,
     
     elif sorting_method == "hierarchical_clustering":
         linkage = scipy.cluster.hierarchy.linkage(
-            scipy.spatial.distance.squareform(distances, checks=False),
+            distances,
             metric="average"
         )
+        # Only the number of examples is used from the data, since the
+        # linkage is given
         dendrogram = seaborn.matrix.dendrogram(
-            distances,
+            numpy.empty((M, 1)),
             linkage=linkage,
             metric=None,
             method="ward",
@@ -4143,7 +4471,8 @@ def plotMatrix(feature_matrix, plot_distances=False, center_value=None,
     ## Heat map of values
     
     if plot_distances:
-        plot_values = distances[example_indices][:, example_indices]
+        plot_values = scipy.spatial.distance.squareform(distances)[
+            numpy.ix_(example_indices, example_indices)]
     else:
         plot_values = feature_matrix[example_indices]\
             [:, feature_indices_for_plotting]
@@ -4634,7 +4963,8 @@ def plotModelMetricSets(
 def plotValues(values, colour_coding = None, colouring_data_set = None,
     label_mask = None, centroids = None, class_name = None,
     feature_index = None, figure_labels = None, prediction_details = None,
-    axis_limits = None, example_tag = None, name = "scatter"):
+    axis_limits = None, example_tag = None, rasterise = None,
+    name = "scatter"):
     
     # Setup
     
@@ -4667,13 +4997,21 @@ def plotValues(values, colour_coding = None, colouring_data_set = None,
     
     # Values
     
-    values = values.copy()
-    
-    # Randomise examples in values to remove any prior order
     M, N = values.shape
-    random_state = numpy.random.RandomState(117)
-    shuffled_indices = random_state.permutation(M)
-    values = values[shuffled_indices]
+    
+    # Examples are aggregated into pixels for many examples, so plots are
+    # rendered in time independent of the number of examples
+    if rasterise is None:
+        rasterise = M >= minimum_number_of_examples_for_rasterised_scatter_plots
+    
+    if rasterise:
+        # Order of examples does not matter when aggregated
+        shuffled_indices = numpy.arange(M)
+    else:
+        # Randomise examples in values to remove any prior order
+        random_state = numpy.random.RandomState(117)
+        shuffled_indices = random_state.permutation(M)
+        values = values[shuffled_indices]
 
     if label_mask is not None:
         label_mask = numpy.array(label_mask.copy(), dtype=bool)
@@ -4707,20 +5045,16 @@ def plotValues(values, colour_coding = None, colouring_data_set = None,
         else:
             y_max = original_y_max
         
-        include_indices = []
-        outlier_indices = []
-    
-        for i in range(M):
-            if values[i, 0] < x_min or values[i, 0] > x_max \
-                or values[i, 1] < y_min or values[i, 1] > y_max:
-                outlier_indices.append(i)
-            else:
-                include_indices.append(i)
+        include_indices = numpy.nonzero(
+            (values[:, 0] >= x_min) & (values[:, 0] <= x_max)
+            & (values[:, 1] >= y_min) & (values[:, 1] <= y_max)
+        )[0]
+        number_of_outliers = values.shape[0] - len(include_indices)
     
         values = values[include_indices]
         shuffled_indices = shuffled_indices[include_indices]
         
-        outliers_string = "{} {}s not shown".format(len(outlier_indices),
+        outliers_string = "{} {}s not shown".format(number_of_outliers,
             example_tag)
     
     # Adjust point size based on number of examples
@@ -4799,56 +5133,92 @@ def plotValues(values, colour_coding = None, colouring_data_set = None,
         label_mask = label_mask[shuffled_indices]
         
         if "labels" in colour_coding or "ids" in colour_coding:
-            colours = []
-            classes = set()
-        
-            for i, label in enumerate(labels):
-                colour = class_palette[label]
-                colours.append(colour)
-
-                if label_mask[i]:
-                    label_ext = str(label) + ' (labeled)'
-                    label_marker = 'X'
-                    label_edgecolor = 'k'
-                else:
-                    label_ext = label
-                    label_marker = '.'
-                    label_edgecolor = 'face'
-
+            
+            if rasterise:
+                
+                class_names_present, class_indices = numpy.unique(
+                    labels, return_inverse = True)
+                
+                plotRasterisedValues(
+                    axis,
+                    values,
+                    categories = class_indices,
+                    category_colours = [
+                        class_palette[class_name]
+                        for class_name in class_names_present
+                    ]
+                )
                 
-                # Plot one example for each class to add labels
-                if label_ext not in classes:
-                    classes.add(label_ext)
-                    axis.scatter(values[i, 0], values[i, 1],
-                        color = colour, label = label,
-                        marker = label_marker, edgecolors = label_edgecolor
+                # Labeled examples are few, so they are still plotted
+                if numpy.any(label_mask):
+                    axis.scatter(
+                        values[label_mask, 0],
+                        values[label_mask, 1],
+                        s = 30,
+                        c = [
+                            class_palette[label]
+                            for label in labels[label_mask]
+                        ],
+                        marker = 'X',
+                        edgecolors = 'k'
                     )
+                
+                for class_name in class_names_present:
+                    axis.scatter([], [], color = class_palette[class_name],
+                        label = class_name)
+            
+            else:
+                colours = []
+                classes = set()
+            
+                for i, label in enumerate(labels):
+                    colour = class_palette[label]
+                    colours.append(colour)
 
-            colours = numpy.array(colours)
-
-            # Plot unlabeled data points
-            not_label_mask = numpy.logical_not(label_mask)
-            if numpy.any(not_label_mask):
-                axis.scatter(
-                    values[not_label_mask, 0],
-                    values[not_label_mask, 1],
-                    s = 30,
-                    c = colours[not_label_mask],
-                    marker = '.',
-                    edgecolors = 'face',
-                    alpha = 0.5
-                )
+                    if label_mask[i]:
+                        label_ext = str(label) + ' (labeled)'
+                        label_marker = 'X'
+                        label_edgecolor = 'k'
+                    else:
+                        label_ext = label
+                        label_marker = '.'
+                        label_edgecolor = 'face'
 
-            # Plot labeled data points with X marker.
-            if numpy.any(label_mask):
-                axis.scatter(
-                    values[label_mask, 0],
-                    values[label_mask, 1],
-                    s = 30,
-                    c = colours[label_mask],
-                    marker = 'X',
-                    edgecolors = 'k'
-                )
+                    
+                    # Plot one example for each class to add labels
+                    if label_ext not in classes:
+                        classes.add(label_ext)
+                        axis.scatter(values[i, 0], values[i, 1],
+                            color = colour, label = label,
+                            marker = label_marker,
+                            edgecolors = label_edgecolor
+                        )
+
+                colours = numpy.array(colours)
+
+                # Plot unlabeled data points
+                not_label_mask = numpy.logical_not(label_mask)
+                if numpy.any(not_label_mask):
+                    axis.scatter(
+                        values[not_label_mask, 0],
+                        values[not_label_mask, 1],
+                        s = 30,
+                        c = colours[not_label_mask],
+                        marker = '.',
+                        edgecolors = 'face',
+                        alpha = 0.5
+                    )
+
+                # Plot labeled data points with X marker.
+                if numpy.any(label_mask):
+                    axis.scatter(
+                        values[label_mask, 0],
+                        values[label_mask, 1],
+                        s = 30,
+                        c = colours[label_mask],
+                        marker = 'X',
+                        edgecolors = 'k'
+                    )
             
             class_handles, class_labels = axis.get_legend_handles_labels()
             
@@ -4880,37 +5250,27 @@ def plotValues(values, colour_coding = None, colouring_data_set = None,
                     )
         
         elif "class" in colour_coding:
-            colours = []
             
             figure_name += "-" + normaliseString(str(class_name))
             
-            ordered_indices_set = {
-                str(class_name): [],
-                "Remaining": []
-            }
-            
-            for i, label in enumerate(labels):
-                if label == class_name:
-                    colour = class_palette[label]
-                    ordered_indices_set[str(class_name)].append(i)
-                else:
-                    colour = neutral_colour
-                    ordered_indices_set["Remaining"].append(i)
-                colours.append(colour)
-            
-            colours = numpy.array(colours)
-            
-            z_order_index = 1
-            for label, ordered_indices in sorted(ordered_indices_set.items()):
-                if label == "Remaining":
-                    z_order = 0
-                else:
-                    z_order = z_order_index
-                    z_order_index += 1
-                ordered_values = values[ordered_indices]
-                ordered_colours = colours[ordered_indices]
-                axis.scatter(ordered_values[:, 0], ordered_values[:, 1],
-                    c = ordered_colours, label = label, zorder = z_order)
+            if rasterise:
+                
+                in_class = labels == class_name
+                
+                plotRasterisedValues(
+                    axis,
+                    values,
+                    categories = in_class.astype(int),
+                    category_colours = [
+                        neutral_colour,
+                        class_palette[class_name]
+                    ]
+                )
+                
+                axis.scatter([], [], color = class_palette[class_name],
+                    label = str(class_name))
+                axis.scatter([], [], color = neutral_colour,
+                    label = "Remaining")
                 
                 handles, labels = axis.get_legend_handles_labels()
                 labels, handles = zip(*sorted(zip(labels, handles),
@@ -4924,12 +5284,61 @@ def plotValues(values, colour_coding = None, colouring_data_set = None,
                     mode = "expand",
                     borderaxespad = 0.
                 )
+            
+            else:
+                colours = []
+                
+                ordered_indices_set = {
+                    str(class_name): [],
+                    "Remaining": []
+                }
+                
+                for i, label in enumerate(labels):
+                    if label == class_name:
+                        colour = class_palette[label]
+                        ordered_indices_set[str(class_name)].append(i)
+                    else:
+                        colour = neutral_colour
+                        ordered_indices_set["Remaining"].append(i)
+                    colours.append(colour)
+                
+                colours = numpy.array(colours)
+                
+                z_order_index = 1
+                for label, ordered_indices in sorted(
+                    ordered_indices_set.items()):
+                    if label == "Remaining":
+                        z_order = 0
+                    else:
+                        z_order = z_order_index
+                        z_order_index += 1
+                    ordered_values = values[ordered_indices]
+                    ordered_colours = colours[ordered_indices]
+                    axis.scatter(ordered_values[:, 0], ordered_values[:, 1],
+                        c = ordered_colours, label = label, zorder = z_order)
+                    
+                    handles, labels = axis.get_legend_handles_labels()
+                    labels, handles = zip(*sorted(zip(labels, handles),
+                        key = lambda t: label_sorter(t[0])))
+                    legend = axis.legend(
+                        handles,
+                        labels, 
+                        bbox_to_anchor = (-0.1, 1.05, 1.1, 0.95),
+                        loc = "lower left",
+                        ncol = 2,
+                        mode = "expand",
+                        borderaxespad = 0.
+                    )
     
     elif colour_coding == "count_sum":
         
         n = colouring_data_set.count_sum[shuffled_indices].flatten()
-        scatter_plot = axis.scatter(values[:, 0], values[:, 1], c = n,
-            cmap = colour_map)
+        if rasterise:
+            scatter_plot = plotRasterisedValues(axis, values, weights = n,
+                colour_map = colour_map)
+        else:
+            scatter_plot = axis.scatter(values[:, 0], values[:, 1], c = n,
+                cmap = colour_map)
         colour_bar = figure.colorbar(scatter_plot)
         colour_bar.outline.set_linewidth(0)
         colour_bar.set_label("Total number of {}s per {}".format(
@@ -4954,12 +5363,19 @@ def plotValues(values, colour_coding = None, colouring_data_set = None,
             f = f.A
         f = f.squeeze()
         
-        scatter_plot = axis.scatter(values[:, 0], values[:, 1], c = f,
-            cmap = colour_map)
+        if rasterise:
+            scatter_plot = plotRasterisedValues(axis, values, weights = f,
+                colour_map = colour_map)
+        else:
+            scatter_plot = axis.scatter(values[:, 0], values[:, 1], c = f,
+                cmap = colour_map)
         colour_bar = figure.colorbar(scatter_plot)
         colour_bar.outline.set_linewidth(0)
         colour_bar.set_label(feature_name)
     
+    elif rasterise:
+        plotRasterisedValues(axis, values, colour = neutral_colour)
+    
     else:
         axis.scatter(values[:, 0], values[:, 1], color = neutral_colour)
     
@@ -5003,6 +5419,99 @@ def plotValues(values, colour_coding = None, colouring_data_set = None,
     
     return figure, figure_name
 
+def plotRasterisedValues(axis, values, categories = None,
+    category_colours = None, weights = None, colour_map = None,
+    colour = None, resolution = rasterised_scatter_plot_resolution):
+    
+    # Examples are counted in a grid of pixels. Pixels are coloured by
+    # blending the colours of the categories of their examples or by the
+    # mean weight of their examples, and their opacity increases with
+    # their number of examples.
+    
+    # Nothing is drawn if all examples are outliers
+    if values.shape[0] == 0:
+        if weights is not None:
+            mappable = matplotlib.cm.ScalarMappable(cmap = colour_map)
+            mappable.set_array(numpy.asarray(weights))
+            return mappable
+        return None
+    
+    x_min, y_min = values[:, :2].min(axis = 0)
+    x_max, y_max = values[:, :2].max(axis = 0)
+    
+    if x_max == x_min:
+        x_min, x_max = x_min - 0.5, x_max + 0.5
+    
+    if y_max == y_min:
+        y_min, y_max = y_min - 0.5, y_max + 0.5
+    
+    x_indices = numpy.clip(
+        ((values[:, 0] - x_min) / (x_max - x_min) * resolution).astype(int),
+        0, resolution - 1
+    )
+    y_indices = numpy.clip(
+        ((values[:, 1] - y_min) / (y_max - y_min) * resolution).astype(int),
+        0, resolution - 1
+    )
+    
+    pixel_indices = y_indices * resolution + x_indices
+    number_of_pixels = resolution * resolution
+    
+    counts = numpy.bincount(pixel_indices, minlength = number_of_pixels)
+    
+    opacities = numpy.zeros(number_of_pixels)
+    occupied = counts > 0
+    
+    if occupied.any():
+        opacities[occupied] = 0.35 + 0.65 * numpy.log1p(counts[occupied]) \
+            / numpy.log1p(counts.max())
+    
+    mappable = None
+    
+    if categories is not None:
+        number_of_categories = len(category_colours)
+        category_counts = numpy.bincount(
+            categories * number_of_pixels + pixel_indices,
+            minlength = number_of_categories * number_of_pixels
+        ).reshape(number_of_categories, number_of_pixels)
+        category_colours = numpy.array([
+            matplotlib.colors.to_rgb(category_colour)
+            for category_colour in category_colours
+        ])
+        pixel_colours = category_counts.T @ category_colours \
+            / numpy.maximum(counts, 1)[:, numpy.newaxis]
+    
+    elif weights is not None:
+        weights = numpy.asarray(weights, dtype = numpy.float64)
+        weight_sums = numpy.bincount(pixel_indices, weights = weights,
+            minlength = number_of_pixels)
+        mean_weights = weight_sums / numpy.maximum(counts, 1)
+        normalisation = matplotlib.colors.Normalize(
+            vmin = weights.min(), vmax = weights.max())
+        pixel_colours = colour_map(normalisation(mean_weights))[:, :3]
+        mappable = matplotlib.cm.ScalarMappable(
+            norm = normalisation, cmap = colour_map)
+        mappable.set_array(weights)
+    
+    else:
+        pixel_colours = numpy.tile(matplotlib.colors.to_rgb(colour),
+            (number_of_pixels, 1))
+    
+    image = numpy.concatenate(
+        [pixel_colours, opacities[:, numpy.newaxis]],
+        axis = 1
+    ).reshape(resolution, resolution, 4)
+    
+    axis.imshow(
+        image,
+        origin = "lower",
+        extent = (x_min, x_max, y_min, y_max),
+        aspect = "auto",
+        interpolation = "nearest"
+    )
+    
+    return mappable
+
 def plotProbabilities(posterior_probabilities, prior_probabilities, 
     x_label = None, y_label = None,
     palette = None, uniform = False, name = None):
@@ -5164,6 +5673,255 @@ def figureName(base_name, other_names = None):
     
     return figure_name
 
+class FigureExecutor(object):
+    
+    # Figures are plotted and saved by a pool of worker processes, so several
+    # figures are rendered at the same time while analyses continue. Workers
+    # are spawned instead of forked, since forking is unsafe once TensorFlow
+    # has started its threads, so figures of models and their results are
+    # also plotted in parallel. Workers only render figures to files using
+    # a non-interactive backend.
+    #
+    # Plotting functions are pickled together with their arguments, but data
+    # sets and large arrays are sent as handles to shared memory, so their
+    # values are not copied through pipes (see `FigurePickler`). With one
+    # worker, figures are plotted and saved right away.
+    
+    def __init__(self, number_of_workers = 1):
+        
+        if number_of_workers is None or number_of_workers < 1:
+            number_of_workers = os.cpu_count() or 1
+        
+        self.number_of_workers = number_of_workers
+        self.jobs = []
+        
+        if self.number_of_workers > 1:
+            context = multiprocessing.get_context("spawn")
+            self.pool = context.Pool(
+                processes = self.number_of_workers,
+                initializer = initialiseFigureWorker
+            )
+        else:
+            self.pool = None
+    
+    def submit(self, plotting_function, export_options, results_directory,
+        message = None):
+        
+        # `plotting_function` takes no arguments and returns a figure and
+        # its name, so arguments are bound using `functools.partial`
+        
+        if self.pool is None:
+            figure_name, duration = plotAndSaveFigure(
+                plotting_function, export_options, results_directory)
+            self.report(figure_name, duration, message)
+            return
+        
+        # Arrays of pending figures are kept in shared memory, so only a
+        # couple of figures per worker are pending at a time
+        while len(self.jobs) >= maximum_number_of_pending_figures_per_worker \
+            * self.number_of_workers:
+            self.collect(block = True)
+        
+        segments = []
+        
+        try:
+            job = dumpFigureJob(plotting_function, segments)
+        except (pickle.PicklingError, AttributeError, TypeError):
+            # Figures with arguments that cannot be pickled, such as local
+            # functions, are plotted and saved right away
+            figure_name, duration = plotAndSaveFigure(
+                plotting_function, export_options, results_directory)
+            self.report(figure_name, duration, message)
+            return
+        
+        result = self.pool.apply_async(
+            plotAndSaveFigureInWorker,
+            (job, export_options, results_directory)
+        )
+        
+        self.jobs.append((result, segments, message))
+    
+    def collect(self, block = False, drain = False):
+        
+        # The first error is raised after the remaining jobs have been
+        # collected, so their errors do not hide it
+        
+        error = None
+        
+        while self.jobs:
+            
+            # Workers take figures in order, so the oldest figure is
+            # usually the first to be finished
+            if block:
+                self.jobs[0][0].wait()
+            
+            for job in list(self.jobs):
+                
+                result, segments, message = job
+                
+                if not result.ready():
+                    continue
+                
+                try:
+                    status, *outcome = result.get()
+                except Exception:
+                    status, outcome = "error", [traceback.format_exc()]
+                
+                # Workers are finished with the arrays of the figure
+                releaseSharedArraySegments(segments, unlink = True)
+                self.jobs.remove(job)
+                
+                if status == "error":
+                    if error is None:
+                        error = outcome[0]
+                    else:
+                        print("Another figure could not be plotted:\n"
+                            + outcome[0])
+                    continue
+                
+                figure_name, duration = outcome
+                self.report(figure_name, duration, message)
+            
+            if not drain and error is None:
+                break
+            
+            block = True
+        
+        if error is not None:
+            raise RuntimeError("Figure could not be plotted:\n" + error)
+    
+    def wait(self):
+        self.collect(block = True, drain = True)
+    
+    def shutdown(self):
+        try:
+            self.wait()
+        finally:
+            if self.pool is not None:
+                self.pool.close()
+                self.pool.join()
+                self.pool = None
+    
+    def report(self, figure_name, duration, message = None):
+        if not message:
+            message = "    Figure \"{}\" plotted and saved".format(
+                figure_name)
+        print("{} ({}).".format(message, formatDuration(duration)))
+
+class FigurePickler(pickle.Pickler):
+    
+    # Data sets are replaced by their handles to shared memory, which are
+    # exported once for each data set, while their predictions, which change
+    # between analyses, are pickled along with the handles. Large arrays are
+    # copied to shared memory segments for the figure, which are unlinked
+    # when the figure has been collected.
+    
+    def __init__(self, file, segments):
+        super(FigurePickler, self).__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.segments = segments
+    
+    def persistent_id(self, obj):
+        
+        if isinstance(obj, DataSet):
+            predictions = {
+                "predicted_cluster_ids": obj.predicted_cluster_ids,
+                "predicted_labels": obj.predicted_labels,
+                "predicted_class_names": obj.predicted_class_names,
+                "predicted_superset_labels": obj.predicted_superset_labels,
+                "predicted_superset_class_names": \
+                    obj.predicted_superset_class_names
+            }
+            return ("data set", obj.exportToSharedMemory(), predictions)
+        
+        # Objects cannot be shared, and subclasses, such as masked arrays,
+        # would lose their extra attributes
+        if type(obj) is numpy.ndarray and obj.dtype != object \
+            and obj.nbytes >= minimum_size_of_shared_figure_arrays:
+            return ("array", exportArrayToSharedMemory(obj, self.segments))
+        
+        return None
+
+class FigureUnpickler(pickle.Unpickler):
+    
+    def __init__(self, file, segments):
+        super(FigureUnpickler, self).__init__(file)
+        self.segments = segments
+    
+    def persistent_load(self, pid):
+        
+        kind, description, *predictions = pid
+        
+        if kind == "data set":
+            data_set = attachSharedDataSet(description)
+            data_set.updatePredictions(**predictions[0])
+            return data_set
+        
+        elif kind == "array":
+            array = attachArrayFromSharedMemory(description, self.segments)
+            # Segments of arrays are only used by a single figure
+            array.flags.writeable = True
+            return array
+        
+        else:
+            raise pickle.UnpicklingError(
+                "Persistent object `{}` not found.".format(kind))
+
+def dumpFigureJob(plotting_function, segments):
+    
+    job = io.BytesIO()
+    
+    try:
+        FigurePickler(job, segments).dump(plotting_function)
+    except Exception:
+        releaseSharedArraySegments(segments, unlink = True)
+        raise
+    
+    return job.getvalue()
+
+def loadFigureJob(job, segments):
+    return FigureUnpickler(io.BytesIO(job), segments).load()
+
+figure_executor = FigureExecutor()
+
+def setNumberOfAnalysisWorkers(number_of_workers = 1):
+    
+    global figure_executor
+    
+    figure_executor.shutdown()
+    figure_executor = FigureExecutor(number_of_workers)
+
+def plotAndSaveFigure(plotting_function, export_options, results_directory):
+    
+    start_time = time()
+    
+    figure, figure_name = plotting_function()
+    saveFigure(figure, figure_name, export_options, results_directory)
+    
+    duration = time() - start_time
+    
+    return figure_name, duration
+
+def initialiseFigureWorker():
+    # Figures are only rendered to files in workers
+    pyplot.switch_backend("agg")
+
+def plotAndSaveFigureInWorker(job, export_options, results_directory):
+    
+    segments = []
+    
+    try:
+        figure_name, duration = plotAndSaveFigure(
+            loadFigureJob(job, segments), export_options, results_directory)
+        outcome = ("done", figure_name, duration)
+    except Exception:
+        outcome = ("error", traceback.format_exc())
+    
+    # Attached data sets close their segments themselves when
+    # garbage-collected
+    releaseSharedArraySegments(segments)
+    
+    return outcome
+
 def saveFigure(figure, figure_name, export_options, results_directory):
     
     if not os.path.exists(results_directory):
@@ -5221,6 +5979,63 @@ def saveFigure(figure, figure_name, export_options, results_directory):
     
     pyplot.close(figure)
 
+def animateLineEvolution(figure):
+    
+    # The figure is plotted once with all data points, so axis limits and
+    # legends are the same in every frame, and each frame then shows the
+    # lines up to that point
+    
+    lines = []
+    
+    for axis in figure.axes:
+        for line in axis.get_lines():
+            lines.append((line, line.get_xdata(), line.get_ydata()))
+    
+    def updateFrame(frame):
+        for line, x, y in lines:
+            line.set_data(x[:frame + 1], y[:frame + 1])
+    
+    return updateFrame
+
+def saveFigureAnimation(figure, figure_name, update_frame, number_of_frames,
+    results_directory):
+    
+    # Frames are streamed in one pass to a video encoder, if one is
+    # available, or otherwise saved as an image sequence
+    
+    if not os.path.exists(results_directory):
+        os.makedirs(results_directory)
+    
+    figure_path_base = os.path.join(results_directory, figure_name)
+    
+    # The layout is fixed for the last frame so that all frames have the
+    # same size
+    update_frame(number_of_frames - 1)
+    figure.tight_layout()
+    adjustFigureForLegend(figure)
+    figure.set_tight_layout(False)
+    
+    if matplotlib.animation.writers.is_available(video_writer):
+        writer = matplotlib.animation.writers[video_writer](
+            fps = video_frame_rate)
+        with writer.saving(figure, figure_path_base + video_extension,
+            dpi = figure.dpi):
+            for frame in range(number_of_frames):
+                update_frame(frame)
+                writer.grab_frame()
+    else:
+        frame_number_width = len(str(number_of_frames))
+        for frame in range(number_of_frames):
+            update_frame(frame)
+            figure.savefig("{}-frame-{:0{}d}{}".format(
+                figure_path_base,
+                frame + 1,
+                frame_number_width,
+                figure_extension
+            ))
+    
+    pyplot.close(figure)
+
 def adjustFigureForLegend(figure):
     
     for axis in figure.get_axes():
@@ -0,0 +1,528 @@
+#!/usr/bin/env python3
+
+# ======================================================================== #
+# 
+# Copyright (c) 2017 - 2018 scVAE authors
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#    http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# 
+# ======================================================================== #
+
+import data
+
+from main import setupModel, parseDistribution
+
+from auxiliary import (
+    title, subtitle,
+    formatDuration
+)
+
+from models.auxiliary import timeTrainingSteps, trainingStepPeakMemory
+
+from miscellaneous.incremental_pca import IncrementalPCA
+from miscellaneous.randomised_pca import RandomisedPCA
+
+from sklearn.decomposition import PCA
+
+import numpy
+import scipy.sparse
+
+import os
+import argparse
+import itertools
+import tracemalloc
+
+from time import time
+
+import warnings
+
+# TODO Remove when TensorFlow Probability library is updated to v0.6
+warnings.filterwarnings(action="ignore", category=DeprecationWarning)
+warnings.filterwarnings(action="ignore", category=FutureWarning)
+warnings.filterwarnings(action="ignore", category=PendingDeprecationWarning)
+
+def main(benchmark, **benchmark_arguments):
+    
+    benchmark_time_start = time()
+    
+    BENCHMARKS[benchmark](**benchmark_arguments)
+    
+    benchmark_duration = time() - benchmark_time_start
+    print("Benchmark finished ({}).".format(formatDuration(benchmark_duration)))
+
+def benchmarkSamplingMemory(input_file_or_name, data_directory = "data",
+    log_directory = "log", results_directory = "results",
+    map_features = False, feature_selection = [], example_filter = [],
+    preprocessing_methods = [],
+    model_type = "VAE", latent_size = 50, hidden_sizes = [250, 250],
+    reconstruction_distribution = "poisson",
+    number_of_reconstruction_classes = 0, number_of_classes = None,
+    count_sum = False,
+    numbers_of_importance_samples = [1, 5],
+    numbers_of_monte_carlo_samples = [1, 10],
+    batch_size = 100, learning_rate = 1e-4, number_of_steps = 10):
+    
+    # Peak memory and duration of a training step for a fixed number of
+    # examples and different numbers of importance-weighting and Monte
+    # Carlo samples
+    
+    # Data
+    
+    print(title("Data"))
+    
+    data_set = data.DataSet(
+        input_file_or_name,
+        directory = data_directory,
+        map_features = map_features,
+        feature_selection = feature_selection,
+        example_filter = example_filter,
+        preprocessing_methods = preprocessing_methods
+    )
+    
+    training_set, validation_set, test_set = data_set.split("default", 0.9)
+    
+    log_directory = data.directory(log_directory, data_set, "default", 0.9)
+    results_directory = data.directory(results_directory, data_set,
+        "default", 0.9)
+    
+    # Benchmark
+    
+    print(title("Sampling memory benchmark"))
+    
+    reconstruction_distribution = parseDistribution(
+        reconstruction_distribution)
+    
+    # Size of the target batch, which the likelihood functions are
+    # evaluated on for every sample
+    target_size = batch_size * training_set.number_of_features * 4
+    
+    rows = [[
+        "importance samples",
+        "Monte Carlo samples",
+        "peak memory",
+        "tiled targets",
+        "step duration"
+    ]]
+    
+    for number_of_importance_samples, number_of_monte_carlo_samples \
+        in itertools.product(numbers_of_importance_samples,
+            numbers_of_monte_carlo_samples):
+        
+        model, _ = setupModel(
+            training_set = training_set,
+            model_type = model_type,
+            latent_size = latent_size,
+            hidden_sizes = hidden_sizes,
+            number_of_importance_samples = [number_of_importance_samples],
+            number_of_monte_carlo_samples = [number_of_monte_carlo_samples],
+            inference_architecture = "MLP",
+            latent_distribution = "gaussian",
+            number_of_classes = number_of_classes,
+            parameterise_latent_posterior = False,
+            generative_architecture = "MLP",
+            reconstruction_distribution = reconstruction_distribution,
+            number_of_reconstruction_classes =
+                number_of_reconstruction_classes,
+            prior_probabilities_method = "uniform",
+            number_of_warm_up_epochs = 0,
+            kl_weight = 1,
+            proportion_of_free_KL_nats = 0.0,
+            clf_weight = 1.0,
+            number_of_labeled_examples = 0,
+            batch_normalisation = True,
+            dropout_keep_probabilities = [],
+            count_sum = count_sum,
+            log_directory = log_directory,
+            results_directory = results_directory
+        )
+        
+        number_of_samples = number_of_importance_samples \
+            * number_of_monte_carlo_samples
+        
+        # The feed dictionary divides the batch size by the number of
+        # samples, so it is scaled up to keep the number of examples fixed
+        feed_dict = model.trainingFeedDictionary(
+            training_set,
+            batch_size = batch_size * number_of_samples,
+            learning_rate = learning_rate
+        )
+        
+        peak_memory = trainingStepPeakMemory(model, feed_dict, model.config)
+        step_duration = timeTrainingSteps(
+            model, feed_dict, model.config, number_of_steps)
+        
+        rows.append([
+            str(number_of_importance_samples),
+            str(number_of_monte_carlo_samples),
+            formatMemory(peak_memory),
+            formatMemory(number_of_samples * target_size),
+            formatDuration(step_duration)
+        ])
+        
+        print("{} importance samples and {} Monte Carlo samples: {}.".format(
+            number_of_importance_samples,
+            number_of_monte_carlo_samples,
+            formatMemory(peak_memory)
+        ))
+        print()
+        
+        del model
+    
+    print(subtitle("Results"))
+    
+    print("Batches of {} examples with {} features.".format(
+        batch_size, training_set.number_of_features))
+    print("Tiled targets: memory the targets would use "
+        "if replicated for every sample.")
+    print()
+    print(formatTable(rows))
+    print()
+
+def benchmarkPCA(input_file_or_name, data_directory = "data",
+    map_features = False, feature_selection = [], example_filter = [],
+    preprocessing_methods = [],
+    number_of_components = 2, memory_budget = 64,
+    maximum_size_for_exact_pca = 2e9):
+    
+    # Duration, peak memory, and explained variance of PCA on the full data
+    # set using the exact, incremental, and randomised backends
+    
+    # Data
+    
+    print(title("Data"))
+    
+    data_set = data.DataSet(
+        input_file_or_name,
+        directory = data_directory,
+        map_features = map_features,
+        feature_selection = feature_selection,
+        example_filter = example_filter,
+        preprocessing_methods = preprocessing_methods
+    )
+    data_set.load()
+    
+    values = data_set.values
+    
+    # Benchmark
+    
+    print(title("PCA benchmark"))
+    
+    backends = {
+        "exact": lambda: PCA(n_components = number_of_components),
+        "incremental": lambda: IncrementalPCA(
+            n_components = number_of_components,
+            batch_size = 100
+        ),
+        "randomised": lambda: RandomisedPCA(
+            n_components = number_of_components,
+            random_state = 42
+        ),
+        "randomised in batches": lambda: RandomisedPCA(
+            n_components = number_of_components,
+            memory_budget = memory_budget * 1024 ** 2,
+            random_state = 42
+        )
+    }
+    
+    dense_size = data_set.number_of_examples * data_set.number_of_features \
+        * numpy.dtype(values.dtype).itemsize
+    
+    rows = [[
+        "backend",
+        "duration",
+        "peak memory",
+        "explained variance"
+    ]]
+    
+    for backend_name, backend in backends.items():
+        
+        if backend_name == "exact" and scipy.sparse.issparse(values):
+            if dense_size > maximum_size_for_exact_pca:
+                print("Values are too large to densify for exact PCA. "
+                    "Skipping.")
+                print()
+                continue
+            backend_values = values.A
+        else:
+            backend_values = values
+        
+        model = backend()
+        
+        tracemalloc.start()
+        time_start = time()
+        
+        model.fit_transform(backend_values)
+        
+        duration = time() - time_start
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        
+        explained_variance = model.explained_variance_ratio_.sum()
+        
+        rows.append([
+            backend_name,
+            formatDuration(duration),
+            formatMemory(peak_memory),
+            "{:.2%}".format(explained_variance)
+        ])
+        
+        print("{}: {}.".format(
+            backend_name.capitalize(), formatDuration(duration)))
+        print()
+        
+        del model, backend_values
+    
+    print(subtitle("Results"))
+    
+    print("{} examples with {} features decomposed to {} components.".format(
+        data_set.number_of_examples,
+        data_set.number_of_features,
+        number_of_components
+    ))
+    print("Peak memory: memory allocated during fitting "
+        "in addition to the values.")
+    print()
+    print(formatTable(rows))
+    print()
+
+def formatMemory(number_of_bytes):
+    
+    for unit in ["B", "KB", "MB", "GB"]:
+        if abs(number_of_bytes) < 1024 or unit == "GB":
+            break
+        number_of_bytes /= 1024
+    
+    return "{:.1f} {}".format(number_of_bytes, unit)
+
+def formatTable(rows, separator = "  "):
+    
+    column_widths = [
+        max(len(row[i]) for row in rows)
+        for i in range(len(rows[0]))
+    ]
+    
+    table = "\n".join(
+        separator.join(
+            value.ljust(width) for value, width in zip(row, column_widths)
+        ).rstrip()
+        for row in rows
+    )
+    
+    return table
+
+BENCHMARKS = {
+    "sampling_memory": benchmarkSamplingMemory,
+    "pca": benchmarkPCA
+}
+
+parser = argparse.ArgumentParser(
+    description='Benchmark parts of scVAE.',
+    formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+subparsers = parser.add_subparsers(
+    title = "benchmarks",
+    dest = "benchmark"
+)
+subparsers.required = True
+
+sampling_memory_parser = subparsers.add_parser(
+    "sampling_memory",
+    description = "Peak memory and duration of a training step "
+        "for different numbers of importance-weighting "
+        "and Monte Carlo samples.",
+    help = "peak memory of training steps against numbers of samples",
+    formatter_class=argparse.ArgumentDefaultsHelpFormatter
+)
+sampling_memory_parser.add_argument(
+    "--input", "-i",
+    dest = "input_file_or_name",
+    help = "input: data set name or path to input file"
+)
+sampling_memory_parser.add_argument(
+    "--data-directory", "-D",
+    type = str,
+    default = "data",
+    help = "directory where data are placed"
+)
+sampling_memory_parser.add_argument(
+    "--log-directory", "-L",
+    type = str,
+    default = "log",
+    help = "directory where models are stored"
+)
+sampling_memory_parser.add_argument(
+    "--results-directory", "-R",
+    type = str,
+    default = "results",
+    help = "directory where results are saved"
+)
+sampling_memory_parser.add_argument(
+    "--map-features",
+    action = "store_true",
+    help = "map features using a feature mapping if available"
+)
+sampling_memory_parser.add_argument(
+    "--feature-selection", "-F",
+    type = str,
+    nargs = "*",
+    default = [],
+    help = "method for selecting features"
+)
+sampling_memory_parser.add_argument(
+    "--example-filter", "-E",
+    type = str,
+    nargs = "*",
+    default = [],
+    help = "method for filtering examples, optionally followed by parameters"
+)
+sampling_memory_parser.add_argument(
+    "--preprocessing-methods", "-p",
+    type = str,
+    nargs = "*",
+    default = [],
+    help = "methods for preprocessing data (applied in order)"
+)
+sampling_memory_parser.add_argument(
+    "--model-type", "-m",
+    type = str,
+    default = "VAE",
+    help = "type of model"
+)
+sampling_memory_parser.add_argument(
+    "--latent-size", "-l",
+    type = int,
+    default = 50,
+    help = "size of latent space"
+)
+sampling_memory_parser.add_argument(
+    "--hidden-sizes", "-H",
+    type = int,
+    nargs = "+",
+    default = [250, 250],
+    help = "sizes of hidden layers"
+)
+sampling_memory_parser.add_argument(
+    "--reconstruction-distribution", "-r",
+    type = str,
+    default = "poisson",
+    help = "distribution for the reconstructions"
+)
+sampling_memory_parser.add_argument(
+    "--number-of-reconstruction-classes", "-k",
+    type = int,
+    default = 0,
+    help = "the maximum count for which to use classification"
+)
+sampling_memory_parser.add_argument(
+    "--number-of-classes", "-K",
+    type = int,
+    default = None,
+    help = "number of proposed clusters in data set"
+)
+sampling_memory_parser.add_argument(
+    "--count-sum",
+    action = "store_true",
+    help = "use count sum"
+)
+sampling_memory_parser.add_argument(
+    "--numbers-of-importance-samples",
+    type = int,
+    nargs = "+",
+    default = [1, 5],
+    help = "numbers of importance-weighting samples to benchmark"
+)
+sampling_memory_parser.add_argument(
+    "--numbers-of-monte-carlo-samples",
+    type = int,
+    nargs = "+",
+    default = [1, 10],
+    help = "numbers of Monte Carlo samples to benchmark"
+)
+sampling_memory_parser.add_argument(
+    "--batch-size", "-M",
+    type = int,
+    default = 100,
+    help = "number of examples in each batch (independent of the numbers of samples)"
+)
+sampling_memory_parser.add_argument(
+    "--learning-rate",
+    type = float,
+    default = 1e-4,
+    help = "learning rate when training"
+)
+sampling_memory_parser.add_argument(
+    "--number-of-steps",
+    type = int,
+    default = 10,
+    help = "number of training steps to time"
+)
+
+pca_parser = subparsers.add_parser(
+    "pca",
+    description = "Duration, peak memory, and explained variance of PCA "
+        "using the exact, incremental, and randomised backends.",
+    help = "duration and memory of PCA backends",
+    formatter_class=argparse.ArgumentDefaultsHelpFormatter
+)
+pca_parser.add_argument(
+    "--input", "-i",
+    dest = "input_file_or_name",
+    help = "input: data set name or path to input file"
+)
+pca_parser.add_argument(
+    "--data-directory", "-D",
+    type = str,
+    default = "data",
+    help = "directory where data are placed"
+)
+pca_parser.add_argument(
+    "--map-features",
+    action = "store_true",
+    help = "map features using a feature mapping if available"
+)
+pca_parser.add_argument(
+    "--feature-selection", "-F",
+    type = str,
+    nargs = "*",
+    default = [],
+    help = "method for selecting features"
+)
+pca_parser.add_argument(
+    "--example-filter", "-E",
+    type = str,
+    nargs = "*",
+    default = [],
+    help = "method for filtering examples, optionally followed by parameters"
+)
+pca_parser.add_argument(
+    "--preprocessing-methods", "-p",
+    type = str,
+    nargs = "*",
+    default = [],
+    help = "methods for preprocessing data (applied in order)"
+)
+pca_parser.add_argument(
+    "--number-of-components",
+    type = int,
+    default = 2,
+    help = "number of principal components"
+)
+pca_parser.add_argument(
+    "--memory-budget",
+    type = float,
+    default = 64,
+    help = "memory budget in MB for batches of the batched randomised backend"
+)
+
+if __name__ == '__main__':
+    arguments = parser.parse_args()
+    main(**vars(arguments))
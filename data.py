@@ -22,6 +22,9 @@ import tarfile
 import pickle
 import struct
 import random
+import mmap
+import tempfile
+import weakref
 
 import re
 from bs4 import BeautifulSoup
@@ -37,9 +40,15 @@ import sklearn.preprocessing
 import stemming.porter2 as stemming
 
 from functools import reduce
+from concurrent.futures import ThreadPoolExecutor
 
 import seaborn
 
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
+
 from time import time
 
 from auxiliary import (
@@ -61,7 +70,13 @@ preprocessed_extension = ".sparse.h5"
 
 maximum_duration_before_saving = 30 # seconds
 
+split_increments_index_filename = "index.json"
+split_increments_example_names_filename = "example_names.txt"
+
+shared_memory_directory = "/dev/shm"
+
 subset_kinds = ["full", "training", "validation", "test"]
+split_data_subsets = ["training set", "validation set", "test set"]
 
 data_sets = {
     "Macosko-MRC": {
@@ -633,7 +648,7 @@ data_sets = {
 
 class DataSet(object):
     def __init__(self, input_file_or_name,
-        values = None,
+        values = None, count_sum = None,
         total_standard_deviations = None,
         explained_standard_deviations = None,
         preprocessed_values = None, binarised_values = None,
@@ -723,8 +738,15 @@ class DataSet(object):
         self.number_of_examples = None
         self.number_of_features = None
         self.number_of_classes = None
+        
+        # Shared memory (when exported to or attached from shared memory)
+        self.shared_memory_handle = None
+        self.shared_memory_finaliser = None
+        self.shared_memory_attached = False
+        
         self.update(
             values = values,
+            count_sum = count_sum,
             total_standard_deviations = total_standard_deviations,
             explained_standard_deviations = explained_standard_deviations,
             preprocessed_values = preprocessed_values,
@@ -951,20 +973,29 @@ class DataSet(object):
     def has_predicted_cluster_ids(self):
         return self.predicted_cluster_ids is not None
     
-    def update(self, values = None,
+    def update(self, values = None, count_sum = None,
         total_standard_deviations = None,
         explained_standard_deviations = None,
         preprocessed_values = None,
         binarised_values = None, labels = None,
         example_names = None, feature_names = None, class_names = None):
         
+        # An earlier export to shared memory would no longer match the data
+        # set, so it is released and the data set is exported anew if needed
+        if self.shared_memory_handle is not None \
+            and not self.shared_memory_attached:
+            self.releaseSharedMemory()
+        
         if values is not None:
             
             self.values = values
             
-            self.count_sum = self.values.sum(axis = 1).reshape(-1, 1)
-            if isinstance(self.count_sum, numpy.matrix):
-                self.count_sum = self.count_sum.A
+            if count_sum is not None:
+                self.count_sum = count_sum
+            else:
+                self.count_sum = self.values.sum(axis = 1).reshape(-1, 1)
+                if isinstance(self.count_sum, numpy.matrix):
+                    self.count_sum = self.count_sum.A
             self.normalised_count_sum = self.count_sum / self.count_sum.max()
             
             M_values, N_values = values.shape
@@ -1265,6 +1296,16 @@ class DataSet(object):
             else:
                 preprocessed_values = None
             
+            if self.feature_selection or self.example_filter:
+                summary_statistics = loadSummaryStatistics(
+                    values,
+                    self.preprocessedPath(
+                        "summary statistics",
+                        map_features = self.map_features
+                    )
+                )
+                print()
+            
             if self.feature_selection:
                 values_dictionary, feature_names = selectFeatures(
                     {"original": values,
@@ -1272,9 +1313,14 @@ class DataSet(object):
                     self.feature_names,
                     self.feature_selection,
                     self.feature_selection_parameters,
-                    self.preprocessedPath
+                    self.preprocessedPath,
+                    summary_statistics = summary_statistics
                 )
                 
+                # Summary statistics for examples change when features
+                # are excluded
+                summary_statistics = None
+                
                 values = values_dictionary["original"]
                 preprocessed_values = values_dictionary["preprocessed"]
             
@@ -1291,7 +1337,8 @@ class DataSet(object):
                     excluded_classes = self.excluded_classes,
                     superset_labels = self.superset_labels,
                     excluded_superset_classes = self.excluded_superset_classes,
-                    count_sum = self.count_sum
+                    count_sum = self.count_sum,
+                    summary_statistics = summary_statistics
                 )
                 
                 values = values_dictionary["original"]
@@ -1424,7 +1471,12 @@ class DataSet(object):
         if method == "default":
             method = self.defaultSplittingMethod()
         
-        sparse_path = self.preprocessedPath(
+        split_data_dictionary = self.splitDataDictionary(method, fraction)
+        
+        return self.splitDataSets(split_data_dictionary)
+    
+    def splitPath(self, method, fraction):
+        return self.preprocessedPath(
             map_features = self.map_features,
             preprocessing_methods = self.preprocessing_methods,
             feature_selection = self.feature_selection,
@@ -1435,6 +1487,14 @@ class DataSet(object):
             splitting_fraction = fraction,
             split_indices = self.split_indices
         )
+    
+    def splitIncrementsDirectory(self, method, fraction):
+        split_path = self.splitPath(method, fraction)
+        return split_path[:-len(preprocessed_extension)] + "-increments"
+    
+    def splitDataDictionary(self, method, fraction):
+        
+        sparse_path = self.splitPath(method, fraction)
         
         print("Splitting:")
         print("    method:", method)
@@ -1480,6 +1540,22 @@ class DataSet(object):
                 saveDataDictionary(split_data_dictionary, sparse_path)
                 print()
         
+        increments_directory = self.splitIncrementsDirectory(method, fraction)
+        increments_index = loadSplitIncrementsIndex(increments_directory)
+        
+        if increments_index["increments"]:
+            print("Loading {} increments of split data sets.".format(
+                len(increments_index["increments"])))
+            appendToSplitDataDictionary(
+                split_data_dictionary,
+                [
+                    loadDataDictionary(os.path.join(
+                        increments_directory, increment["filename"]))
+                    for increment in increments_index["increments"]
+                ]
+            )
+            print()
+        
         for data_subset in split_data_dictionary:
             if not isinstance(split_data_dictionary[data_subset], dict):
                 continue
@@ -1490,6 +1566,10 @@ class DataSet(object):
                         split_data_dictionary[data_subset][data_subset_key] \
                             = SparseRowMatrix(values)
         
+        return split_data_dictionary
+    
+    def splitDataSets(self, split_data_dictionary):
+        
         training_set = DataSet(
             self.name,
             values = split_data_dictionary["training set"]["values"],
@@ -1567,6 +1647,285 @@ class DataSet(object):
         
         return training_set, validation_set, test_set
     
+    def extendSplit(self, new_data_set, method = "default", fraction = 0.9,
+                    allow_new_classes = True):
+        
+        # Examples of the new data set are aligned to the features of this
+        # data set, preprocessed, split, and stored as an increment of the
+        # split data sets, so only the new examples are written. The
+        # examples already stored are neither loaded from their original
+        # files nor preprocessed again. The indices of the new examples in
+        # each of the split data sets are also returned.
+        
+        if method == "default":
+            method = self.defaultSplittingMethod()
+        
+        # Predefined split indices only cover the examples already stored
+        if normaliseString(method) not in ["random", "macosko"]:
+            raise ValueError(
+                "New examples cannot be split using splitting method `{}`."
+                .format(method)
+            )
+        
+        split_data_dictionary = self.splitDataDictionary(method, fraction)
+        
+        increments_directory = self.splitIncrementsDirectory(method, fraction)
+        increments_index = loadSplitIncrementsIndex(increments_directory)
+        
+        if new_data_set.values is None:
+            new_data_set.load()
+        
+        print("Extending split data sets with examples from {}.".format(
+            new_data_set.title))
+        extending_time_start = time()
+        
+        ## Examples
+        
+        # Examples already in the split data sets are skipped using an
+        # index of their names, which is created with the first increment
+        
+        example_names_path = os.path.join(
+            increments_directory, split_increments_example_names_filename)
+        
+        if os.path.isfile(example_names_path):
+            with open(example_names_path, "r") as example_names_file:
+                stored_example_names = set(
+                    example_names_file.read().splitlines())
+        else:
+            stored_example_names = set(
+                str(example_name)
+                for data_subset in split_data_subsets
+                for example_name
+                in split_data_dictionary[data_subset]["example names"]
+            )
+            if not os.path.exists(increments_directory):
+                os.makedirs(increments_directory)
+            with open(example_names_path, "w") as example_names_file:
+                for example_name in sorted(stored_example_names):
+                    example_names_file.write(example_name + "\n")
+        
+        new_example_indices = numpy.array([
+            i for i, example_name in enumerate(new_data_set.example_names)
+            if str(example_name) not in stored_example_names
+        ], dtype = int)
+        
+        number_of_new_examples = len(new_example_indices)
+        number_of_skipped_examples = new_data_set.number_of_examples \
+            - number_of_new_examples
+        
+        if number_of_skipped_examples:
+            print("    Skipping {} examples already in data set.".format(
+                number_of_skipped_examples))
+        
+        ## Features
+        
+        values, number_of_missing_features = alignFeatures(
+            new_data_set.values[new_example_indices],
+            new_data_set.feature_names,
+            split_data_dictionary["feature names"]
+        )
+        values = SparseRowMatrix(values)
+        
+        if number_of_missing_features:
+            print("    {} features not found in new examples, so their "
+                "values are set to zero.".format(number_of_missing_features))
+        
+        ## Labels
+        
+        example_names = new_data_set.example_names[new_example_indices]
+        
+        if split_data_dictionary["training set"]["labels"] is None:
+            labels = None
+        elif new_data_set.labels is not None:
+            labels = new_data_set.labels[new_example_indices]
+        else:
+            labels = numpy.full(number_of_new_examples,
+                default_excluded_classes[0], dtype = object)
+        
+        ## Example filter
+        
+        if self.example_filter and number_of_new_examples:
+            
+            if labels is not None and self.label_superset:
+                superset_labels = supersetLabels(labels, self.label_superset)
+            else:
+                superset_labels = None
+            
+            values_dictionary, example_names, labels = filterExamples(
+                {"original": values},
+                example_names,
+                self.example_filter,
+                self.example_filter_parameters,
+                labels = labels,
+                excluded_classes = self.excluded_classes,
+                superset_labels = superset_labels,
+                excluded_superset_classes = self.excluded_superset_classes,
+                require_filtered_examples = False
+            )
+            
+            values = SparseRowMatrix(values_dictionary["original"])
+            number_of_new_examples = values.shape[0]
+        
+        if labels is not None \
+            and split_data_dictionary["class names"] is not None:
+            
+            new_class_names = numpy.setdiff1d(
+                numpy.unique(labels), split_data_dictionary["class names"])
+            
+            # Models trained on the data set have a fixed number of classes
+            if new_class_names.size and not allow_new_classes:
+                raise ValueError(
+                    "New examples have classes not in the data set ({}), "
+                    "which would change the number of classes.".format(
+                        ", ".join(map(str, new_class_names)))
+                )
+            
+            class_names = numpy.concatenate([
+                split_data_dictionary["class names"],
+                new_class_names
+            ])
+            class_names.sort()
+        
+        else:
+            class_names = split_data_dictionary["class names"]
+        
+        ## Preprocessing
+        
+        if self.preprocessing_methods:
+            preprocessing_function = preprocessingFunctionForDataSet(
+                self.title,
+                self.preprocessing_methods,
+                self.preprocessedPath
+            )
+            preprocessed_values = preprocessing_function(values)
+        else:
+            preprocessed_values = values
+        
+        if split_data_dictionary["training set"]["binarised values"] \
+            is not None:
+            binarisation_function = preprocessingFunctionForDataSet(
+                self.title, ["binarise"], self.preprocessedPath)
+            binarised_values = binarisation_function(values)
+        else:
+            binarised_values = None
+        
+        ## Splitting
+        
+        # New examples are split in the same way as the whole data set
+        
+        random_state = numpy.random.RandomState(len(stored_example_names))
+        
+        if normaliseString(method) == "random":
+            
+            shuffled_indices = random_state.permutation(
+                number_of_new_examples)
+            
+            M_training_validation = int(fraction * number_of_new_examples)
+            M_training = int(fraction * M_training_validation)
+            
+            new_subset_indices = {
+                "training set": shuffled_indices[:M_training],
+                "validation set":
+                    shuffled_indices[M_training:M_training_validation],
+                "test set": shuffled_indices[M_training_validation:]
+            }
+        
+        elif normaliseString(method) == "macosko":
+            
+            minimum_number_of_non_zero_elements = 900
+            number_of_non_zero_elements = numpy.asarray(
+                (values != 0).sum(axis = 1)).reshape(-1)
+            
+            training_indices = numpy.nonzero(
+                number_of_non_zero_elements
+                > minimum_number_of_non_zero_elements
+            )[0]
+            
+            test_validation_indices = numpy.nonzero(
+                number_of_non_zero_elements
+                <= minimum_number_of_non_zero_elements
+            )[0]
+            
+            random_state.shuffle(test_validation_indices)
+            
+            V = int((1 - fraction) * len(test_validation_indices))
+            
+            new_subset_indices = {
+                "training set": training_indices,
+                "validation set": test_validation_indices[:V],
+                "test set": test_validation_indices[V:]
+            }
+        
+        new_values = {
+            "values": values,
+            "preprocessed values": preprocessed_values,
+            "binarised values": binarised_values,
+            "labels": labels,
+            "example names": example_names
+        }
+        
+        increment_dictionary = {"class names": class_names}
+        new_split_indices = {}
+        
+        for data_subset in split_data_subsets:
+            
+            indices = numpy.sort(new_subset_indices[data_subset])
+            
+            number_of_stored_examples = split_data_dictionary[data_subset][
+                "example names"].shape[0]
+            new_split_indices[data_subset] = numpy.arange(
+                number_of_stored_examples,
+                number_of_stored_examples + len(indices)
+            )
+            
+            increment_dictionary[data_subset] = {
+                key: subset_values[indices]
+                    if subset_values is not None else None
+                for key, subset_values in new_values.items()
+            }
+        
+        extending_duration = time() - extending_time_start
+        print("Split data sets extended with {} examples ({}).".format(
+            number_of_new_examples, formatDuration(extending_duration)))
+        print()
+        
+        if number_of_new_examples:
+            
+            increment_filename = "increment-{}{}".format(
+                len(increments_index["increments"]) + 1,
+                preprocessed_extension
+            )
+            
+            print("Saving increment of split data sets.")
+            saveDataDictionary(increment_dictionary, os.path.join(
+                increments_directory, increment_filename))
+            
+            # The increment is only added to the indices after it has been
+            # saved, so an interrupted save is ignored
+            
+            increments_index["increments"].append({
+                "filename": increment_filename,
+                "number of examples": {
+                    data_subset: len(new_split_indices[data_subset])
+                    for data_subset in split_data_subsets
+                }
+            })
+            saveSplitIncrementsIndex(increments_index, increments_directory)
+            
+            with open(example_names_path, "a") as example_names_file:
+                for example_name in new_values["example names"]:
+                    example_names_file.write(str(example_name) + "\n")
+            
+            print()
+            
+            appendToSplitDataDictionary(
+                split_data_dictionary, [increment_dictionary])
+        
+        training_set, validation_set, test_set = self.splitDataSets(
+            split_data_dictionary)
+        
+        return (training_set, validation_set, test_set), new_split_indices
+    
     def indicesForExampleNames(self, example_names):
         indices = []
         for example_name in example_names:
@@ -1580,7 +1939,8 @@ class DataSet(object):
         filter_indices = filter_indices[indices]
         self.update(
             values = self.values[filter_indices],
-            labels = self.labels[filter_indices],
+            labels = self.labels[filter_indices]
+                if self.labels is not None else None,
             example_names = self.example_names[filter_indices],
             feature_names = self.feature_names,
             class_names = self.class_names
@@ -1615,6 +1975,98 @@ class DataSet(object):
         self.number_of_examples = None
         self.number_of_features = None
         self.number_of_classes = None
+    
+    def exportToSharedMemory(self):
+        
+        if self.shared_memory_handle is not None:
+            return self.shared_memory_handle
+        
+        if not self.has_values:
+            raise ValueError(
+                "The {} set has to be loaded ".format(self.kind) +
+                "before it can be exported to shared memory."
+            )
+        
+        if self.feature_selection:
+            feature_selection = [self.feature_selection]
+            if self.feature_selection_parameters:
+                feature_selection += self.feature_selection_parameters
+        else:
+            feature_selection = []
+        
+        if self.example_filter:
+            example_filter = [self.example_filter]
+            if self.example_filter_parameters:
+                example_filter += self.example_filter_parameters
+        else:
+            example_filter = []
+        
+        segments = []
+        
+        try:
+            arrays = {
+                "values": exportValuesToSharedMemory(
+                    self.values, segments),
+                "preprocessed values": exportValuesToSharedMemory(
+                    self.preprocessed_values, segments),
+                "binarised values": exportValuesToSharedMemory(
+                    self.binarised_values, segments),
+                "count sum": exportArrayToSharedMemory(
+                    self.count_sum, segments),
+                "total standard deviations": exportArrayToSharedMemory(
+                    self.total_standard_deviations, segments),
+                "explained standard deviations": exportArrayToSharedMemory(
+                    self.explained_standard_deviations, segments),
+                "labels": exportArrayToSharedMemory(
+                    self.labels, segments),
+                "example names": exportArrayToSharedMemory(
+                    self.example_names, segments),
+                "feature names": exportArrayToSharedMemory(
+                    self.feature_names, segments)
+            }
+        except Exception:
+            releaseSharedArraySegments(segments, unlink = True)
+            raise
+        
+        self.shared_memory_handle = {
+            "name": self.name,
+            "directory": os.path.dirname(self.directory),
+            "kind": self.kind,
+            "version": self.version,
+            "class names": self.class_names,
+            "map features": self.map_features,
+            "features mapped": self.features_mapped,
+            "feature selection": feature_selection,
+            "example filter": example_filter,
+            "preprocessing methods": self.preprocessing_methods,
+            "noisy preprocessing methods": self.noisy_preprocessing_methods,
+            "split indices": self.split_indices,
+            "arrays": arrays
+        }
+        
+        # Segments are unlinked when released or when the data set is
+        # garbage-collected, whichever comes first
+        self.shared_memory_finaliser = weakref.finalize(
+            self, releaseSharedArraySegments, segments, True)
+        self.shared_memory_attached = False
+        
+        return self.shared_memory_handle
+    
+    def releaseSharedMemory(self):
+        
+        if self.shared_memory_finaliser is None:
+            return
+        
+        # Attached values are views of the segments, so they are removed
+        # before the segments are closed
+        if self.shared_memory_attached:
+            self.clear()
+        
+        self.shared_memory_finaliser()
+        
+        self.shared_memory_handle = None
+        self.shared_memory_finaliser = None
+        self.shared_memory_attached = False
 
 class SparseRowMatrix(scipy.sparse.csr_matrix):
     def __init__(self, arg1, shape = None, dtype = None, copy = False):
@@ -1647,21 +2099,53 @@ class SparseRowMatrix(scipy.sparse.csr_matrix):
     
     def var(self, axis = None, ddof = 0):
         
-        self_squared_mean = self.power(2).mean(axis)
-        self_mean_squared = numpy.power(self.mean(axis), 2)
+        if axis is None:
+            return moments(self, ddof = ddof, skip_sparsity = True)[
+                "variance"]
+        
+        # Squared deviations are only computed for stored elements, and
+        # the deviations of the zeros not stored are added afterwards
+        
+        if axis not in [0, 1, -1, -2]:
+            raise ValueError("Axis {} out of range.".format(axis))
+        
+        axis = axis % 2
+        M, N = self.shape
+        
+        if axis == 0:
+            indices = self.indices
+            size = M
+            length = N
+        else:
+            indices = numpy.repeat(numpy.arange(M), numpy.diff(self.indptr))
+            size = N
+            length = M
+        
+        data = numpy.asarray(self.data, numpy.float64)
         
-        var = self_squared_mean - self_mean_squared
+        sums = numpy.bincount(indices, weights = data, minlength = length)
+        non_zero_counts = numpy.bincount(indices, minlength = length)
+        means = sums / size
         
-        if ddof > 0:
-            size = numpy.prod(self.shape)
-            var = var * size / (size - ddof)
+        squared_deviations = numpy.bincount(
+            indices,
+            weights = numpy.square(data - means[indices]),
+            minlength = length
+        )
+        squared_deviations += (size - non_zero_counts) * numpy.square(means)
+        
+        var = squared_deviations / (size - ddof)
+        
+        if axis == 0:
+            var = numpy.matrix(var)
+        else:
+            var = numpy.matrix(var).T
         
         return var
 
 def standard_deviation(a, axis=None, ddof=0, batch_size=None):
-    if not isinstance(a, numpy.ndarray) or axis is not None \
-        or batch_size is None:
-            return a.std(axis=axis, ddof=ddof)
+    if axis is not None or batch_size is None:
+        return a.std(axis=axis, ddof=ddof)
     return numpy.sqrt(variance(
         a=a,
         axis=axis,
@@ -1671,54 +2155,319 @@ def standard_deviation(a, axis=None, ddof=0, batch_size=None):
 
 def variance(a, axis=None, ddof=0, batch_size=None):
     
-    if not isinstance(a, numpy.ndarray) or axis is not None \
-        or batch_size is None:
-            return a.var(axis=axis, ddof=ddof)
+    if axis is not None or batch_size is None:
+        return a.var(axis=axis, ddof=ddof)
     
-    number_of_rows = a.shape[0]
+    return moments(a, ddof=ddof, batch_size=batch_size,
+        skip_sparsity=True)["variance"]
+
+def sparsity(a, tolerance = 1e-3, batch_size=None):
+    return moments(a, tolerance=tolerance, batch_size=batch_size)["sparsity"]
+
+def moments(a, tolerance = 1e-3, ddof = 0, batch_size = None,
+    number_of_workers = None, skip_sparsity = False):
     
-    mean_squared = numpy.power(a.mean(axis=None), 2)
+    # Mean, variance, minimum, maximum, and sparsity of all elements of a
+    # dense, sparse, or on-disk matrix are computed in one pass over chunks
+    # of rows, which are summarised in parallel and combined using the
+    # pairwise update by Chan et al. to keep variances numerically stable
     
-    squared_sum = 0
+    if number_of_workers is None:
+        number_of_workers = os.cpu_count() or 1
     
-    for i in range(0, number_of_rows, batch_size):
-        squared_sum += numpy.power(a[i:i+batch_size], 2).sum()
+    number_of_rows = a.shape[0] if a.ndim > 1 else 1
     
-    squared_mean = squared_sum / a.size
+    if a.ndim < 2:
+        a = a.reshape(1, -1)
     
-    var = squared_mean - mean_squared
+    if batch_size is None:
+        batch_size = max(1, -(-number_of_rows // number_of_workers))
     
-    if ddof > 0:
-        size = a.size
-        var = var * size / (size - ddof)
+    def summariseChunk(i):
+        
+        chunk = a[i:i+batch_size]
+        
+        if scipy.sparse.issparse(chunk):
+            chunk_data = numpy.asarray(chunk.data, numpy.float64)
+            chunk_size = chunk.shape[0] * chunk.shape[1]
+        else:
+            chunk_data = numpy.asarray(chunk, numpy.float64).reshape(-1)
+            chunk_size = chunk_data.size
+        
+        # Elements not stored in sparse chunks are zeros
+        number_of_zeros = chunk_size - chunk_data.size
+        
+        chunk_mean = chunk_data.sum() / chunk_size
+        chunk_squared_deviations = numpy.square(chunk_data - chunk_mean).sum() \
+            + number_of_zeros * chunk_mean ** 2
+        
+        if chunk_data.size:
+            chunk_minimum = chunk_data.min()
+            chunk_maximum = chunk_data.max()
+        else:
+            chunk_minimum = chunk_maximum = 0
+        
+        if number_of_zeros:
+            chunk_minimum = min(chunk_minimum, 0)
+            chunk_maximum = max(chunk_maximum, 0)
+        
+        if skip_sparsity:
+            chunk_non_zero_count = 0
+        else:
+            chunk_non_zero_count = (chunk_data >= tolerance).sum()
+            if tolerance <= 0:
+                chunk_non_zero_count += number_of_zeros
+        
+        return (chunk_size, chunk_mean, chunk_squared_deviations,
+            chunk_minimum, chunk_maximum, chunk_non_zero_count)
+    
+    chunk_starts = range(0, number_of_rows, batch_size)
     
-    return var
+    if number_of_workers > 1 and len(chunk_starts) > 1:
+        with ThreadPoolExecutor(max_workers = number_of_workers) as executor:
+            chunk_summaries = list(executor.map(summariseChunk, chunk_starts))
+    else:
+        chunk_summaries = list(map(summariseChunk, chunk_starts))
+    
+    size = 0
+    mean = 0.0
+    squared_deviations = 0.0
+    minimum = numpy.inf
+    maximum = -numpy.inf
+    non_zero_count = 0
+    
+    for (chunk_size, chunk_mean, chunk_squared_deviations,
+        chunk_minimum, chunk_maximum, chunk_non_zero_count) \
+        in chunk_summaries:
+        
+        combined_size = size + chunk_size
+        delta = chunk_mean - mean
+        
+        mean += delta * chunk_size / combined_size
+        squared_deviations += chunk_squared_deviations \
+            + delta ** 2 * size * chunk_size / combined_size
+        size = combined_size
+        
+        minimum = min(minimum, chunk_minimum)
+        maximum = max(maximum, chunk_maximum)
+        non_zero_count += chunk_non_zero_count
+    
+    a_moments = {
+        "mean": mean,
+        "variance": squared_deviations / (size - ddof),
+        "minimum": minimum,
+        "maximum": maximum,
+        "sparsity": numpy.nan if skip_sparsity
+            else 1 - non_zero_count / size
+    }
+    
+    return a_moments
 
-def sparsity(a, tolerance = 1e-3, batch_size=None):
+# Shared memory
 
-    def count_nonzero_values(b):
-        return (b >= tolerance).sum()
+def attachSharedDataSet(handle):
+    
+    segments = []
+    arrays = handle["arrays"]
+    
+    try:
+        attached_arrays = {
+            "values": attachValuesFromSharedMemory(
+                arrays["values"], segments),
+            "preprocessed values": attachValuesFromSharedMemory(
+                arrays["preprocessed values"], segments),
+            "binarised values": attachValuesFromSharedMemory(
+                arrays["binarised values"], segments)
+        }
+        for array_name in ["count sum", "total standard deviations",
+            "explained standard deviations", "labels",
+            "example names", "feature names"]:
+            attached_arrays[array_name] = attachArrayFromSharedMemory(
+                arrays[array_name], segments)
+    except Exception:
+        releaseSharedArraySegments(segments)
+        raise
+    
+    data_set = DataSet(
+        handle["name"],
+        values = attached_arrays["values"],
+        count_sum = attached_arrays["count sum"],
+        total_standard_deviations = \
+            attached_arrays["total standard deviations"],
+        explained_standard_deviations = \
+            attached_arrays["explained standard deviations"],
+        preprocessed_values = attached_arrays["preprocessed values"],
+        binarised_values = attached_arrays["binarised values"],
+        labels = attached_arrays["labels"],
+        class_names = handle["class names"],
+        example_names = attached_arrays["example names"],
+        feature_names = attached_arrays["feature names"],
+        map_features = handle["map features"],
+        features_mapped = handle["features mapped"],
+        feature_selection = handle["feature selection"],
+        example_filter = handle["example filter"],
+        preprocessing_methods = handle["preprocessing methods"],
+        noisy_preprocessing_methods = handle["noisy preprocessing methods"],
+        kind = handle["kind"],
+        version = handle["version"],
+        directory = handle["directory"]
+    )
+    
+    data_set.split_indices = handle["split indices"]
+    
+    # Segments are only closed (not unlinked), since the exporting
+    # process owns them
+    data_set.shared_memory_handle = handle
+    data_set.shared_memory_finaliser = weakref.finalize(
+        data_set, releaseSharedArraySegments, segments, False)
+    data_set.shared_memory_attached = True
+    
+    return data_set
 
-    if scipy.sparse.issparse(a):
-        size = numpy.prod(a.shape)
+def exportValuesToSharedMemory(values, segments):
+    
+    if values is None:
+        return None
+    
+    if scipy.sparse.issparse(values):
+        values = values.tocsr()
+        description = {
+            "kind": "sparse",
+            "shape": values.shape
+        }
+        for attribute in ("data", "indices", "indptr"):
+            description[attribute] = exportArrayToSharedMemory(
+                getattr(values, attribute), segments)
     else:
-        size = a.size
-
-    if batch_size:
-
-        number_of_rows = a.shape[0]
+        description = {
+            "kind": "dense",
+            "array": exportArrayToSharedMemory(values, segments)
+        }
+    
+    return description
 
-        nonzero_count = 0
+def attachValuesFromSharedMemory(description, segments):
+    
+    if description is None:
+        return None
+    
+    if description["kind"] == "sparse":
+        values = SparseRowMatrix(
+            tuple(
+                attachArrayFromSharedMemory(description[attribute], segments)
+                for attribute in ("data", "indices", "indptr")
+            ),
+            shape = description["shape"]
+        )
+    else:
+        values = attachArrayFromSharedMemory(description["array"], segments)
+    
+    return values
 
-        for i in range(0, number_of_rows, batch_size):
-            nonzero_count += count_nonzero_values(a[i:i+batch_size])
+def exportArrayToSharedMemory(array, segments):
+    
+    if array is None:
+        return None
+    
+    array = numpy.ascontiguousarray(array)
+    
+    # Objects cannot be shared, so strings are stored with a fixed width
+    if array.dtype == object:
+        array = array.astype("U")
+    
+    segment = SharedArraySegment(size = array.nbytes)
+    segments.append(segment)
+    
+    shared_array = numpy.ndarray(array.shape, dtype = array.dtype,
+        buffer = segment.buffer)
+    shared_array[...] = array
+    
+    description = {
+        "name": segment.name,
+        "shape": array.shape,
+        "dtype": array.dtype.str
+    }
+    
+    return description
 
-    else:
-        nonzero_count = count_nonzero_values(a)
+def attachArrayFromSharedMemory(description, segments):
+    
+    if description is None:
+        return None
+    
+    segment = SharedArraySegment(name = description["name"])
+    segments.append(segment)
+    
+    array = numpy.ndarray(description["shape"],
+        dtype = numpy.dtype(description["dtype"]), buffer = segment.buffer)
+    array.flags.writeable = False
+    
+    return array
 
-    a_sparsity = 1 - nonzero_count / size
+def releaseSharedArraySegments(segments, unlink = False):
+    for segment in segments:
+        if unlink:
+            segment.unlink()
+        segment.close()
+    segments.clear()
 
-    return a_sparsity
+class SharedArraySegment(object):
+    """Shared-memory segment holding the buffer of a single array.
+    
+    POSIX shared memory is used through `multiprocessing.shared_memory`
+    when available (Python 3.8 and newer). Otherwise, the segment is a
+    memory-mapped file in `/dev/shm` (or the temporary directory).
+    """
+    def __init__(self, name = None, size = None):
+        
+        self.owner = name is None
+        
+        if self.owner:
+            # Empty segments are not allowed
+            size = max(size, 1)
+        
+        if shared_memory:
+            if self.owner:
+                self.segment = shared_memory.SharedMemory(
+                    create = True, size = size)
+            else:
+                self.segment = shared_memory.SharedMemory(name = name)
+            self.name = self.segment.name
+            self.buffer = self.segment.buf
+        
+        else:
+            if self.owner:
+                if os.path.isdir(shared_memory_directory):
+                    directory = shared_memory_directory
+                else:
+                    directory = None
+                file_descriptor, name = tempfile.mkstemp(
+                    prefix = "scvae-", dir = directory)
+                os.ftruncate(file_descriptor, size)
+            else:
+                file_descriptor = os.open(name, os.O_RDWR)
+            self.name = name
+            self.segment = mmap.mmap(file_descriptor, 0)
+            os.close(file_descriptor)
+            self.buffer = self.segment
+    
+    def close(self):
+        self.buffer = None
+        try:
+            self.segment.close()
+        except BufferError:
+            # Arrays still use the segment, which is then unmapped when
+            # these are garbage-collected or the process exits
+            pass
+    
+    def unlink(self):
+        try:
+            if shared_memory:
+                self.segment.unlink()
+            else:
+                os.remove(self.name)
+        except FileNotFoundError:
+            pass
 
 def parseInput(input_file_or_name):
     
@@ -2222,8 +2971,42 @@ def mapFeatures(values, feature_IDs, feature_mapping):
     
     return aggregated_values, feature_names
 
+def alignFeatures(values, feature_names, target_feature_names):
+    
+    # Columns of values are reordered to match the target feature names
+    # using a sparse selection matrix, and target features not among the
+    # feature names are zero
+    
+    feature_index_from_name = {
+        feature_name: i for i, feature_name in enumerate(feature_names)
+    }
+    
+    source_indices = []
+    target_indices = []
+    
+    for target_index, feature_name in enumerate(target_feature_names):
+        if feature_name in feature_index_from_name:
+            source_indices.append(feature_index_from_name[feature_name])
+            target_indices.append(target_index)
+    
+    number_of_missing_features = len(target_feature_names) \
+        - len(target_indices)
+    
+    selection_matrix = scipy.sparse.csr_matrix(
+        (
+            numpy.ones(len(target_indices), values.dtype),
+            (source_indices, target_indices)
+        ),
+        shape = (len(feature_names), len(target_feature_names))
+    )
+    
+    aligned_values = scipy.sparse.csr_matrix(values).dot(selection_matrix)
+    
+    return aligned_values, number_of_missing_features
+
 def selectFeatures(values_dictionary, feature_names, feature_selection = None,
-    feature_selection_parameters = None, preprocessPath = None):
+    feature_selection_parameters = None, preprocessPath = None,
+    summary_statistics = None):
     
     feature_selection = normaliseString(feature_selection)
     
@@ -2235,14 +3018,17 @@ def selectFeatures(values_dictionary, feature_names, feature_selection = None,
     
     M, N = values.shape
     
+    # Feature sums, variances, and Gini indices are computed from summary
+    # statistics, which can be precomputed for all thresholds
+    if summary_statistics is None:
+        summary_statistics = computeSummaryStatistics(values)
+    
     if feature_selection == "remove_zeros":
-        total_feature_sum = values.sum(axis = 0)
-        if isinstance(total_feature_sum, numpy.matrix):
-            total_feature_sum = total_feature_sum.A.squeeze()
+        total_feature_sum = summary_statistics["feature sums"]
         indices = total_feature_sum != 0
     
     elif feature_selection == "keep_gini_indices_above":
-        gini_indices = loadWeights(values, "gini", preprocessPath)
+        gini_indices = summaryGiniIndices(summary_statistics, values)
         if feature_selection_parameters:
             threshold = float(feature_selection_parameters[0])
         else:
@@ -2250,7 +3036,7 @@ def selectFeatures(values_dictionary, feature_names, feature_selection = None,
         indices = gini_indices > threshold
 
     elif feature_selection == "keep_highest_gini_indices":
-        gini_indices = loadWeights(values, "gini", preprocessPath)
+        gini_indices = summaryGiniIndices(summary_statistics, values)
         gini_sorted_indices = numpy.argsort(gini_indices)
         if feature_selection_parameters:
             number_to_keep = int(feature_selection_parameters[0])
@@ -2259,9 +3045,7 @@ def selectFeatures(values_dictionary, feature_names, feature_selection = None,
         indices = numpy.sort(gini_sorted_indices[-number_to_keep:])
         
     elif feature_selection == "keep_variances_above":
-        variances = values.var(axis = 0)
-        if isinstance(variances, numpy.matrix):
-            variances = variances.A.squeeze()
+        variances = summaryVariances(summary_statistics)
         if feature_selection_parameters:
             threshold = float(feature_selection_parameters[0])
         else:
@@ -2269,9 +3053,7 @@ def selectFeatures(values_dictionary, feature_names, feature_selection = None,
         indices = variances > threshold
 
     elif feature_selection == "keep_highest_variances":
-        variances = values.var(axis = 0)
-        if isinstance(variances, numpy.matrix):
-            variances = variances.A.squeeze()
+        variances = summaryVariances(summary_statistics)
         variance_sorted_indices = numpy.argsort(variances)
         if feature_selection_parameters:
             number_to_keep = int(feature_selection_parameters[0])
@@ -2344,7 +3126,8 @@ def defaultFeatureParameters(feature_selection = None,
 def filterExamples(values_dictionary, example_names, example_filter = None,
     example_filter_parameters = None, labels = None, excluded_classes = None,
     superset_labels = None, excluded_superset_classes = None,
-    count_sum = None):
+    count_sum = None, summary_statistics = None,
+    require_filtered_examples = True):
     
     print("Filtering examples.")
     start_time = time()
@@ -2369,16 +3152,25 @@ def filterExamples(values_dictionary, example_names, example_filter = None,
     
     filter_indices = numpy.arange(M)
     
+    # Numbers of non-zero elements and count sums for examples are taken
+    # from summary statistics, which can be precomputed for all thresholds
+    if summary_statistics is None \
+        and example_filter in ["macosko", "inverse_macosko"] \
+        or count_sum is None and example_filter == "remove_count_sum_above":
+        summary_statistics = computeSummaryStatistics(values)
+    
     if example_filter == "macosko":
         minimum_number_of_non_zero_elements = 900
-        number_of_non_zero_elements = (values != 0).sum(axis = 1)
+        number_of_non_zero_elements = \
+            summary_statistics["example non-zero counts"]
         filter_indices = numpy.nonzero(
             number_of_non_zero_elements > minimum_number_of_non_zero_elements
         )[0]
     
     elif example_filter == "inverse_macosko":
         maximum_number_of_non_zero_elements = 900
-        number_of_non_zero_elements = (values != 0).sum(axis = 1)
+        number_of_non_zero_elements = \
+            summary_statistics["example non-zero counts"]
         filter_indices = numpy.nonzero(
             number_of_non_zero_elements <= maximum_number_of_non_zero_elements
         )[0]
@@ -2418,9 +3210,12 @@ def filterExamples(values_dictionary, example_names, example_filter = None,
     
     elif example_filter == "remove_count_sum_above":
         threshold = int(example_filter_parameters[0])
+        if count_sum is None:
+            count_sum = summary_statistics["example count sums"]
         filter_indices = filter_indices[count_sum.reshape(-1) <= threshold]
     
-    if example_filter and len(filter_indices) == M:
+    if require_filtered_examples and example_filter \
+        and len(filter_indices) == M:
         raise ValueError("No examples filtered out using example filter. Exiting.")
     
     example_filtered_values = {}
@@ -2653,6 +3448,92 @@ def splitDataSet(data_dictionary, method = "default", fraction = 0.9):
     
     return split_data_dictionary
 
+def replayIndices(number_of_examples, new_indices, replay_ratio = 1.0,
+    seed = 42):
+    
+    # Indices of the new examples together with a random sample of the
+    # earlier examples, the size of which is proportional to the number of
+    # new examples
+    
+    random_state = numpy.random.RandomState(seed)
+    
+    earlier_indices = numpy.setdiff1d(
+        numpy.arange(number_of_examples), new_indices)
+    
+    number_of_replayed_examples = min(
+        len(earlier_indices),
+        int(round(replay_ratio * len(new_indices)))
+    )
+    
+    replayed_indices = random_state.choice(
+        earlier_indices,
+        size = number_of_replayed_examples,
+        replace = False
+    )
+    
+    indices = numpy.sort(numpy.concatenate([new_indices, replayed_indices]))
+    
+    return indices
+
+def loadSplitIncrementsIndex(increments_directory):
+    
+    index_path = os.path.join(
+        increments_directory, split_increments_index_filename)
+    
+    if os.path.isfile(index_path):
+        with open(index_path, "r") as index_file:
+            increments_index = json.load(index_file)
+    else:
+        increments_index = {"increments": []}
+    
+    return increments_index
+
+def saveSplitIncrementsIndex(increments_index, increments_directory):
+    
+    if not os.path.exists(increments_directory):
+        os.makedirs(increments_directory)
+    
+    index_path = os.path.join(
+        increments_directory, split_increments_index_filename)
+    temporary_index_path = index_path + ".tmp"
+    
+    with open(temporary_index_path, "w") as index_file:
+        json.dump(increments_index, index_file, indent = 4)
+    
+    os.replace(temporary_index_path, index_path)
+
+def appendToSplitDataDictionary(split_data_dictionary,
+                                increment_dictionaries):
+    
+    # Each key of each split data set is concatenated once for all
+    # increments
+    
+    for data_subset in split_data_subsets:
+        
+        subset_dictionary = split_data_dictionary[data_subset]
+        
+        for key, stored_values in subset_dictionary.items():
+            
+            if stored_values is None:
+                continue
+            
+            increment_values = [
+                increment_dictionary[data_subset][key]
+                for increment_dictionary in increment_dictionaries
+            ]
+            
+            if scipy.sparse.issparse(stored_values):
+                subset_dictionary[key] = SparseRowMatrix(scipy.sparse.vstack(
+                    [stored_values] + increment_values, format = "csr"))
+            else:
+                subset_dictionary[key] = numpy.concatenate(
+                    [stored_values] + increment_values)
+    
+    for increment_dictionary in increment_dictionaries:
+        if increment_dictionary.get("class names") is not None:
+            split_data_dictionary["class names"] = \
+                increment_dictionary["class names"]
+
 def decomposeDataSubsets(*subsets, method=None, number_of_components=None,
                       random=False):
     
@@ -3957,6 +4838,120 @@ def computeInverseGlobalFrequencyWeights(data):
     
     return idf_weights
 
+## Summary statistics
+def loadSummaryStatistics(values, path = None):
+    
+    # Summary statistics are stored alongside the data set, so selecting
+    # features and filtering examples using different thresholds does not
+    # require another pass over the values
+    
+    summary_statistics = None
+    
+    if path and os.path.isfile(path):
+        print("Loading summary statistics.")
+        summary_statistics = loadDataDictionary(path)
+        
+        if "feature sums" not in summary_statistics \
+            or summary_statistics["example count sums"].shape[0] \
+                != values.shape[0]:
+            summary_statistics = None
+    
+    if summary_statistics is None:
+        summary_statistics = computeSummaryStatistics(values)
+        
+        if path:
+            print("Saving summary statistics.")
+            saveDataDictionary(summary_statistics, path)
+    
+    # Path is kept, so statistics computed later can be stored as well
+    summary_statistics["path"] = path
+    
+    return summary_statistics
+
+def computeSummaryStatistics(values, batch_size = 10000):
+    
+    # Sums, squared sums, and numbers of non-zero elements for each feature
+    # as well as count sums and numbers of non-zero elements for each example
+    # are computed in one pass over batches of rows
+    
+    print("Computing summary statistics.")
+    start_time = time()
+    
+    M, N = values.shape
+    
+    feature_sums = numpy.zeros(N)
+    feature_squared_sums = numpy.zeros(N)
+    feature_non_zero_counts = numpy.zeros(N, numpy.int64)
+    
+    example_count_sums = numpy.zeros(M)
+    example_non_zero_counts = numpy.zeros(M, numpy.int64)
+    
+    for i in range(0, M, batch_size):
+        
+        batch = scipy.sparse.csr_matrix(values[i:i+batch_size],
+            dtype = numpy.float64)
+        batch.eliminate_zeros()
+        
+        feature_sums += numpy.bincount(batch.indices,
+            weights = batch.data, minlength = N)
+        feature_squared_sums += numpy.bincount(batch.indices,
+            weights = numpy.square(batch.data), minlength = N)
+        feature_non_zero_counts += numpy.bincount(batch.indices,
+            minlength = N)
+        
+        number_of_rows = batch.shape[0]
+        row_indices = numpy.repeat(numpy.arange(number_of_rows),
+            numpy.diff(batch.indptr))
+        
+        example_count_sums[i:i+number_of_rows] = numpy.bincount(
+            row_indices, weights = batch.data, minlength = number_of_rows)
+        example_non_zero_counts[i:i+number_of_rows] = numpy.diff(
+            batch.indptr)
+    
+    summary_statistics = {
+        "feature sums": feature_sums,
+        "feature squared sums": feature_squared_sums,
+        "feature non-zero counts": feature_non_zero_counts,
+        "example count sums": example_count_sums,
+        "example non-zero counts": example_non_zero_counts
+    }
+    
+    duration = time() - start_time
+    print("Summary statistics computed ({}).".format(
+        formatDuration(duration)))
+    
+    return summary_statistics
+
+def summaryVariances(summary_statistics):
+    
+    M = summary_statistics["example count sums"].shape[0]
+    
+    feature_means = summary_statistics["feature sums"] / M
+    feature_squared_means = summary_statistics["feature squared sums"] / M
+    
+    variances = feature_squared_means - numpy.square(feature_means)
+    variances = numpy.clip(variances, 0, None)
+    
+    return variances
+
+def summaryGiniIndices(summary_statistics, values):
+    
+    # Gini indices require sorting the values of each feature, so they are
+    # only computed when needed and then added to the stored statistics
+    
+    if "gini indices" not in summary_statistics:
+        
+        summary_statistics["gini indices"] = computeGiniIndices(values)
+        
+        path = summary_statistics.pop("path", None)
+        
+        if path:
+            print("Saving summary statistics.")
+            saveDataDictionary(summary_statistics, path)
+            summary_statistics["path"] = path
+    
+    return summary_statistics["gini indices"]
+
 def supersetLabels(labels, label_superset):
     
     if not label_superset:
@@ -4003,17 +4998,26 @@ def supersetClassPalette(class_palette, label_superset):
 GENERAL_CLASS_NAMES = ["Others", "Unknown", "No class", "Remaining"]
 
 def createLabelSorter(sorted_class_names = []):
+    return LabelSorter(sorted_class_names)
+
+class LabelSorter(object):
+    
+    # A class instead of a closure, so label sorters can be pickled and sent
+    # to worker processes
     
-    def labelSorter(label):
+    def __init__(self, sorted_class_names = []):
+        self.sorted_class_names = sorted_class_names
+    
+    def __call__(self, label):
         
         label = str(label)
         
-        K = len(sorted_class_names)
+        K = len(self.sorted_class_names)
         L = len(GENERAL_CLASS_NAMES)
         index_width = len(str(K+L))
         
-        if label in sorted_class_names:
-            index = sorted_class_names.index(label)
+        if label in self.sorted_class_names:
+            index = self.sorted_class_names.index(label)
         elif label in GENERAL_CLASS_NAMES:
             index = K + GENERAL_CLASS_NAMES.index(label)
         else:
@@ -4022,8 +5026,6 @@ def createLabelSorter(sorted_class_names = []):
         label =  "{:{}d} {}".format(index, index_width, label)
         
         return label
-    
-    return labelSorter
 
 def directory(base_directory, data_set, splitting_method, splitting_fraction,
     preprocessing = True):
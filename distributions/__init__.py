@@ -30,6 +30,9 @@ from distributions.exponentially_modified_normal import (
     ExponentiallyModifiedNormal
 )
 from distributions.lomax import Lomax
+from distributions.mixture_of_diagonal_normals import (
+    MixtureOfDiagonalNormals
+)
 
 distributions = {
     "gaussian": {
@@ -88,11 +91,10 @@ distributions = {
                 "initial value": tf.zeros
             }
         },
-        "class": lambda theta: tensorflow_distributions.Mixture(
-            cat = tensorflow_distributions.Categorical(logits = theta["logits"]), 
-            components = [tensorflow_distributions.MultivariateNormalDiag(
-                loc = m, scale_diag = tf.exp(s)) for m, s in 
-                zip(theta["mus"], theta["log_sigmas"])]
+        "class": lambda theta: MixtureOfDiagonalNormals(
+            logits = theta["logits"],
+            locs = tf.stack(theta["mus"], axis = -2),
+            scale_diags = tf.exp(tf.stack(theta["log_sigmas"], axis = -2))
         )
     },
 
@@ -55,6 +55,8 @@ from tensorflow.python.ops import data_flow_ops
 from tensorflow.python.ops import math_ops
 from tensorflow.python.ops import nn_ops
 
+from distributions.utilities import gather_distribution
+
 
 class Categorized(distribution.Distribution):
   """categorized distribution.
@@ -161,6 +163,8 @@ class Categorized(distribution.Distribution):
       self._cat = cat
       self._dist = dist
       self._K = self._static_cat_event_size - 1
+      # Counts of the categorical classes, 0, 1, ..., K - 1
+      self._categories = math_ops.range(self._K, dtype=dtype)
       self._static_event_shape = static_event_shape
       self._static_batch_shape = static_batch_shape
 
@@ -207,30 +211,28 @@ class Categorized(distribution.Distribution):
 
   def _mean(self):
     with ops.control_dependencies(self._assertions):
-      # List of batch tensors for categorical probabilities, pi_k.  
+      # Batch tensor of categorical probabilities, pi_k.
       cat_probs = self._cat_probs(log_probs = False)
-      # Individual contributions to categorical mean: k * pi_k
-      cat_means = [k * cat_probs[k] for k in range(self.K)]
       # E_cat[x] = \sum^{K-1}_k k * pi_k
-      cat_mean = math_ops.add_n(cat_means)
+      cat_mean = math_ops.reduce_sum(
+        cat_probs[..., :-1] * self._categories, axis=-1)
 
       # Scaled count distribution mean shifted by K: pi_K * (E_dist[x] + K) 
-      dist_mean = cat_probs[-1] * (self._dist.mean() + self.K)
+      dist_mean = cat_probs[..., -1] * (self._dist.mean() + self.K)
 
       return cat_mean + dist_mean
 
   def _variance(self):
     with ops.control_dependencies(self._assertions):
-      # List of batch tensors for categorical probabilities, pi_k.  
+      # Batch tensor of categorical probabilities, pi_k.
       cat_probs = self._cat_probs(log_probs = False)
-      # Individual contributions to categorical 2nd moment: k^2 * pi_k
-      cat_2nd_moments = [k**2 * cat_probs[k] for k in range(self.K)]
-      # E_cat[x] = \sum^{K-1}_k k^2 * pi_k
-      cat_2nd_moment = math_ops.add_n(cat_2nd_moments)
+      # E_cat[x^2] = \sum^{K-1}_k k^2 * pi_k
+      cat_2nd_moment = math_ops.reduce_sum(
+        cat_probs[..., :-1] * math_ops.square(self._categories), axis=-1)
 
       # Scaled count distribution 2nd moment shifted by K: 
       #    pi_K * (2*K*E_dist[x] + V_dist[x] + E_dist[x]^2 + K^2) 
-      dist_2nd_moment = cat_probs[-1] * \
+      dist_2nd_moment = cat_probs[..., -1] * \
         (
           2 * self.K * self._dist.mean() +\
           self._dist.variance() +\
@@ -244,20 +246,28 @@ class Categorized(distribution.Distribution):
   def _log_prob(self, x):
     with ops.control_dependencies(self._assertions):
       x = ops.convert_to_tensor(x, name="x")
+      # `x` can be shared across leading sample dimensions of the
+      # parameters, so it is broadcast to their shape
+      shape = self.batch_shape_tensor()
+      x = x + array_ops.zeros(shape, dtype=x.dtype)
       cat_log_prob = self._cat.log_prob(math_ops.cast(clip_ops.clip_by_value(x, 0, self.K), dtypes.int32))
-      return where(x < self.K, cat_log_prob, 
-        cat_log_prob + self._dist.log_prob(x - self.K))
+
+      # The count distribution is only evaluated for x >= K, and the
+      # results are scattered back
+      count_indices = array_ops.where(x >= self.K)
+      x_count = array_ops.gather_nd(x, count_indices)
+      dist_count = gather_distribution(self._dist, count_indices, shape)
+      dist_log_prob = array_ops.scatter_nd(
+        count_indices,
+        dist_count.log_prob(x_count - self.K),
+        math_ops.cast(shape, count_indices.dtype))
+
+      return cat_log_prob + dist_log_prob
 
   def _prob(self, x):
     return math_ops.exp(self._log_prob(x))
 
   def _cat_probs(self, log_probs):
-    """Get a list of num_classes batchwise probabilities."""
+    """Get batchwise probabilities with num_classes as the last axis."""
     which_softmax = nn_ops.log_softmax if log_probs else nn_ops.softmax
-    cat_probs = which_softmax(self.cat.logits)
-    cat_probs = array_ops.unstack(
-      cat_probs,
-      num=self._static_cat_event_size,
-      axis=-1
-    )
-    return cat_probs
+    return which_softmax(self.cat.logits)
@@ -0,0 +1,232 @@
+# ======================================================================== #
+# 
+# Copyright (c) 2017 - 2018 scVAE authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# ======================================================================== #
+
+"""The MixtureOfDiagonalNormals distribution class."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy as np
+
+from tensorflow.python.framework import ops
+from tensorflow.python.ops import array_ops
+from tensorflow.python.ops import check_ops
+from tensorflow.python.ops import math_ops
+from tensorflow.python.ops import nn_ops
+from tensorflow.python.ops import random_ops
+from tensorflow.python.ops.distributions import categorical
+from tensorflow.python.ops.distributions import distribution
+
+
+__all__ = [
+    "MixtureOfDiagonalNormals",
+]
+
+
+class MixtureOfDiagonalNormals(distribution.Distribution):
+  """Mixture of multivariate normal distributions with diagonal covariances.
+
+  The components are stacked on the second-to-last axis of `locs` and
+  `scale_diags`, so that `locs[..., k, :]` is the mean of component `k`,
+  and the mixture weights are given by `logits[..., k]`. All components are
+  evaluated together, and the log-probability of the mixture is a single
+  log-sum-exp over the component axis.
+
+  #### Mathematical Details
+
+  ```none
+  log pdf(x) = logsumexp_k(log pi_k + log Z_k - 0.5 * ||(x - mu_k) / sigma_k||**2)
+  log Z_k = -0.5 * D * log(2 pi) - sum(log sigma_k)
+  ```
+
+  where `pi = softmax(logits)`, `mu_k = locs[..., k, :]`, and
+  `sigma_k = scale_diags[..., k, :]`. The log-normalisers `log Z_k` and the
+  log-weights `log pi_k` are computed once when the distribution is
+  created and reused for every evaluation.
+
+  Methods supported include `log_prob`, `prob`, `mean`, `variance`,
+  `sample`, and `component_log_prob`.
+  """
+
+  def __init__(self,
+               logits,
+               locs,
+               scale_diags,
+               validate_args=False,
+               allow_nan_stats=True,
+               name="MixtureOfDiagonalNormals"):
+    """Initialize a mixture of diagonal normal distributions.
+
+    Args:
+      logits: Floating-point `Tensor` with shape `[..., K]` of unnormalised
+        log-probabilities of the `K` components.
+      locs: Floating-point `Tensor` with shape `[..., K, D]` of the means of
+        the components.
+      scale_diags: Floating-point `Tensor` with shape `[..., K, D]` of the
+        standard deviations of the components.
+      validate_args: Python `bool`, default `False`. When `True` distribution
+        parameters are checked for validity despite possibly degrading
+        runtime performance. When `False` invalid inputs may silently render
+        incorrect outputs.
+      allow_nan_stats: Python `bool`, default `True`. When `True`, statistics
+        (e.g., mean, mode, variance) use the value "`NaN`" to indicate the
+        result is undefined. When `False`, an exception is raised if one or
+        more of the statistic's batch members are undefined.
+      name: Python `str` name prefixed to Ops created by this class.
+    """
+    parameters = locals()
+    with ops.name_scope(name, values=[logits, locs, scale_diags]):
+      with ops.control_dependencies([check_ops.assert_positive(scale_diags)]
+                                    if validate_args else []):
+        self._logits = array_ops.identity(logits, name="logits")
+        self._locs = array_ops.identity(locs, name="locs")
+        self._scale_diags = array_ops.identity(scale_diags,
+                                               name="scale_diags")
+        check_ops.assert_same_float_dtype(
+            [self._logits, self._locs, self._scale_diags])
+
+        self._cat = categorical.Categorical(logits=self._logits)
+
+        # Cached for all evaluations of the distribution
+        self._log_weights = nn_ops.log_softmax(self._logits)
+        event_size = math_ops.cast(
+            array_ops.shape(self._locs)[-1], self._locs.dtype)
+        self._log_normalisers = (
+            -0.5 * event_size * np.log(2. * np.pi)
+            - math_ops.reduce_sum(math_ops.log(self._scale_diags), axis=-1))
+
+    super(MixtureOfDiagonalNormals, self).__init__(
+        dtype=self._locs.dtype,
+        validate_args=validate_args,
+        allow_nan_stats=allow_nan_stats,
+        reparameterization_type=distribution.NOT_REPARAMETERIZED,
+        parameters=parameters,
+        graph_parents=[self._logits, self._locs, self._scale_diags],
+        name=name)
+
+  @property
+  def logits(self):
+    """Unnormalised log-probabilities of the components."""
+    return self._logits
+
+  @property
+  def locs(self):
+    """Means of the components stacked on the second-to-last axis."""
+    return self._locs
+
+  @property
+  def scale_diags(self):
+    """Standard deviations of the components."""
+    return self._scale_diags
+
+  @property
+  def cat(self):
+    """Categorical distribution over the components."""
+    return self._cat
+
+  @property
+  def log_normalisers(self):
+    """Log-normalisers of the components."""
+    return self._log_normalisers
+
+  def _batch_shape_tensor(self):
+    return array_ops.broadcast_dynamic_shape(
+        array_ops.shape(self._logits)[:-1],
+        array_ops.broadcast_dynamic_shape(
+            array_ops.shape(self._locs)[:-2],
+            array_ops.shape(self._scale_diags)[:-2]))
+
+  def _batch_shape(self):
+    return array_ops.broadcast_static_shape(
+        self._logits.get_shape()[:-1],
+        array_ops.broadcast_static_shape(
+            self._locs.get_shape()[:-2],
+            self._scale_diags.get_shape()[:-2]))
+
+  def _event_shape_tensor(self):
+    return array_ops.shape(self._locs)[-1:]
+
+  def _event_shape(self):
+    return self._locs.get_shape().with_rank_at_least(2)[-1:]
+
+  def component_log_prob(self, x, name="component_log_prob"):
+    """Log-probabilities of `x` under each component.
+
+    Args:
+      x: `Tensor` with shape `[..., K, D]` or `[..., 1, D]` of values for
+        each of the components.
+      name: Python `str` prepended to names of ops created by this function.
+
+    Returns:
+      `Tensor` with shape `[..., K]`.
+    """
+    with ops.name_scope(self.name):
+      with ops.name_scope(name, values=[x]):
+        x = ops.convert_to_tensor(x, name="x")
+        standardised_x = (x - self._locs) / self._scale_diags
+        return self._log_normalisers - 0.5 * math_ops.reduce_sum(
+            math_ops.square(standardised_x), axis=-1)
+
+  def _log_prob(self, x):
+    x = ops.convert_to_tensor(x, name="x")
+    component_log_probs = self.component_log_prob(
+        array_ops.expand_dims(x, -2))
+    return math_ops.reduce_logsumexp(
+        self._log_weights + component_log_probs, axis=-1)
+
+  def _prob(self, x):
+    return math_ops.exp(self._log_prob(x))
+
+  def _mean(self):
+    weights = array_ops.expand_dims(nn_ops.softmax(self._logits), -1)
+    return math_ops.reduce_sum(weights * self._locs, axis=-2)
+
+  def _variance(self):
+    # V[x] = E_k[V[x|k] + E[x|k]^2] - E[x]^2
+    weights = array_ops.expand_dims(nn_ops.softmax(self._logits), -1)
+    second_moment = math_ops.reduce_sum(
+        weights * (math_ops.square(self._scale_diags)
+                   + math_ops.square(self._locs)),
+        axis=-2)
+    return second_moment - math_ops.square(self._mean())
+
+  def _stddev(self):
+    return math_ops.sqrt(self._variance())
+
+  def _sample_n(self, n, seed=None):
+    # Samples are drawn from all components and the ones of the sampled
+    # components are selected using one-hot weights
+    components = self._cat.sample(n, seed=seed)
+    one_hot_components = array_ops.one_hot(
+        components,
+        depth=array_ops.shape(self._logits)[-1],
+        dtype=self.dtype)
+    shape = array_ops.concat(
+        [[n],
+         array_ops.broadcast_dynamic_shape(
+             array_ops.shape(self._locs),
+             array_ops.shape(self._scale_diags))],
+        axis=0)
+    seed = seed + 1 if seed is not None else None
+    standard_samples = random_ops.random_normal(
+        shape, dtype=self.dtype, seed=seed)
+    component_samples = self._locs + self._scale_diags * standard_samples
+    return math_ops.reduce_sum(
+        array_ops.expand_dims(one_hot_components, -1) * component_samples,
+        axis=-2)
@@ -0,0 +1,52 @@
+# ======================================================================== #
+# 
+# Copyright (c) 2017 - 2018 scVAE authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# ======================================================================== #
+
+"""Utilities for evaluating distributions on subsets of their batches."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from tensorflow_probability import distributions
+from tensorflow.python.framework import tensor_util
+from tensorflow.python.ops import array_ops
+from tensorflow.python.ops.distributions import distribution
+
+
+def gather_broadcasted(tensor, indices, shape):
+  """Gathers elements of `tensor` broadcasted to `shape` at `indices`."""
+  tensor = tensor + array_ops.zeros(shape, dtype=tensor.dtype)
+  return array_ops.gather_nd(tensor, indices)
+
+
+def gather_distribution(dist, indices, shape):
+  """Same kind of distribution with parameters gathered at `indices`.
+
+  Tensor parameters are broadcast to `shape` before gathering, and wrapped
+  distributions (as for `ZeroInflated` and `Categorized`) are gathered in
+  turn, so the returned distribution has batch shape `[len(indices)]`.
+  """
+  parameters = {}
+  for parameter_name, parameter in dist.parameters.items():
+    if isinstance(parameter, (distribution.Distribution,
+                              distributions.Distribution)):
+      parameter = gather_distribution(parameter, indices, shape)
+    elif tensor_util.is_tensor(parameter):
+      parameter = gather_broadcasted(parameter, indices, shape)
+    parameters[parameter_name] = parameter
+  return type(dist)(**parameters)
@@ -53,6 +53,8 @@ from tensorflow.python.ops import nn_ops
 
 from tensorflow import where
 
+from distributions.utilities import gather_broadcasted, gather_distribution
+
 class ZeroInflated(distribution.Distribution):
   """zero-inflated distribution.
 
@@ -193,9 +195,64 @@ class ZeroInflated(distribution.Distribution):
   def _log_prob(self, x):
     with ops.control_dependencies(self._assertions):
       x = ops.convert_to_tensor(x, name="x")
-      y_0 = math_ops.log(self.pi + (1 - self.pi) * self._dist.prob(x))
-      y_1 = math_ops.log(1 - self.pi) + self._dist.log_prob(x)
-      return where(x > 0, y_1, y_0)
+      # `x` can be shared across leading sample dimensions of the
+      # parameters, so it is broadcast to their shape
+      shape = array_ops.broadcast_dynamic_shape(
+          array_ops.shape(x), self.batch_shape_tensor())
+      x = x + array_ops.zeros(shape, dtype=x.dtype)
+      if self._dist.event_shape.ndims != 0:
+        y_0 = math_ops.log(self.pi + (1 - self.pi) * self._dist.prob(x))
+        y_1 = math_ops.log(1 - self.pi) + self._dist.log_prob(x)
+        return where(x > 0, y_1, y_0)
+      return self._sparse_log_prob(x, shape)
+
+  def _sparse_log_prob(self, x, shape):
+    """Log-probability evaluating the count branch only for non-zero `x`.
+
+    Count data are mostly zeros, so the zero branch,
+    `log(pi + (1 - pi) * p(0))`, is computed densely (in closed form for
+    Poisson and negative binomial distributions) using a log-sum-exp, while
+    `log(1 - pi) + log p(x)` is only computed for the non-zero elements of
+    `x`, which are then scattered back.
+    """
+    log_pi = math_ops.log(self.pi)
+    log_1_minus_pi = math_ops.log1p(-self.pi)
+
+    log_p_0 = _zero_log_prob(self._dist)
+    y_0 = math_ops.reduce_logsumexp(
+        array_ops.stack([
+            log_pi + array_ops.zeros(shape, dtype=self.dtype),
+            log_1_minus_pi + log_p_0
+            + array_ops.zeros(shape, dtype=self.dtype)
+        ]),
+        axis=0)
+
+    non_zero_indices = array_ops.where(x > 0)
+    x_non_zero = array_ops.gather_nd(x, non_zero_indices)
+    log_1_minus_pi_non_zero = gather_broadcasted(
+        log_1_minus_pi, non_zero_indices, shape)
+    dist_non_zero = gather_distribution(self._dist, non_zero_indices, shape)
+
+    y_1_non_zero = log_1_minus_pi_non_zero + dist_non_zero.log_prob(
+        x_non_zero)
+    y_1 = array_ops.scatter_nd(
+        non_zero_indices,
+        y_1_non_zero,
+        math_ops.cast(shape, non_zero_indices.dtype))
+
+    return where(x > 0, y_1, y_0)
 
   def _prob(self, x):
     return math_ops.exp(self._log_prob(x))
+
+
+def _zero_log_prob(dist):
+  """Log-probability of zero for a distribution with scalar events."""
+  if isinstance(dist, distributions.Poisson):
+    return -dist.rate
+  elif isinstance(dist, distributions.NegativeBinomial):
+    return -dist.total_count * nn_ops.softplus(dist.logits)
+  else:
+    return dist.log_prob(array_ops.zeros(
+        dist.batch_shape_tensor(), dtype=dist.dtype))
+
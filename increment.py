@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+
+# ======================================================================== #
+# 
+# Copyright (c) 2017 - 2018 scVAE authors
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#    http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# 
+# ======================================================================== #
+
+import data
+
+from main import (
+    setupModel, parseDistribution,
+    parser as main_parser
+)
+
+from auxiliary import title, subtitle, checkRunID, formatDuration
+
+import tensorflow as tf
+
+import os
+import argparse
+
+from time import time
+
+import warnings
+
+# TODO Remove when TensorFlow Probability library is updated to v0.6
+warnings.filterwarnings(action="ignore", category=DeprecationWarning)
+warnings.filterwarnings(action="ignore", category=FutureWarning)
+warnings.filterwarnings(action="ignore", category=PendingDeprecationWarning)
+
+def main(input_file_or_name, new_input_file_or_name,
+    data_directory = "data",
+    log_directory = "log", results_directory = "results",
+    map_features = False, feature_selection = [], example_filter = [],
+    preprocessing_methods = [],
+    split_data_set = True,
+    splitting_method = "default", splitting_fraction = 0.9,
+    model_type = "VAE", latent_size = 50, hidden_sizes = [500],
+    number_of_importance_samples = [5],
+    number_of_monte_carlo_samples = [10],
+    inference_architecture = "MLP",
+    latent_distribution = "gaussian",
+    number_of_classes = None,
+    parameterise_latent_posterior = False,
+    generative_architecture = "MLP",
+    reconstruction_distribution = "poisson",
+    number_of_reconstruction_classes = 0,
+    prior_probabilities_method = "uniform",
+    number_of_warm_up_epochs = 0,
+    kl_weight = 1,
+    proportion_of_free_KL_nats = 0.0,
+    clf_weight = 1.0,
+    number_of_labeled_examples = 0,
+    batch_normalisation = True,
+    dropout_keep_probabilities = [],
+    count_sum = True,
+    batch_size = 100, learning_rate = 1e-4,
+    number_of_intra_op_threads = None, number_of_inter_op_threads = None,
+    graph_optimisation = None, decoder_precision = None,
+    run_id = None,
+    number_of_incremental_epochs = 10, replay_ratio = 1.0,
+    **remaining_arguments):
+    
+    # Continue training a model on new examples together with a replayed
+    # sample of the examples it was trained on, so the cost of an update is
+    # proportional to the number of new examples
+    
+    incremental_time_start = time()
+    
+    # Setup
+    
+    if not split_data_set:
+        raise ValueError(
+            "Incremental training requires the data set to be split.")
+    
+    reconstruction_distribution = parseDistribution(
+        reconstruction_distribution)
+    latent_distribution = parseDistribution(latent_distribution)
+    
+    if run_id:
+        run_id = checkRunID(run_id)
+    
+    # Data
+    
+    print(title("Data"))
+    
+    data_set = data.DataSet(
+        input_file_or_name,
+        directory = data_directory,
+        map_features = map_features,
+        feature_selection = feature_selection,
+        example_filter = example_filter,
+        preprocessing_methods = preprocessing_methods,
+        binarise_values = reconstruction_distribution == "bernoulli"
+    )
+    
+    # New examples are only mapped to features here, since they are aligned
+    # to the features of the data set and preprocessed when extending it
+    new_data_set = data.DataSet(
+        new_input_file_or_name,
+        directory = data_directory,
+        map_features = map_features
+    )
+    
+    # The model has been trained with the classes of the data set, so new
+    # examples cannot add classes
+    (training_set, validation_set, test_set), new_split_indices = \
+        data_set.extendSplit(
+            new_data_set,
+            method = splitting_method,
+            fraction = splitting_fraction,
+            allow_new_classes = False
+        )
+    
+    number_of_new_training_examples = len(
+        new_split_indices["training set"])
+    
+    if number_of_new_training_examples == 0:
+        print("No new examples to train on.")
+        return
+    
+    log_directory = data.directory(log_directory, data_set,
+        splitting_method, splitting_fraction)
+    results_directory = data.directory(results_directory, data_set,
+        splitting_method, splitting_fraction)
+    
+    # Model
+    
+    print(title("Incremental training"))
+    
+    model, _ = setupModel(
+        training_set = training_set,
+        model_type = model_type,
+        latent_size = latent_size,
+        hidden_sizes = hidden_sizes,
+        number_of_importance_samples = number_of_importance_samples,
+        number_of_monte_carlo_samples = number_of_monte_carlo_samples,
+        inference_architecture = inference_architecture,
+        latent_distribution = latent_distribution,
+        number_of_classes = number_of_classes,
+        parameterise_latent_posterior = parameterise_latent_posterior,
+        generative_architecture = generative_architecture,
+        reconstruction_distribution = reconstruction_distribution,
+        number_of_reconstruction_classes = number_of_reconstruction_classes,
+        prior_probabilities_method = prior_probabilities_method,
+        number_of_warm_up_epochs = number_of_warm_up_epochs,
+        kl_weight = kl_weight,
+        proportion_of_free_KL_nats = proportion_of_free_KL_nats,
+        clf_weight = clf_weight,
+        number_of_labeled_examples = number_of_labeled_examples,
+        batch_normalisation = batch_normalisation,
+        dropout_keep_probabilities = dropout_keep_probabilities,
+        count_sum = count_sum,
+        number_of_intra_op_threads = number_of_intra_op_threads,
+        number_of_inter_op_threads = number_of_inter_op_threads,
+        graph_optimisation = graph_optimisation,
+        decoder_precision = decoder_precision,
+        log_directory = log_directory,
+        results_directory = results_directory
+    )
+    
+    print(model.description)
+    print()
+    
+    checkpoint = tf.train.get_checkpoint_state(
+        model.logDirectory(run_id = run_id))
+    
+    if not checkpoint:
+        raise ValueError(
+            "Cannot train model incrementally before it has been trained.")
+    
+    epoch_start = int(os.path.basename(
+        checkpoint.model_checkpoint_path).split('-')[-1])
+    
+    ## Replay
+    
+    print(subtitle("Replay"))
+    
+    training_set.applyIndices(data.replayIndices(
+        training_set.number_of_examples,
+        new_split_indices["training set"],
+        replay_ratio
+    ))
+    validation_set.applyIndices(data.replayIndices(
+        validation_set.number_of_examples,
+        new_split_indices["validation set"],
+        replay_ratio
+    ))
+    test_set.applyIndices(new_split_indices["test set"])
+    
+    print("Training on {} new and {} earlier examples.".format(
+        number_of_new_training_examples,
+        training_set.number_of_examples - number_of_new_training_examples
+    ))
+    print()
+    
+    ## Training
+    
+    print(subtitle("Training"))
+    
+    status, run_id = model.train(
+        training_set,
+        validation_set,
+        number_of_epochs = epoch_start + number_of_incremental_epochs,
+        batch_size = batch_size,
+        learning_rate = learning_rate,
+        run_id = run_id
+    )
+    
+    if not status["completed"]:
+        print(status["message"])
+        return
+    
+    ## Evaluation
+    
+    if test_set.number_of_examples:
+        print(subtitle("Evaluation on new examples"))
+        model.evaluate(
+            evaluation_set = test_set,
+            batch_size = batch_size,
+            run_id = run_id,
+            output_versions = "transformed"
+        )
+        print()
+    
+    incremental_duration = time() - incremental_time_start
+    print("Model trained incrementally ({}).".format(
+        formatDuration(incremental_duration)))
+
+parser = argparse.ArgumentParser(
+    description='Continue training scVAE models on new examples.',
+    parents = [main_parser],
+    # The help option is inherited from the parser of `main.py`
+    add_help = False,
+    formatter_class=argparse.ArgumentDefaultsHelpFormatter
+)
+parser.add_argument(
+    "--new-input",
+    dest = "new_input_file_or_name",
+    required = True,
+    help = "new examples: data set name or path to input file"
+)
+parser.add_argument(
+    "--number-of-incremental-epochs",
+    type = int,
+    default = 10,
+    help = "number of epochs to continue training for"
+)
+parser.add_argument(
+    "--replay-ratio",
+    type = float,
+    default = 1.0,
+    help = "number of earlier examples to replay for each new example"
+)
+
+if __name__ == '__main__':
+    arguments = parser.parse_args()
+    main(**vars(arguments))
@@ -29,12 +29,19 @@ from models import (
 from distributions import distributions, latent_distributions
 
 from miscellaneous.decomposition import (
-    DECOMPOSITION_METHOD_NAMES, DEFAULT_DECOMPOSITION_DIMENSIONALITY
+    DECOMPOSITION_METHOD_NAMES, DEFAULT_DECOMPOSITION_DIMENSIONALITY,
+    decomposition_cache, setDecompositionCacheDirectory
 )
 from miscellaneous.prediction import (
     predict, PREDICTION_METHOD_NAMES, PREDICTION_METHOD_SPECIFICATIONS
 )
 
+from models.auxiliary import (
+    autotuneThreads, pinProcessToCPUs,
+    validateGraphOptimisation, sessionConfiguration,
+    reportDecoderPrecisionDrift
+)
+
 from auxiliary import (
     title, subtitle, heading,
     normaliseString, properString, enumerateListOfStrings,
@@ -83,6 +90,9 @@ def main(input_file_or_name, data_directory = "data",
     count_sum = True,
     number_of_epochs = 200, plotting_interval_during_training = None, 
     batch_size = 100, learning_rate = 1e-4, acquisition = 'random',
+    number_of_intra_op_threads = None, number_of_inter_op_threads = None,
+    cpus = None, autotune_threads = False, graph_optimisation = None,
+    decoder_precision = None,
     run_id = None, new_run = False,
     prediction_method = None, prediction_training_set_name = "training",
     prediction_decomposition_method = None,
@@ -92,6 +102,7 @@ def main(input_file_or_name, data_directory = "data",
     model_versions = ["all"],
     analyse = True, evaluation_set_name = "test", analyse_data = False,
     analyses = ["default"], analysis_level = "normal", fast_analysis = False,
+    analysis_workers = 1, cache_decompositions = False,
     export_options = []):
     
     # Setup
@@ -105,6 +116,8 @@ def main(input_file_or_name, data_directory = "data",
         analyses = ["simple"]
         analysis_level = "limited"
     
+    analysis.setNumberOfAnalysisWorkers(analysis_workers)
+    
     ## Distributions
     
     reconstruction_distribution = parseDistribution(
@@ -198,6 +211,10 @@ def main(input_file_or_name, data_directory = "data",
     results_directory = data.directory(results_directory, data_set,
         splitting_method, splitting_fraction)
     
+    if cache_decompositions:
+        setDecompositionCacheDirectory(
+            os.path.join(log_directory, "decompositions"))
+    
     if temporary_log_directory:
         main_temporary_log_directory = temporary_log_directory
         temporary_log_directory = data.directory(temporary_log_directory,
@@ -231,120 +248,99 @@ def main(input_file_or_name, data_directory = "data",
     
     print(title("Modelling"))
     
-    # Set the number of features for the model
-    feature_size = training_set.number_of_features
+    if cpus:
+        pinned_cpus = pinProcessToCPUs(cpus)
+        print("Pinned to CPUs: {}.".format(
+            ", ".join(map(str, pinned_cpus))))
+        print()
     
-    # Parse numbers of samples
-    number_of_monte_carlo_samples = parseSampleLists(
-        number_of_monte_carlo_samples)
-    number_of_importance_samples = parseSampleLists(
-        number_of_importance_samples)
+    model_arguments = dict(
+        training_set = training_set,
+        model_type = model_type,
+        latent_size = latent_size,
+        hidden_sizes = hidden_sizes,
+        number_of_importance_samples = number_of_importance_samples,
+        number_of_monte_carlo_samples = number_of_monte_carlo_samples,
+        inference_architecture = inference_architecture,
+        latent_distribution = latent_distribution,
+        number_of_classes = number_of_classes,
+        parameterise_latent_posterior = parameterise_latent_posterior,
+        generative_architecture = generative_architecture,
+        reconstruction_distribution = reconstruction_distribution,
+        number_of_reconstruction_classes = number_of_reconstruction_classes,
+        prior_probabilities_method = prior_probabilities_method,
+        number_of_warm_up_epochs = number_of_warm_up_epochs,
+        kl_weight = kl_weight,
+        proportion_of_free_KL_nats = proportion_of_free_KL_nats,
+        clf_weight = clf_weight,
+        number_of_labeled_examples = number_of_labeled_examples,
+        batch_normalisation = batch_normalisation,
+        dropout_keep_probabilities = dropout_keep_probabilities,
+        count_sum = count_sum,
+        number_of_intra_op_threads = number_of_intra_op_threads,
+        number_of_inter_op_threads = number_of_inter_op_threads,
+        graph_optimisation = graph_optimisation,
+        decoder_precision = decoder_precision,
+        log_directory = log_directory,
+        results_directory = results_directory
+    )
     
-    # Use analytical KL term for single-Gaussian-VAE
-    if "VAE" in model_type:
-        if latent_distribution == "gaussian":
-            analytical_kl_term = True
-        else:
-            analytical_kl_term = False
+    model, number_of_classes = setupModel(**model_arguments)
     
-    # Change latent distribution to Gaussian mixture if not already set
-    if model_type == "GMVAE" and latent_distribution != "gaussian mixture":
-        latent_distribution = "gaussian mixture"
-        print("The latent distribution was changed to",
-            "a Gaussian-mixture model, because of the model chosen.\n")
+    print(model.description)
+    print()
     
-    # Set the number of classes if not already set
-    if not number_of_classes:
-        if training_set.has_labels:
-            number_of_classes = training_set.number_of_classes \
-                - training_set.number_of_excluded_classes
-        elif "mixture" in latent_distribution:
-            raise ValueError(
-                "For a mixture model and a data set without labels, "
-                "the number of classes has to be set."
-            )
-        else:
-            number_of_classes = 1
+    print(model.parameters)
+    print()
     
-    print(subtitle("Model setup"))
+    ## Thread autotuning
     
-    if model_type == "VAE":
-        model = VariationalAutoencoder(
-            feature_size = feature_size,
-            latent_size = latent_size,
-            hidden_sizes = hidden_sizes,
-            number_of_monte_carlo_samples =number_of_monte_carlo_samples,
-            number_of_importance_samples = number_of_importance_samples,
-            analytical_kl_term = analytical_kl_term,
-            inference_architecture = inference_architecture,
-            latent_distribution = latent_distribution,
-            number_of_latent_clusters = number_of_classes,
-            parameterise_latent_posterior = parameterise_latent_posterior,
-            generative_architecture = generative_architecture,
-            reconstruction_distribution = reconstruction_distribution,
-            number_of_reconstruction_classes = number_of_reconstruction_classes,
-            batch_normalisation = batch_normalisation,
-            dropout_keep_probabilities = dropout_keep_probabilities,
-            count_sum = count_sum,
-            number_of_warm_up_epochs = number_of_warm_up_epochs,
-            kl_weight = kl_weight,
-            log_directory = log_directory,
-            results_directory = results_directory
-        )
-
-    elif model_type == "GMVAE":
-        
-        if prior_probabilities_method == "uniform":
-            prior_probabilities = None
-        elif prior_probabilities_method == "infer":
-            prior_probabilities = training_set.class_probabilities
-        elif prior_probabilities_method == "literature":
-            prior_probabilities = training_set.literature_probabilities
-        else:
-            prior_probabilities = None
-        
-        if not prior_probabilities:
-            prior_probabilities_method = "uniform"
-            prior_probabilities_values = None
-        else:
-            prior_probabilities_values = list(prior_probabilities.values())
-        
-        prior_probabilities = {
-            "method": prior_probabilities_method,
-            "values": prior_probabilities_values
-        }
-        
-        model = GaussianMixtureVariationalAutoencoder(
-            feature_size = feature_size,
-            latent_size = latent_size,
-            hidden_sizes = hidden_sizes,
-            number_of_monte_carlo_samples = number_of_monte_carlo_samples,
-            number_of_importance_samples = number_of_importance_samples, 
-            analytical_kl_term = analytical_kl_term,
-            prior_probabilities = prior_probabilities,
-            number_of_latent_clusters = number_of_classes,
-            proportion_of_free_KL_nats = proportion_of_free_KL_nats,
-            reconstruction_distribution = reconstruction_distribution,
-            number_of_reconstruction_classes = number_of_reconstruction_classes,
-            batch_normalisation = batch_normalisation,
-            dropout_keep_probabilities = dropout_keep_probabilities,
-            count_sum = count_sum,
-            number_of_warm_up_epochs = number_of_warm_up_epochs,
-            kl_weight = kl_weight,
-            clf_weight = clf_weight,
-            number_of_labeled_examples = number_of_labeled_examples,
-            log_directory = log_directory,
-            results_directory = results_directory
+    if autotune_threads:
+        print(subtitle("Thread autotuning"))
+        autotuneThreads(
+            model,
+            training_set,
+            batch_size = batch_size,
+            learning_rate = learning_rate
         )
+        print()
     
-    else:
-        raise ValueError("Model type not found: `{}`.".format(model_type))
+    ## Graph optimisation validation
     
-    print(model.description)
-    print()
+    if model.graph_optimisation:
+        print(subtitle("Graph optimisation"))
+        graph_optimisation_valid = validateGraphOptimisation(
+            model,
+            training_set,
+            batch_size = batch_size,
+            learning_rate = learning_rate
+        )
+        if not graph_optimisation_valid:
+            print("Graph optimisation disabled.")
+            model.graph_optimisation = None
+            model.config = sessionConfiguration(
+                model.number_of_intra_op_threads,
+                model.number_of_inter_op_threads
+            )
+        print()
     
-    print(model.parameters)
-    print()
+    ## Decoder precision drift
+    
+    if model.decoder_precision:
+        reference_model, _ = setupModel(**dict(
+            model_arguments,
+            decoder_precision = None
+        ))
+        print(subtitle("Decoder precision"))
+        reportDecoderPrecisionDrift(
+            model,
+            reference_model,
+            training_set,
+            batch_size = batch_size,
+            learning_rate = learning_rate
+        )
+        del reference_model
+        print()
     
     ## Training
     
@@ -371,19 +367,7 @@ def main(input_file_or_name, data_directory = "data",
         print(status["message"])
         return
     
-    status_filename = "status"
-    if "epochs trained" in status:
-        status_filename += "-" + status["epochs trained"]
-    status_path = os.path.join(
-        model.logDirectory(run_id = run_id),
-        status_filename + ".log"
-    )
-    with open(status_path, "w") as status_file:
-        for status_field, status_value in status.items():
-            if status_value:
-                status_file.write(
-                    status_field + ": " + str(status_value) + "\n"
-                )
+    saveModelStatus(status, model, run_id)
     
     print()
     
@@ -727,6 +711,157 @@ def main(input_file_or_name, data_directory = "data",
         
         if transformed_evaluation_set.version == "original":
             transformed_evaluation_set.resetPredictions()
+    
+    model.evaluation_session_cache.clear()
+    
+    print(decomposition_cache.summary)
+
+def setupModel(training_set, model_type, latent_size, hidden_sizes,
+    number_of_importance_samples, number_of_monte_carlo_samples,
+    inference_architecture, latent_distribution, number_of_classes,
+    parameterise_latent_posterior, generative_architecture,
+    reconstruction_distribution, number_of_reconstruction_classes,
+    prior_probabilities_method, number_of_warm_up_epochs, kl_weight,
+    proportion_of_free_KL_nats, clf_weight, number_of_labeled_examples,
+    batch_normalisation, dropout_keep_probabilities, count_sum,
+    log_directory, results_directory,
+    number_of_intra_op_threads = None, number_of_inter_op_threads = None,
+    graph_optimisation = None, decoder_precision = None):
+    
+    # Set the number of features for the model
+    feature_size = training_set.number_of_features
+    
+    # Parse numbers of samples
+    number_of_monte_carlo_samples = parseSampleLists(
+        number_of_monte_carlo_samples)
+    number_of_importance_samples = parseSampleLists(
+        number_of_importance_samples)
+    
+    # Use analytical KL term for single-Gaussian-VAE
+    if "VAE" in model_type:
+        if latent_distribution == "gaussian":
+            analytical_kl_term = True
+        else:
+            analytical_kl_term = False
+    
+    # Change latent distribution to Gaussian mixture if not already set
+    if model_type == "GMVAE" and latent_distribution != "gaussian mixture":
+        latent_distribution = "gaussian mixture"
+        print("The latent distribution was changed to",
+            "a Gaussian-mixture model, because of the model chosen.\n")
+    
+    # Set the number of classes if not already set
+    if not number_of_classes:
+        if training_set.has_labels:
+            number_of_classes = training_set.number_of_classes \
+                - training_set.number_of_excluded_classes
+        elif "mixture" in latent_distribution:
+            raise ValueError(
+                "For a mixture model and a data set without labels, "
+                "the number of classes has to be set."
+            )
+        else:
+            number_of_classes = 1
+    
+    print(subtitle("Model setup"))
+    
+    if model_type == "VAE":
+        model = VariationalAutoencoder(
+            feature_size = feature_size,
+            latent_size = latent_size,
+            hidden_sizes = hidden_sizes,
+            number_of_monte_carlo_samples =number_of_monte_carlo_samples,
+            number_of_importance_samples = number_of_importance_samples,
+            analytical_kl_term = analytical_kl_term,
+            inference_architecture = inference_architecture,
+            latent_distribution = latent_distribution,
+            number_of_latent_clusters = number_of_classes,
+            parameterise_latent_posterior = parameterise_latent_posterior,
+            generative_architecture = generative_architecture,
+            reconstruction_distribution = reconstruction_distribution,
+            number_of_reconstruction_classes = number_of_reconstruction_classes,
+            batch_normalisation = batch_normalisation,
+            dropout_keep_probabilities = dropout_keep_probabilities,
+            count_sum = count_sum,
+            number_of_warm_up_epochs = number_of_warm_up_epochs,
+            kl_weight = kl_weight,
+            number_of_intra_op_threads = number_of_intra_op_threads,
+            number_of_inter_op_threads = number_of_inter_op_threads,
+            graph_optimisation = graph_optimisation,
+            decoder_precision = decoder_precision,
+            log_directory = log_directory,
+            results_directory = results_directory
+        )
+
+    elif model_type == "GMVAE":
+        
+        if prior_probabilities_method == "uniform":
+            prior_probabilities = None
+        elif prior_probabilities_method == "infer":
+            prior_probabilities = training_set.class_probabilities
+        elif prior_probabilities_method == "literature":
+            prior_probabilities = training_set.literature_probabilities
+        else:
+            prior_probabilities = None
+        
+        if not prior_probabilities:
+            prior_probabilities_method = "uniform"
+            prior_probabilities_values = None
+        else:
+            prior_probabilities_values = list(prior_probabilities.values())
+        
+        prior_probabilities = {
+            "method": prior_probabilities_method,
+            "values": prior_probabilities_values
+        }
+        
+        model = GaussianMixtureVariationalAutoencoder(
+            feature_size = feature_size,
+            latent_size = latent_size,
+            hidden_sizes = hidden_sizes,
+            number_of_monte_carlo_samples = number_of_monte_carlo_samples,
+            number_of_importance_samples = number_of_importance_samples, 
+            analytical_kl_term = analytical_kl_term,
+            prior_probabilities = prior_probabilities,
+            number_of_latent_clusters = number_of_classes,
+            proportion_of_free_KL_nats = proportion_of_free_KL_nats,
+            reconstruction_distribution = reconstruction_distribution,
+            number_of_reconstruction_classes = number_of_reconstruction_classes,
+            batch_normalisation = batch_normalisation,
+            dropout_keep_probabilities = dropout_keep_probabilities,
+            count_sum = count_sum,
+            number_of_warm_up_epochs = number_of_warm_up_epochs,
+            kl_weight = kl_weight,
+            clf_weight = clf_weight,
+            number_of_labeled_examples = number_of_labeled_examples,
+            number_of_intra_op_threads = number_of_intra_op_threads,
+            number_of_inter_op_threads = number_of_inter_op_threads,
+            graph_optimisation = graph_optimisation,
+            decoder_precision = decoder_precision,
+            log_directory = log_directory,
+            results_directory = results_directory
+        )
+    
+    else:
+        raise ValueError("Model type not found: `{}`.".format(model_type))
+    
+    return model, number_of_classes
+
+def saveModelStatus(status, model, run_id = None):
+    
+    status_filename = "status"
+    if "epochs trained" in status:
+        status_filename += "-" + status["epochs trained"]
+    status_path = os.path.join(
+        model.logDirectory(run_id = run_id),
+        status_filename + ".log"
+    )
+    with open(status_path, "w") as status_file:
+        for status_field, status_value in status.items():
+            if status_value:
+                status_file.write(
+                    status_field + ": " + str(status_value) + "\n"
+                )
 
 def parseModelVersions(proposed_versions):
     
@@ -874,73 +1009,189 @@ def validateModelParameters(model_type, latent_distribution,
     
     return validity, errors
 
+def addDataArguments(parser):
+    
+    # Arguments for loading, preprocessing, and splitting data sets, which
+    # are shared with `sweep.py`
+    
+    parser.add_argument(
+        "--input", "-i",
+        type = str,
+        dest = "input_file_or_name",
+        help = "input: data set name or path to input file"
+    )
+    parser.add_argument(
+        "--data-directory", "-D",
+        type = str,
+        default = "data",
+        help = "directory where data are placed"
+    )
+    parser.add_argument(
+        "--log-directory", "-L",
+        type = str,
+        default = "log",
+        help = "directory where models are stored"
+    )
+    parser.add_argument(
+        "--results-directory", "-R",
+        type = str,
+        default = "results",
+        help = "directory where results are saved"
+    )
+    parser.add_argument(
+        "--map-features",
+        action = "store_true",
+        help = "map features using a feature mapping if available"
+    )
+    parser.add_argument(
+        "--skip-mapping-features",
+        dest = "map_features",
+        action = "store_false",
+        help = "do not map features using any feature mapping"
+    )
+    parser.set_defaults(map_features = False)
+    parser.add_argument(
+        "--feature-selection", "-F",
+        type = str,
+        nargs = "*",
+        default = None,
+        help = "method for selecting features"
+    )
+    parser.add_argument(
+        "--example-filter", "-E",
+        type = str,
+        nargs = "*",
+        default = None,
+        help = "method for filtering examples, optionally followed by parameters"
+    )
+    parser.add_argument(
+        "--preprocessing-methods", "-p",
+        type = str,
+        nargs = "*",
+        default = None,
+        help = "methods for preprocessing data (applied in order)"
+    )
+    parser.add_argument(
+        "--splitting-method",
+        type = str,
+        default = "default",
+        help = "method for splitting data into training, validation, and test sets"
+    )
+    parser.add_argument(
+        "--splitting-fraction",
+        type = float,
+        default = 0.9,
+        help = "fraction to use when splitting data into training, validation, and test sets"
+    )
+
+def addTrainingArguments(parser):
+    
+    # Arguments for training models, which are shared with `sweep.py`
+    
+    parser.add_argument(
+        "--number-of-importance-samples",
+        type = int,
+        nargs = "+",
+        default = [1],
+        help = "the number of importance weighted samples (if two numbers given, the first will be used for training and the second for evaluation)"
+    )
+    parser.add_argument(
+        "--number-of-monte-carlo-samples",
+        type = int,
+        nargs = "+",
+        default = [1],
+        help = "the number of Monte Carlo samples (if two numbers given, the first will be used for training and the second for evaluation)"
+    )
+    parser.add_argument(
+        "--number-of-reconstruction-classes", "-k",
+        type = int,
+        default = 0,
+        help = "the maximum count for which to use classification"
+    )
+    parser.add_argument(
+        "--prior-probabilities-method",
+        type = str,
+        default = "uniform",
+        help = "method to set prior probabilities"
+    )
+    parser.add_argument(
+        "--number-of-warm-up-epochs", "-w",
+        type = int,
+        default = 0,
+        help = "number of epochs with a linear weight on the KL divergence"
+    )
+    parser.add_argument(
+        "--kl-weight",
+        type = float,
+        default = 1.0,
+        help = "weighting of KL divergence"
+    )
+    parser.add_argument(
+        "--batch-normalisation", "-b",
+        action = "store_true",
+        help = "use batch normalisation"
+    )
+    parser.add_argument(
+        "--no-batch-normalisation", "-B",
+        dest = "batch_normalisation",
+        action = "store_false",
+        help = "do not use batch normalisation"
+    )
+    parser.set_defaults(batch_normalisation = True)
+    parser.add_argument(
+        "--count-sum", "-s",
+        action = "store_true",
+        help = "use count sum"
+    )
+    parser.add_argument(
+        "--no-count-sum", "-S",
+        dest = "count_sum",
+        action = "store_false",
+        help = "do not use count sum"
+    )
+    parser.set_defaults(count_sum = False)
+    parser.add_argument(
+        "--number-of-epochs", "-e",
+        type = int,
+        default = 200,
+        help = "number of epochs for which to train"
+    )
+    parser.add_argument(
+        "--batch-size", "-M",
+        type = int,
+        default = 100,
+        help = "batch size used when training"
+    )
+    parser.add_argument(
+        "--learning-rate",
+        type = float,
+        default = 1e-4,
+        help = "learning rate when training"
+    )
+    parser.add_argument(
+        "--run-id",
+        type = str,
+        nargs = "?",
+        default = None,
+        help = "ID for separate run of the model (can only contrain alphanumeric characters)"
+    )
+    parser.add_argument(
+        "--reset-training",
+        action = "store_true",
+        help = "reset already trained model"
+    )
+
 parser = argparse.ArgumentParser(
     description='Model single-cell transcript counts using deep learning.',
     formatter_class=argparse.ArgumentDefaultsHelpFormatter
 )
 
-parser.add_argument(
-    "--input", "-i",
-    type = str,
-    dest = "input_file_or_name",
-    help = "input: data set name or path to input file"
-)
-parser.add_argument(
-    "--data-directory", "-D",
-    type = str,
-    default = "data",
-    help = "directory where data are placed"
-)
-parser.add_argument(
-    "--log-directory", "-L",
-    type = str,
-    default = "log",
-    help = "directory where models are stored"
-)
-parser.add_argument(
-    "--results-directory", "-R",
-    type = str,
-    default = "results",
-    help = "directory where results are saved"
-)
+addDataArguments(parser)
 parser.add_argument(
     "--temporary-log-directory", "-T",
     type = str,
     help = "directory for temporary storage"
 )
-parser.add_argument(
-    "--map-features",
-    action = "store_true",
-    help = "map features using a feature mapping if available"
-)
-parser.add_argument(
-    "--skip-mapping-features",
-    dest = "map_features",
-    action = "store_false",
-    help = "do not map features using any feature mapping"
-)
-parser.set_defaults(map_features = False)
-parser.add_argument(
-    "--feature-selection", "-F",
-    type = str,
-    nargs = "*",
-    default = None,
-    help = "method for selecting features"
-)
-parser.add_argument(
-    "--example-filter", "-E",
-    type = str,
-    nargs = "*",
-    default = None,
-    help = "method for filtering examples, optionally followed by parameters"
-)
-parser.add_argument(
-    "--preprocessing-methods", "-p",
-    type = str,
-    nargs = "*",
-    default = None,
-    help = "methods for preprocessing data (applied in order)"
-)
 parser.add_argument(
     "--noisy-preprocessing-methods", "-N",
     type = str,
@@ -960,18 +1211,6 @@ parser.add_argument(
     help = "do not split data set"
 )
 parser.set_defaults(split_data_set = True)
-parser.add_argument(
-    "--splitting-method",
-    type = str,
-    default = "default",
-    help = "method for splitting data into training, validation, and test sets"
-)
-parser.add_argument(
-    "--splitting-fraction",
-    type = float,
-    default = 0.9,
-    help = "fraction to use when splitting data into training, validation, and test sets"
-)
 parser.add_argument(
     "--model-type", "-m",
     type = str,
@@ -991,20 +1230,6 @@ parser.add_argument(
     default = [250, 250],
     help = "sizes of hidden layers"
 )
-parser.add_argument(
-    "--number-of-importance-samples",
-    type = int,
-    nargs = "+",
-    default = [1],
-    help = "the number of importance weighted samples (if two numbers given, the first will be used for training and the second for evaluation)"
-)
-parser.add_argument(
-    "--number-of-monte-carlo-samples",
-    type = int,
-    nargs = "+",
-    default = [1],
-    help = "the number of Monte Carlo samples (if two numbers given, the first will be used for training and the second for evaluation)"
-)
 parser.add_argument(
     "--inference-architecture",
     type = str,
@@ -1046,60 +1271,19 @@ parser.add_argument(
     default = "poisson",
     help = "distribution for the reconstructions"
 )
-parser.add_argument(
-    "--number-of-reconstruction-classes", "-k",
-    type = int,
-    default = 0,
-    help = "the maximum count for which to use classification"
-)
-parser.add_argument(
-    "--prior-probabilities-method",
-    type = str,
-    default = "uniform",
-    help = "method to set prior probabilities"
-)
-parser.add_argument(
-    "--number-of-epochs", "-e",
-    type = int,
-    default = 200,
-    help = "number of epochs for which to train"
-)
+addTrainingArguments(parser)
 parser.add_argument(
     "--plotting-interval-during-training",
     type = int,
     nargs = "?",
     help = "number of training epochs between each intermediate plot starting at the first"
 )
-parser.add_argument(
-    "--batch-size", "-M",
-    type = int,
-    default = 100,
-    help = "batch size used when training"
-)
-parser.add_argument(
-    "--learning-rate",
-    type = float,
-    default = 1e-4,
-    help = "learning rate when training"
-)
 parser.add_argument(
     "--acquisition", "-a",
     type = str,
     default = "random",
     help = "method to acquire new active learning data points"
 )
-parser.add_argument(
-    "--number-of-warm-up-epochs", "-w",
-    type = int,
-    default = 0,
-    help = "number of epochs with a linear weight on the KL divergence"
-)
-parser.add_argument(
-    "--kl-weight",
-    type = float,
-    default = 1.0,
-    help = "weighting of KL divergence"
-)
 parser.add_argument(
     "--proportion-of-free-KL-nats",
     type = float,
@@ -1119,18 +1303,6 @@ parser.add_argument(
     default = 100,
     help = "labeled pool size used when training"
 )
-parser.add_argument(
-    "--batch-normalisation", "-b",
-    action = "store_true",
-    help = "use batch normalisation"
-)
-parser.add_argument(
-    "--no-batch-normalisation", "-B",
-    dest = "batch_normalisation",
-    action = "store_false",
-    help = "do not use batch normalisation"
-)
-parser.set_defaults(batch_normalisation = True)
 parser.add_argument(
     "--dropout-keep-probabilities", "-d",
     type = float,
@@ -1139,23 +1311,51 @@ parser.add_argument(
     help = "List of probabilities, p, of keeping connections when using dropout. Interval: ]0, 1[, where p in {0, 1, False} means no dropout."
 )
 parser.add_argument(
-    "--count-sum", "-s",
+    "--number-of-intra-op-threads",
+    type = int,
+    nargs = "?",
+    default = None,
+    help = "number of threads used within single operations (default: chosen by TensorFlow)"
+)
+parser.add_argument(
+    "--number-of-inter-op-threads",
+    type = int,
+    nargs = "?",
+    default = None,
+    help = "number of operations run in parallel (default: chosen by TensorFlow)"
+)
+parser.add_argument(
+    "--cpus",
+    type = str,
+    nargs = "?",
+    default = None,
+    help = "CPUs to pin the process to given as numbers and ranges separated by commas (for example, `0-7,16-23`)"
+)
+parser.add_argument(
+    "--autotune-threads",
     action = "store_true",
-    help = "use count sum"
+    help = "time training steps using different numbers of threads before training and use the fastest setting"
 )
 parser.add_argument(
-    "--no-count-sum", "-S",
-    dest = "count_sum",
+    "--skip-autotuning-threads",
+    dest = "autotune_threads",
     action = "store_false",
-    help = "do not use count sum"
+    help = "do not autotune numbers of threads"
 )
-parser.set_defaults(count_sum = False)
+parser.set_defaults(autotune_threads = False)
 parser.add_argument(
-    "--run-id",
+    "--graph-optimisation",
     type = str,
     nargs = "?",
     default = None,
-    help = "ID for separate run of the model (can only contrain alphanumeric characters)"
+    help = "optimisation of model graphs: none (default), XLA (just-in-time compilation), or grappler (aggressive graph rewriting); validated against the unoptimised graph before training"
+)
+parser.add_argument(
+    "--decoder-precision",
+    type = str,
+    nargs = "?",
+    default = None,
+    help = "precision of inputs and weights of matrix multiplications in dense decoder layers: float32 (default), float16 (with dynamic loss scaling), or bfloat16; parameters, accumulation of products, and likelihood functions are kept in float32, and drift in the lower bound is reported before training"
 )
 parser.add_argument(
     "--new-run",
@@ -1203,11 +1403,6 @@ parser.add_argument(
     default = [],
     help = "feature indices to highlight in analyses"
 )
-parser.add_argument(
-    "--reset-training",
-    action = "store_true",
-    help = "reset already trained model"
-)
 parser.add_argument(
     "--perform-modelling",
     dest = "skip_modelling",
@@ -1276,6 +1471,19 @@ parser.add_argument(
     help = "perform fast analysis (equivalent to: `--analyses simple --analysis-level limited`)"
 )
 parser.set_defaults(fast_analysis = False)
+parser.add_argument(
+    "--analysis-workers",
+    type = int,
+    default = 1,
+    help = "number of processes used to plot and save figures in analyses "
+        "(0 for one per CPU)"
+)
+parser.add_argument(
+    "--cache-decompositions",
+    action = "store_true",
+    help = "save decompositions of values to disk to reuse them in later runs"
+)
+parser.set_defaults(cache_decompositions = False)
 parser.add_argument(
     "--export-options",
     type = str,
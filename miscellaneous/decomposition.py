@@ -1,10 +1,18 @@
 import numpy
 import scipy
+
+import os
+import gzip
+import pickle
+import hashlib
+import collections
+
 from sklearn.decomposition import PCA, FastICA, TruncatedSVD
 from sklearn.manifold import TSNE
+from sklearn.neighbors import NearestNeighbors
 
 from auxiliary import normaliseString, properString
-from miscellaneous.incremental_pca import IncrementalPCA
+from miscellaneous.randomised_pca import RandomisedPCA
 
 DECOMPOSITION_METHOD_NAMES = {
     "PCA": ["pca"],
@@ -24,6 +32,17 @@ DEFAULT_DECOMPOSITION_METHOD = "PCA"
 DEFAULT_DECOMPOSITION_DIMENSIONALITY = 2
 
 MAXIMUM_FEATURE_SIZE_FOR_NORMAL_PCA = 2000
+MAXIMUM_NUMBER_OF_PCA_COMPONENTS_BEFORE_TSNE = 50
+MAXIMUM_NUMBER_OF_COMPONENTS_FOR_BARNES_HUT_TSNE = 3
+MAXIMUM_NUMBER_OF_EXAMPLES_FOR_EXACT_TSNE = 5000
+# Nearest neighbours are found exactly, which is slow for many examples
+# even after reducing them to a few dimensions
+MAXIMUM_NUMBER_OF_EXAMPLES_FOR_TSNE = 200000
+TSNE_PERPLEXITY = 30.0
+
+MAXIMUM_SIZE_FOR_DECOMPOSITION_CACHE = 2e9 # bytes
+MAXIMUM_SIZE_FOR_NEIGHBOUR_GRAPH_CACHE = 1e9 # bytes
+NUMBER_OF_EXAMPLES_FOR_FINGERPRINT = 1000
 
 def decompose(values, other_value_sets=[], centroids={}, method=None,
               number_of_components=None, random=False):
@@ -55,39 +74,24 @@ def decompose(values, other_value_sets=[], centroids={}, method=None,
     else:
         random_state = 42
     
-    # Method
+    # Fit and transform
     
-    if method == "PCA":
-        if values.shape[1] <= MAXIMUM_FEATURE_SIZE_FOR_NORMAL_PCA \
-            and not scipy.sparse.issparse(values):
-            model = PCA(n_components=number_of_components)
-        else:
-            model = IncrementalPCA(
-                n_components=number_of_components,
-                batch_size=100
-            )
-    elif method == "SVD":
-        model = TruncatedSVD(n_components=number_of_components)
-    elif method == "ICA":
-        model = FastICA(n_components=number_of_components)
-    elif method == "t-SNE":
-        if number_of_components < 4:
-            tsne_method = "barnes_hut"
-        else:
-            tsne_method = "exact"
-        model = TSNE(
-            n_components=number_of_components,
-            method=tsne_method,
+    if random:
+        model, values_decomposed = fitDecomposition(
+            values,
+            method=method,
+            number_of_components=number_of_components,
             random_state=random_state
         )
     else:
-        raise ValueError("Method `{}` not found.".format(method))
-    
-    # Fit and transform
-    
-    values_decomposed = model.fit_transform(values)
+        model, values_decomposed = decomposition_cache.fit(
+            values,
+            method=method,
+            number_of_components=number_of_components,
+            random_state=random_state
+        )
     
-    if other_value_sets and method != "t_sne":
+    if other_value_sets and method != "t-SNE":
         other_value_sets_decomposed = []
         for other_values in other_value_sets:
             other_value_decomposed = model.transform(other_values)
@@ -146,3 +150,320 @@ def decompose(values, other_value_sets=[], centroids={}, method=None,
         return values_decomposed, centroids_decomposed
     else:
         return values_decomposed
+
+def fitDecomposition(values, method, number_of_components, random_state=None):
+    
+    # Method
+    
+    if method == "PCA":
+        # Large or sparse values are decomposed in batches fitting in memory
+        # without densifying them
+        if values.shape[1] <= MAXIMUM_FEATURE_SIZE_FOR_NORMAL_PCA \
+            and not scipy.sparse.issparse(values):
+            model = PCA(n_components=number_of_components)
+        else:
+            model = RandomisedPCA(
+                n_components=number_of_components,
+                random_state=random_state
+            )
+    elif method == "SVD":
+        model = TruncatedSVD(n_components=number_of_components)
+    elif method == "ICA":
+        model = FastICA(n_components=number_of_components)
+    elif method == "t-SNE":
+        
+        if values.shape[0] > MAXIMUM_NUMBER_OF_EXAMPLES_FOR_TSNE:
+            raise ValueError(
+                "t-SNE can only be used for at most {} examples, not {}."
+                .format(MAXIMUM_NUMBER_OF_EXAMPLES_FOR_TSNE, values.shape[0])
+            )
+        
+        # Exact t-SNE, used for more components, needs dense pairwise
+        # distances
+        if number_of_components \
+            > MAXIMUM_NUMBER_OF_COMPONENTS_FOR_BARNES_HUT_TSNE \
+            and values.shape[0] > MAXIMUM_NUMBER_OF_EXAMPLES_FOR_EXACT_TSNE:
+            raise ValueError(
+                "t-SNE with more than {} components can only be used for at "
+                "most {} examples, not {}.".format(
+                    MAXIMUM_NUMBER_OF_COMPONENTS_FOR_BARNES_HUT_TSNE,
+                    MAXIMUM_NUMBER_OF_EXAMPLES_FOR_EXACT_TSNE,
+                    values.shape[0]
+                )
+            )
+        
+        # Values with many features are reduced using PCA beforehand, and
+        # Barnes-Hut t-SNE is fitted using the nearest neighbours of the
+        # reduced values, which are shared with other methods. Random PCA
+        # fits are not cached, since they cannot be reproduced.
+        
+        if values.shape[1] > MAXIMUM_NUMBER_OF_PCA_COMPONENTS_BEFORE_TSNE:
+            if random_state is None:
+                fit = fitDecomposition
+            else:
+                fit = decomposition_cache.fit
+            _, values = fit(
+                values,
+                method="PCA",
+                number_of_components=min(
+                    MAXIMUM_NUMBER_OF_PCA_COMPONENTS_BEFORE_TSNE,
+                    values.shape[0] - 1
+                ),
+                random_state=random_state
+            )
+        
+        if number_of_components \
+            <= MAXIMUM_NUMBER_OF_COMPONENTS_FOR_BARNES_HUT_TSNE:
+            
+            number_of_neighbours = min(
+                values.shape[0] - 1,
+                int(3 * TSNE_PERPLEXITY + 1)
+            )
+            
+            # t-SNE uses squared Euclidean distances
+            values = neighbour_graph_cache.graph(
+                values, number_of_neighbours).power(2)
+            
+            model = TSNE(
+                n_components=number_of_components,
+                perplexity=TSNE_PERPLEXITY,
+                method="barnes_hut",
+                metric="precomputed",
+                init="random",
+                random_state=random_state,
+                n_jobs=-1
+            )
+        
+        else:
+            if scipy.sparse.issparse(values):
+                values = values.A
+            model = TSNE(
+                n_components=number_of_components,
+                perplexity=TSNE_PERPLEXITY,
+                method="exact",
+                random_state=random_state
+            )
+    else:
+        raise ValueError("Method `{}` not found.".format(method))
+    
+    # Fit and transform
+    
+    values_decomposed = model.fit_transform(values)
+    
+    return model, values_decomposed
+
+class DecompositionCache(object):
+    
+    # Fitted decomposition models and decomposed values kept during a run,
+    # and optionally saved to disk, so the same values are not decomposed
+    # again using the same method in different analyses or in prediction
+    
+    def __init__(self, maximum_size=MAXIMUM_SIZE_FOR_DECOMPOSITION_CACHE,
+                 directory=None):
+        self.maximum_size = maximum_size
+        self.directory = directory
+        self.entries = collections.OrderedDict()
+        self.number_of_hits = 0
+        self.number_of_fits = 0
+    
+    def fit(self, values, method, number_of_components, random_state=None):
+        
+        key = "-".join([
+            valuesFingerprint(values),
+            normaliseString(method),
+            str(number_of_components),
+            str(random_state)
+        ])
+        
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.number_of_hits += 1
+            return self.entries[key]
+        
+        entry = self.load(key)
+        
+        if entry is not None:
+            self.number_of_hits += 1
+        else:
+            entry = fitDecomposition(
+                values,
+                method=method,
+                number_of_components=number_of_components,
+                random_state=random_state
+            )
+            self.number_of_fits += 1
+            self.save(key, entry)
+        
+        self.entries[key] = entry
+        
+        while len(self.entries) > 1 and self.size > self.maximum_size:
+            self.entries.popitem(last=False)
+        
+        return entry
+    
+    def path(self, key):
+        return os.path.join(self.directory, key + ".pkl.gz")
+    
+    def load(self, key):
+        
+        if not self.directory or not os.path.exists(self.path(key)):
+            return None
+        
+        with gzip.open(self.path(key), "rb") as cache_file:
+            entry = pickle.load(cache_file)
+        
+        return entry
+    
+    def save(self, key, entry):
+        
+        if not self.directory:
+            return
+        
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        
+        with gzip.open(self.path(key), "wb") as cache_file:
+            pickle.dump(entry, cache_file)
+    
+    @property
+    def size(self):
+        return sum(
+            values_decomposed.nbytes
+            for _, values_decomposed in self.entries.values()
+        )
+    
+    @property
+    def summary(self):
+        return "Decompositions: {} fitted, {} reused from cache.".format(
+            self.number_of_fits, self.number_of_hits)
+    
+    def clear(self):
+        self.entries.clear()
+
+decomposition_cache = DecompositionCache()
+
+def setDecompositionCacheDirectory(directory=None):
+    decomposition_cache.directory = directory
+
+class NeighbourGraphCache(object):
+    
+    # Nearest-neighbour indices and nearest neighbours of values kept during
+    # a run, so the index is only built and neighbours only searched for
+    # once for the same values, and graphs with fewer neighbours are taken
+    # from the nearest neighbours already found
+    
+    def __init__(self, maximum_size=MAXIMUM_SIZE_FOR_NEIGHBOUR_GRAPH_CACHE):
+        self.maximum_size = maximum_size
+        self.entries = collections.OrderedDict()
+    
+    def entry(self, values):
+        
+        key = valuesFingerprint(values)
+        entry = self.entries.get(key)
+        
+        if entry is not None:
+            self.entries.move_to_end(key)
+        else:
+            entry = {
+                "index": NearestNeighbors(n_jobs=-1).fit(values),
+                "neighbours": None
+            }
+            self.entries[key] = entry
+        
+        return entry
+    
+    def neighbours(self, values, number_of_neighbours):
+        
+        # Neighbours are sorted by distance and exclude the examples
+        # themselves
+        
+        entry = self.entry(values)
+        
+        if entry["neighbours"] is None \
+            or entry["neighbours"][0].shape[1] < number_of_neighbours:
+            entry["neighbours"] = entry["index"].kneighbors(
+                n_neighbors=number_of_neighbours)
+            self.removeOldEntries()
+        
+        distances, indices = entry["neighbours"]
+        
+        return (
+            distances[:, :number_of_neighbours],
+            indices[:, :number_of_neighbours]
+        )
+    
+    def graph(self, values, number_of_neighbours):
+        
+        # Sparse matrix of distances to the nearest neighbours
+        
+        distances, indices = self.neighbours(values, number_of_neighbours)
+        M, K = distances.shape
+        
+        graph = scipy.sparse.csr_matrix(
+            (
+                distances.flatten(),
+                indices.flatten(),
+                numpy.arange(0, M * K + 1, K)
+            ),
+            shape=(M, M)
+        )
+        
+        return graph
+    
+    def radiusGraph(self, values, radius):
+        
+        # Sparse matrix of distances to all neighbours within the radius
+        # including the examples themselves
+        
+        entry = self.entry(values)
+        
+        graph = entry["index"].radius_neighbors_graph(
+            values,
+            radius=radius,
+            mode="distance"
+        )
+        
+        return graph
+    
+    @property
+    def size(self):
+        return sum(
+            entry["neighbours"][0].nbytes + entry["neighbours"][1].nbytes
+            for entry in self.entries.values()
+            if entry["neighbours"] is not None
+        )
+    
+    def removeOldEntries(self):
+        while len(self.entries) > 1 and self.size > self.maximum_size:
+            self.entries.popitem(last=False)
+    
+    def clear(self):
+        self.entries.clear()
+
+neighbour_graph_cache = NeighbourGraphCache()
+
+def valuesFingerprint(values):
+    
+    # The shape, the data type, the feature sums, and a hash of evenly spaced
+    # examples identify values without hashing all of them
+    
+    M = values.shape[0]
+    
+    sample_indices = numpy.unique(numpy.linspace(
+        0, M - 1, min(M, NUMBER_OF_EXAMPLES_FOR_FINGERPRINT), dtype=int))
+    sample = values[sample_indices]
+    
+    fingerprint = hashlib.sha1()
+    fingerprint.update(repr((values.shape, str(values.dtype))).encode())
+    fingerprint.update(numpy.ascontiguousarray(
+        numpy.asarray(values.sum(axis=0), dtype=numpy.float64)))
+    
+    if scipy.sparse.issparse(sample):
+        sample = scipy.sparse.csr_matrix(sample)
+        fingerprint.update(numpy.ascontiguousarray(sample.data))
+        fingerprint.update(numpy.ascontiguousarray(sample.indices))
+        fingerprint.update(numpy.ascontiguousarray(sample.indptr))
+    else:
+        fingerprint.update(numpy.ascontiguousarray(sample))
+    
+    return fingerprint.hexdigest()
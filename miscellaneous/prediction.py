@@ -17,15 +17,15 @@
 # ======================================================================== #
 
 import numpy
-import scipy.stats
+import scipy.sparse
 from kneed import KneeLocator
 from sklearn.cluster import KMeans, MiniBatchKMeans, DBSCAN
-from sklearn.neighbors import NearestNeighbors
 from scipy.signal import savgol_filter, convolve, windows
 
 from time import time
 
 from auxiliary import properString, formatDuration
+from miscellaneous.decomposition import neighbour_graph_cache
 
 PREDICTION_METHOD_NAMES = {
     "k-means": ["k_means", "kmeans"],
@@ -154,11 +154,12 @@ def predict(training_set, evaluation_set, method = "copy",
         
         minimum_neighbourhood_size = 2 * evaluation_set.number_of_features
         
-        knn_model = NearestNeighbors(
-            n_neighbors=minimum_neighbourhood_size - 1
+        # The nearest-neighbour index is built once and shared with t-SNE,
+        # and neighbours exclude the examples themselves
+        knn_distance_matrix, _ = neighbour_graph_cache.neighbours(
+            evaluation_set.values,
+            number_of_neighbours=max(minimum_neighbourhood_size - 2, 1)
         )
-        knn_model.fit(evaluation_set.values)
-        knn_distance_matrix, knn_index_matrix = knn_model.kneighbors(evaluation_set.values)
         knn_distances = knn_distance_matrix[:, -1]
         knn_distances_sorted = numpy.sort(knn_distances)[::-1]
         
@@ -173,11 +174,19 @@ def predict(training_set, evaluation_set, method = "copy",
         index_knee = knee_locator.knee
         maximum_neighbour_distance = knn_distances_sorted[index_knee]
         
+        # Neighbourhoods are only found once using the same index
+        radius_graph = neighbour_graph_cache.radiusGraph(
+            evaluation_set.values,
+            radius=maximum_neighbour_distance
+        )
+        
         model = DBSCAN(
             eps=maximum_neighbour_distance,
-            min_samples=minimum_neighbourhood_size
+            min_samples=minimum_neighbourhood_size,
+            metric="precomputed",
+            n_jobs=-1
         )
-        cluster_ids = model.fit_predict(evaluation_set.values)
+        cluster_ids = model.fit_predict(radius_graph)
     
     else:
         raise ValueError("Prediction method not found: `{}`.".format(method))
@@ -211,14 +220,51 @@ def predict(training_set, evaluation_set, method = "copy",
     return cluster_ids, predicted_labels, predicted_superset_labels
 
 def mapClusterIDsToLabelIDs(label_ids, cluster_ids, excluded_class_ids = []):
-    unique_cluster_ids = numpy.unique(cluster_ids).tolist()
-    predicted_label_ids = numpy.zeros_like(cluster_ids)
-    for unique_cluster_id in unique_cluster_ids:
-        idx = cluster_ids == unique_cluster_id
-        lab = label_ids[idx]
-        for excluded_class_id in excluded_class_ids:
-            lab = lab[lab != excluded_class_id]
-        if len(lab) == 0:
-            continue
-        predicted_label_ids[idx] = scipy.stats.mode(lab)[0]
+    
+    # Each cluster is mapped to its most frequent label, not counting
+    # excluded classes, and clusters with only excluded classes to zero
+    
+    cluster_ids = numpy.asarray(cluster_ids)
+    
+    contingency_matrix, unique_cluster_ids, unique_label_ids, \
+        cluster_indices = contingencyMatrix(label_ids, cluster_ids)
+    
+    included_label_indices = ~numpy.isin(unique_label_ids, excluded_class_ids)
+    contingency_matrix = contingency_matrix[:, included_label_indices]
+    included_label_ids = unique_label_ids[included_label_indices]
+    
+    cluster_label_ids = numpy.zeros(len(unique_cluster_ids),
+        dtype = cluster_ids.dtype)
+    
+    if contingency_matrix.nnz > 0:
+        clusters_with_labels = contingency_matrix.getnnz(axis = 1) > 0
+        most_frequent_label_indices = numpy.asarray(
+            contingency_matrix.argmax(axis = 1)).ravel()
+        cluster_label_ids[clusters_with_labels] = included_label_ids[
+            most_frequent_label_indices[clusters_with_labels]]
+    
+    predicted_label_ids = cluster_label_ids[cluster_indices]
+    
     return predicted_label_ids
+
+def contingencyMatrix(label_ids, cluster_ids):
+    
+    # Sparse matrix of the number of examples for each cluster (rows) and
+    # label (columns), found in one pass, together with the unique cluster
+    # IDs and label IDs for the rows and columns, and the row of each example
+    
+    unique_cluster_ids, cluster_indices = numpy.unique(
+        cluster_ids, return_inverse = True)
+    unique_label_ids, label_indices = numpy.unique(
+        label_ids, return_inverse = True)
+    
+    contingency_matrix = scipy.sparse.coo_matrix(
+        (
+            numpy.ones(len(cluster_indices), dtype = numpy.int64),
+            (cluster_indices, label_indices)
+        ),
+        shape = (len(unique_cluster_ids), len(unique_label_ids))
+    ).tocsr()
+    
+    return contingency_matrix, unique_cluster_ids, unique_label_ids, \
+        cluster_indices
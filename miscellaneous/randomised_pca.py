@@ -0,0 +1,170 @@
+# ======================================================================== #
+# 
+# Copyright (c) 2017 - 2018 scVAE authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# 
+# ======================================================================== #
+
+import numpy
+import scipy.sparse
+
+from sklearn.utils import check_random_state, gen_batches
+from sklearn.utils.extmath import svd_flip
+from sklearn.utils.validation import check_is_fitted
+
+DEFAULT_MEMORY_BUDGET = 2 ** 29 # bytes
+
+class RandomisedPCA(object):
+    """Randomised PCA for large dense or sparse matrices.
+    
+    Values are centred implicitly, so sparse matrices are never densified,
+    and all products with the values are computed in batches of examples,
+    so only a batch of examples is in memory at a time. The batch size is
+    chosen to fit the memory budget.
+    """
+    def __init__(self, n_components = None, n_oversamples = 10, n_iter = 4,
+                 memory_budget = DEFAULT_MEMORY_BUDGET, random_state = None):
+        self.n_components = n_components
+        self.n_oversamples = n_oversamples
+        self.n_iter = n_iter
+        self.memory_budget = memory_budget
+        self.random_state = random_state
+    
+    def fit(self, X, y = None):
+        self.fit_transform(X)
+        return self
+    
+    def fit_transform(self, X, y = None):
+        
+        n_samples, n_features = X.shape
+        
+        if self.n_components is None:
+            n_components = min(n_samples, n_features)
+        else:
+            n_components = self.n_components
+        
+        n_random_components = min(
+            n_components + self.n_oversamples, n_samples, n_features)
+        
+        random_state = check_random_state(self.random_state)
+        
+        self.batch_size_ = batchSizeForMemoryBudget(
+            X, n_random_components, self.memory_budget)
+        
+        # Feature means and variances
+        
+        feature_sums = numpy.zeros(n_features)
+        feature_squared_sums = numpy.zeros(n_features)
+        
+        for batch in gen_batches(n_samples, self.batch_size_):
+            X_batch = floatBatch(X, batch)
+            if scipy.sparse.issparse(X_batch):
+                X_squared_batch = X_batch.multiply(X_batch)
+            else:
+                X_squared_batch = numpy.square(X_batch)
+            feature_sums += numpy.asarray(X_batch.sum(axis = 0)).ravel()
+            feature_squared_sums += numpy.asarray(
+                X_squared_batch.sum(axis = 0)).ravel()
+        
+        self.mean_ = feature_sums / n_samples
+        self.var_ = (feature_squared_sums - n_samples * self.mean_ ** 2) \
+            / max(n_samples - 1, 1)
+        
+        # Range of the centred values found using power iterations
+        
+        Q = self._centredProduct(
+            X, random_state.normal(size = (n_features, n_random_components)))
+        Q, _ = numpy.linalg.qr(Q)
+        
+        for i in range(self.n_iter):
+            Z, _ = numpy.linalg.qr(self._centredTransposedProduct(X, Q))
+            Q, _ = numpy.linalg.qr(self._centredProduct(X, Z))
+        
+        # Singular value decomposition in the range
+        
+        B = self._centredTransposedProduct(X, Q).T
+        U_B, S, V = numpy.linalg.svd(B, full_matrices = False)
+        U, V = svd_flip(Q @ U_B, V)
+        
+        self.n_components_ = n_components
+        self.n_samples_seen_ = n_samples
+        self.components_ = V[:n_components]
+        self.singular_values_ = S[:n_components]
+        self.explained_variance_ = S[:n_components] ** 2 \
+            / max(n_samples - 1, 1)
+        self.explained_variance_ratio_ = self.explained_variance_ \
+            / self.var_.sum()
+        
+        return U[:, :n_components] * S[:n_components]
+    
+    def transform(self, X):
+        check_is_fitted(self, ["mean_", "components_"], all_or_any = all)
+        return self._centredProduct(X, self.components_.T)
+    
+    def _centredProduct(self, X, B):
+        
+        # (X - 1 mean^T) B
+        
+        n_samples = X.shape[0]
+        product = numpy.empty((n_samples, B.shape[1]))
+        
+        for batch in gen_batches(n_samples, self.batch_size_):
+            product[batch] = floatBatch(X, batch) @ B
+        
+        product -= self.mean_ @ B
+        
+        return product
+    
+    def _centredTransposedProduct(self, X, Q):
+        
+        # (X - 1 mean^T)^T Q
+        
+        n_samples, n_features = X.shape
+        product = numpy.zeros((n_features, Q.shape[1]))
+        
+        for batch in gen_batches(n_samples, self.batch_size_):
+            product += floatBatch(X, batch).T @ Q[batch]
+        
+        product -= numpy.outer(self.mean_, Q.sum(axis = 0))
+        
+        return product
+
+def batchSizeForMemoryBudget(X, n_components, memory_budget):
+    
+    n_samples, n_features = X.shape
+    
+    # A batch of examples as floats together with its products
+    if scipy.sparse.issparse(X):
+        number_of_bytes_per_example = X.nnz / max(n_samples, 1) \
+            * (8 + X.indices.itemsize)
+    else:
+        number_of_bytes_per_example = n_features * 8
+    number_of_bytes_per_example += n_components * 8
+    
+    batch_size = int(memory_budget // number_of_bytes_per_example)
+    batch_size = min(max(batch_size, n_components, 1), n_samples)
+    
+    return batch_size
+
+def floatBatch(X, batch):
+    
+    X_batch = X[batch]
+    
+    if not numpy.issubdtype(X_batch.dtype, numpy.floating):
+        X_batch = X_batch.astype(numpy.float64)
+    
+    if isinstance(X_batch, numpy.matrix):
+        X_batch = X_batch.A
+    
+    return X_batch
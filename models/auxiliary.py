@@ -26,16 +26,44 @@ from string import ascii_uppercase
 
 import numpy
 import tensorflow as tf
+from tensorflow.core.protobuf import rewriter_config_pb2
 from tensorflow.contrib.layers import (
     fully_connected, batch_norm, dropout,
     variance_scaling_initializer, xavier_initializer
 )
 from tensorflow.python.ops.nn import relu
 
-from auxiliary import capitaliseString
+from auxiliary import (
+    capitaliseString, normaliseString, properString,
+    formatDuration
+)
 
 LENTGH_OF_RUN_ID_ALPHABETICAL_PART = 2
 
+GRAPH_OPTIMISATION_NAMES = {
+    "XLA": ["xla", "jit", "xla_jit"],
+    "grappler": ["grappler", "aggressive"]
+}
+
+REDUCED_PRECISION_DTYPES = {
+    "float16": tf.float16,
+    "bfloat16": tf.bfloat16
+}
+
+DECODER_PRECISION_NAMES = {
+    "float32": ["float32", "single", "fp32"],
+    "float16": ["float16", "half", "fp16"],
+    "bfloat16": ["bfloat16", "bf16"]
+}
+
+# Initial loss scale used for half-precision training to keep small
+# gradients from underflowing. The loss scale is halved after each step with
+# gradients that are not finite and doubled after a number of steps with
+# finite gradients.
+HALF_PRECISION_LOSS_SCALE = 2**10
+LOSS_SCALE_INCREASE_INTERVAL = 2000
+MINIMUM_LOSS_SCALE = 1.
+
 ## N(mu=0,sigma=sqrt(2/n_in)) weight and 0-bias initialiser.
 # weights_init = variance_scaling_initializer(factor=2.0, mode ='FAN_IN', 
 #     uniform = False, seed = None, dtype = tf.float32)
@@ -51,7 +79,7 @@ def prelu(inputs, is_training, scope):
 def dense_layer(inputs, num_outputs, is_training = True, scope = "layer", 
     activation_fn = None, batch_normalisation = False, decay = 0.999, 
     center = True, scale = False, reuse = False, 
-    dropout_keep_probability = False):
+    dropout_keep_probability = False, precision = None):
     
     with tf.variable_scope(scope): 
         # Dropout input connections with rate = (1- dropout_keep_probability)
@@ -62,13 +90,21 @@ def dense_layer(inputs, num_outputs, is_training = True, scope = "layer",
             )
 
         # Set up weights for and transform inputs through neural network. 
-        outputs = fully_connected(inputs,
-            num_outputs = num_outputs,
-            activation_fn = None,
-            weights_initializer = weights_init, 
-            scope = 'DENSE',
-            reuse = reuse
-        )
+        if precision and precision != "float32":
+            outputs = reduced_precision_fully_connected(inputs,
+                num_outputs = num_outputs,
+                precision = precision,
+                scope = 'DENSE',
+                reuse = reuse
+            )
+        else:
+            outputs = fully_connected(inputs,
+                num_outputs = num_outputs,
+                activation_fn = None,
+                weights_initializer = weights_init, 
+                scope = 'DENSE',
+                reuse = reuse
+            )
 
         # Set up normalisation across examples with learned center and scale. 
         if batch_normalisation:
@@ -92,7 +128,7 @@ def dense_layers(inputs, num_outputs, reverse_order = False, is_training = True,
     scope = "layers", layer_name = None, activation_fn = None, batch_normalisation = False, 
     decay = 0.999, center = True, scale = False, reuse = False, 
     input_dropout_keep_probability = False,
-    hidden_dropout_keep_probability = False):
+    hidden_dropout_keep_probability = False, precision = None):
     if not isinstance(num_outputs, (list, tuple)):
         num_outputs = [num_outputs]
     if reverse_order:
@@ -127,11 +163,134 @@ def dense_layers(inputs, num_outputs, reverse_order = False, is_training = True,
                 center = center,
                 scale = scale,
                 reuse = reuse,
-                dropout_keep_probability = dropout_keep_probability
+                dropout_keep_probability = dropout_keep_probability,
+                precision = precision
             )
     
     return outputs
 
+# Linear layer with weights stored in single precision, but with inputs and
+# weights rounded to reduced precision for the matrix multiplication. The
+# products are accumulated in single precision, since TensorFlow has no
+# matrix multiplication of reduced-precision values with single-precision
+# outputs, and bfloat16 matrix multiplication has no CPU kernel in all
+# versions. The outputs are therefore in single precision, so batch
+# normalisation, activation functions, and likelihood functions are
+# unaffected. Variable names are the same as for `fully_connected`, so
+# checkpoints are shared.
+def reduced_precision_fully_connected(inputs, num_outputs,
+    precision = "bfloat16", scope = "DENSE", reuse = False):
+    
+    dtype = REDUCED_PRECISION_DTYPES[precision]
+    
+    with tf.variable_scope(scope, reuse = reuse):
+        
+        input_size = inputs.shape[-1].value
+        
+        weights = tf.get_variable(
+            "weights",
+            shape = [input_size, num_outputs],
+            dtype = tf.float32,
+            initializer = weights_init
+        )
+        biases = tf.get_variable(
+            "biases",
+            shape = [num_outputs],
+            dtype = tf.float32,
+            initializer = tf.zeros_initializer()
+        )
+        
+        # Inputs can have leading sample dimensions
+        flattened_inputs = tf.reshape(inputs, [-1, input_size])
+        
+        outputs = tf.matmul(
+            tf.cast(tf.cast(flattened_inputs, dtype), tf.float32),
+            tf.cast(tf.cast(weights, dtype), tf.float32)
+        )
+        outputs = outputs + biases
+        
+        outputs = tf.reshape(
+            outputs,
+            tf.concat([tf.shape(inputs)[:-1], [num_outputs]], axis = 0)
+        )
+    
+    return outputs
+
+# Training operation applying gradients of the loss clipped to [-1, 1]. With
+# a loss scale, the loss is scaled before computing gradients, which are
+# unscaled afterwards, and the loss scale is updated dynamically. Steps with
+# gradients that are not finite are then skipped, since clipping would turn
+# infinite gradients into finite ones and keep NaN, and they are counted.
+def trainingOperation(optimiser, loss, global_step, loss_scale = 1):
+    
+    if loss_scale == 1:
+        gradients = optimiser.compute_gradients(loss)
+        clipped_gradients = [(tf.clip_by_value(gradient, -1., 1.), variable)
+            for gradient, variable in gradients]
+        train_op = optimiser.apply_gradients(clipped_gradients,
+            global_step = global_step)
+        return train_op, None, None
+    
+    with tf.variable_scope("loss_scaling"):
+        loss_scale = tf.get_variable(
+            "loss_scale",
+            initializer = tf.constant(float(loss_scale)),
+            trainable = False
+        )
+        number_of_finite_steps = tf.get_variable(
+            "number_of_finite_steps",
+            initializer = tf.constant(0),
+            trainable = False
+        )
+        number_of_skipped_steps = tf.get_variable(
+            "number_of_skipped_steps",
+            initializer = tf.constant(0),
+            trainable = False
+        )
+    
+    gradients = optimiser.compute_gradients(loss * loss_scale)
+    gradients = [(gradient / loss_scale, variable)
+        for gradient, variable in gradients]
+    
+    gradients_finite = tf.reduce_all([
+        tf.reduce_all(tf.is_finite(gradient))
+        for gradient, _ in gradients
+    ])
+    
+    def applyGradients():
+        
+        clipped_gradients = [(tf.clip_by_value(gradient, -1., 1.), variable)
+            for gradient, variable in gradients]
+        apply_op = optimiser.apply_gradients(clipped_gradients,
+            global_step = global_step)
+        
+        with tf.control_dependencies([apply_op]):
+            new_number_of_finite_steps = tf.mod(
+                number_of_finite_steps + 1, LOSS_SCALE_INCREASE_INTERVAL)
+            new_loss_scale = tf.where(
+                tf.equal(new_number_of_finite_steps, 0),
+                2. * loss_scale,
+                loss_scale
+            )
+            return tf.group(
+                tf.assign(number_of_finite_steps, new_number_of_finite_steps),
+                tf.assign(loss_scale, new_loss_scale)
+            )
+    
+    def skipStep():
+        # The global step is still incremented, since it counts batches
+        return tf.group(
+            tf.assign_add(global_step, 1),
+            tf.assign_add(number_of_skipped_steps, 1),
+            tf.assign(number_of_finite_steps, 0),
+            tf.assign(loss_scale,
+                tf.maximum(loss_scale / 2., MINIMUM_LOSS_SCALE))
+        )
+    
+    train_op = tf.cond(gradients_finite, applyGradients, skipStep)
+    
+    return train_op, loss_scale, number_of_skipped_steps
+
 def log_reduce_exp(A, reduction_function=tf.reduce_mean, axis=None):
     # log-mean-exp over axis to avoid overflow and underflow
     A_max = tf.reduce_max(A, axis=axis, keepdims=True)
@@ -382,3 +541,499 @@ def removeOldCheckpoints(directory):
                 and not checkpoint.model_checkpoint_path in file_path
             if is_old_checkpoint_file:
                 os.remove(file_path)
+
+# Sessions
+
+def sessionConfiguration(number_of_intra_op_threads = None,
+    number_of_inter_op_threads = None, graph_optimisation = None,
+    per_session_threads = False):
+    
+    config = tf.ConfigProto()
+    config.gpu_options.allow_growth = True
+    
+    graph_optimisation = parseGraphOptimisation(graph_optimisation)
+    
+    if graph_optimisation == "XLA":
+        config.graph_options.optimizer_options.global_jit_level = \
+            tf.OptimizerOptions.ON_1
+    
+    elif graph_optimisation == "grappler":
+        rewrite_options = config.graph_options.rewrite_options
+        rewrite_options.arithmetic_optimization = \
+            rewriter_config_pb2.RewriterConfig.AGGRESSIVE
+        rewrite_options.constant_folding = \
+            rewriter_config_pb2.RewriterConfig.AGGRESSIVE
+        rewrite_options.dependency_optimization = \
+            rewriter_config_pb2.RewriterConfig.AGGRESSIVE
+        rewrite_options.remapping = rewriter_config_pb2.RewriterConfig.ON
+        rewrite_options.loop_optimization = \
+            rewriter_config_pb2.RewriterConfig.ON
+        rewrite_options.shape_optimization = \
+            rewriter_config_pb2.RewriterConfig.ON
+    
+    # Zero means that TensorFlow chooses the number of threads itself
+    if number_of_intra_op_threads:
+        config.intra_op_parallelism_threads = number_of_intra_op_threads
+    if number_of_inter_op_threads:
+        config.inter_op_parallelism_threads = number_of_inter_op_threads
+    
+    # The inter-op thread pool is otherwise shared by all sessions in the
+    # process and fixed by the first session created
+    if per_session_threads:
+        config.use_per_session_threads = True
+    
+    return config
+
+def parseGraphOptimisation(graph_optimisation):
+    
+    if not graph_optimisation \
+        or normaliseString(graph_optimisation) in ["none", "default"]:
+        return None
+    
+    proper_graph_optimisation = properString(
+        graph_optimisation, GRAPH_OPTIMISATION_NAMES)
+    
+    if proper_graph_optimisation not in GRAPH_OPTIMISATION_NAMES:
+        raise ValueError(
+            "Graph optimisation `{}` not found.".format(graph_optimisation))
+    
+    return proper_graph_optimisation
+
+def parseDecoderPrecision(decoder_precision):
+    
+    if not decoder_precision \
+        or normaliseString(decoder_precision) in ["none", "default"]:
+        return None
+    
+    proper_decoder_precision = properString(
+        decoder_precision, DECODER_PRECISION_NAMES)
+    
+    if proper_decoder_precision not in DECODER_PRECISION_NAMES:
+        raise ValueError(
+            "Decoder precision `{}` not found.".format(decoder_precision))
+    
+    if proper_decoder_precision == "float32":
+        return None
+    
+    return proper_decoder_precision
+
+class EvaluationSessionCache(object):
+    
+    # Single session for evaluating a model, which is kept open between
+    # evaluations. Parameters of each model version are restored from their
+    # checkpoint once and then kept in memory, so switching between versions
+    # only loads the parameter values into the session.
+    
+    def __init__(self, model):
+        self.model = model
+        self.session = None
+        self.parameter_values = {}
+        self.restored_key = None
+    
+    def restore(self, model_checkpoint_path, model_version):
+        
+        if self.session is None:
+            self.session = tf.Session(
+                graph = self.model.graph,
+                config = self.model.config
+            )
+        
+        key = (model_version, model_checkpoint_path)
+        
+        if key == self.restored_key:
+            return self.session
+        
+        # Only model parameters and batch-normalisation statistics are used
+        # for evaluation, so optimiser variables are not kept in memory
+        variables = self.model.graph.get_collection(
+            tf.GraphKeys.TRAINABLE_VARIABLES)
+        variables += [
+            variable for variable in self.model.graph.get_collection(
+                tf.GraphKeys.MODEL_VARIABLES)
+            if variable not in variables
+        ]
+        
+        if key in self.parameter_values:
+            for variable in variables:
+                variable.load(
+                    self.parameter_values[key][variable.op.name],
+                    self.session
+                )
+        else:
+            self.model.saver.restore(self.session, model_checkpoint_path)
+            self.parameter_values[key] = dict(zip(
+                [variable.op.name for variable in variables],
+                self.session.run(variables)
+            ))
+        
+        self.restored_key = key
+        
+        return self.session
+    
+    def clear(self):
+        if self.session is not None:
+            self.session.close()
+        self.session = None
+        self.parameter_values = {}
+        self.restored_key = None
+
+def availableCPUs():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    else:
+        return list(range(os.cpu_count() or 1))
+
+def parseCPUList(cpu_list_string):
+    
+    cpus = set()
+    
+    for cpu_range in str(cpu_list_string).split(","):
+        cpu_range = cpu_range.strip()
+        if not cpu_range:
+            continue
+        try:
+            if "-" in cpu_range:
+                first_cpu, last_cpu = map(int, cpu_range.split("-"))
+                cpus.update(range(first_cpu, last_cpu + 1))
+            else:
+                cpus.add(int(cpu_range))
+        except ValueError:
+            raise ValueError(
+                "CPU list `{}` should consist of CPU numbers and ranges "
+                "separated by commas (for example, `0-7,16-23`)."
+                    .format(cpu_list_string)
+            )
+    
+    return sorted(cpus)
+
+def pinProcessToCPUs(cpu_list_string):
+    
+    if not hasattr(os, "sched_setaffinity"):
+        raise ValueError(
+            "Cannot pin process to CPUs `{}`, since pinning processes to "
+            "CPUs is not supported on this platform.".format(cpu_list_string))
+    
+    cpus = parseCPUList(cpu_list_string)
+    os.sched_setaffinity(0, cpus)
+    
+    return availableCPUs()
+
+def timeTrainingSteps(model, feed_dict, config, number_of_steps = 10,
+    number_of_warm_up_steps = 2):
+    
+    with model.graph.as_default():
+        initialiser = tf.global_variables_initializer()
+    
+    with tf.Session(graph = model.graph, config = config) as session:
+        
+        session.run(initialiser)
+        
+        for step in range(number_of_warm_up_steps):
+            session.run(model.train_op, feed_dict = feed_dict)
+        
+        start_time = time.time()
+        
+        for step in range(number_of_steps):
+            session.run(model.train_op, feed_dict = feed_dict)
+        
+        duration = (time.time() - start_time) / number_of_steps
+    
+    return duration
+
+def trainingStepPeakMemory(model, feed_dict, config):
+    
+    # Peak memory (in bytes) allocated during a single training step as
+    # traced by TensorFlow for each allocator and summed over allocators
+    
+    run_options = tf.RunOptions(trace_level = tf.RunOptions.FULL_TRACE)
+    run_metadata = tf.RunMetadata()
+    
+    with model.graph.as_default():
+        initialiser = tf.global_variables_initializer()
+    
+    with tf.Session(graph = model.graph, config = config) as session:
+        session.run(initialiser)
+        session.run(
+            model.train_op,
+            feed_dict = feed_dict,
+            options = run_options,
+            run_metadata = run_metadata
+        )
+    
+    peak_memory = {}
+    
+    for device_step_stats in run_metadata.step_stats.dev_stats:
+        for node_step_stats in device_step_stats.node_stats:
+            for memory in node_step_stats.memory:
+                peak_memory[memory.allocator_name] = max(
+                    peak_memory.get(memory.allocator_name, 0),
+                    memory.peak_bytes,
+                    memory.allocator_bytes_in_use
+                )
+    
+    return sum(peak_memory.values())
+
+def autotuneThreads(model, training_set, batch_size = 100,
+    learning_rate = 1e-4, number_of_steps = 10):
+    
+    number_of_cores = len(availableCPUs())
+    
+    intra_op_thread_counts = sorted(set(
+        max(1, number_of_cores // divisor) for divisor in [1, 2, 4, 8]
+    ), reverse = True)
+    inter_op_thread_counts = [1, 2]
+    
+    feed_dict = model.trainingFeedDictionary(
+        training_set,
+        batch_size = batch_size,
+        learning_rate = learning_rate
+    )
+    
+    print("Timing {} training steps for each thread setting on {} cores."
+        .format(number_of_steps, number_of_cores))
+    autotuning_time_start = time.time()
+    
+    step_durations = {}
+    
+    for number_of_intra_op_threads in intra_op_thread_counts:
+        for number_of_inter_op_threads in inter_op_thread_counts:
+            
+            config = sessionConfiguration(
+                number_of_intra_op_threads,
+                number_of_inter_op_threads,
+                graph_optimisation = model.graph_optimisation,
+                per_session_threads = True
+            )
+            
+            step_duration = timeTrainingSteps(
+                model, feed_dict, config, number_of_steps)
+            step_durations[
+                (number_of_intra_op_threads, number_of_inter_op_threads)
+            ] = step_duration
+            
+            print("    {} intra-op and {} inter-op threads: {} per step."
+                .format(
+                    number_of_intra_op_threads,
+                    number_of_inter_op_threads,
+                    formatDuration(step_duration)
+                )
+            )
+    
+    number_of_intra_op_threads, number_of_inter_op_threads = min(
+        step_durations, key = step_durations.get)
+    
+    model.number_of_intra_op_threads = number_of_intra_op_threads
+    model.number_of_inter_op_threads = number_of_inter_op_threads
+    model.config = sessionConfiguration(
+        number_of_intra_op_threads,
+        number_of_inter_op_threads,
+        graph_optimisation = model.graph_optimisation
+    )
+    
+    autotuning_duration = time.time() - autotuning_time_start
+    print("Using {} intra-op and {} inter-op threads ({}).".format(
+        number_of_intra_op_threads,
+        number_of_inter_op_threads,
+        formatDuration(autotuning_duration)
+    ))
+    
+    return number_of_intra_op_threads, number_of_inter_op_threads
+
+def validateGraphOptimisation(model, training_set, batch_size = 100,
+    learning_rate = 1e-4, number_of_evaluations = 10, number_of_steps = 10,
+    relative_tolerance = 1e-3):
+    
+    # Compares the lower bound and the training step duration using the
+    # graph optimisation of the model with those using no optimisation
+    # for the same parameters and batch
+    
+    if not model.graph_optimisation:
+        return True
+    
+    print("Validating {} graph optimisation.".format(
+        model.graph_optimisation))
+    validation_time_start = time.time()
+    
+    default_config = sessionConfiguration(
+        model.number_of_intra_op_threads,
+        model.number_of_inter_op_threads,
+        per_session_threads = True
+    )
+    optimised_config = sessionConfiguration(
+        model.number_of_intra_op_threads,
+        model.number_of_inter_op_threads,
+        graph_optimisation = model.graph_optimisation,
+        per_session_threads = True
+    )
+    
+    feed_dict = model.trainingFeedDictionary(
+        training_set,
+        batch_size = batch_size,
+        learning_rate = learning_rate
+    )
+    
+    default_lower_bounds, default_step_duration, variable_values = \
+        lowerBoundsAndStepDuration(
+            model, feed_dict, default_config,
+            number_of_evaluations = number_of_evaluations,
+            number_of_steps = number_of_steps
+        )
+    optimised_lower_bounds, optimised_step_duration, _ = \
+        lowerBoundsAndStepDuration(
+            model, feed_dict, optimised_config,
+            variable_values = variable_values,
+            number_of_evaluations = number_of_evaluations,
+            number_of_steps = number_of_steps
+        )
+    
+    lower_bound_difference, tolerance = compareLowerBounds(
+        default_lower_bounds, optimised_lower_bounds, relative_tolerance)
+    valid = bool(lower_bound_difference <= tolerance)
+    
+    for name, lower_bounds, step_duration in [
+        ("Default", default_lower_bounds, default_step_duration),
+        (model.graph_optimisation, optimised_lower_bounds,
+            optimised_step_duration)
+        ]:
+        print("    {}: lower bound {:.6g}, {} per training step.".format(
+            name, lower_bounds.mean(), formatDuration(step_duration)))
+    
+    print("    Difference in lower bound: {:.3g} (tolerance: {:.3g}).".format(
+        lower_bound_difference, tolerance))
+    print("    Speed-up: {:.2f}×.".format(
+        default_step_duration / optimised_step_duration))
+    
+    validation_duration = time.time() - validation_time_start
+    print("Graph optimisation {} ({}).".format(
+        "validated" if valid else "changed the lower bound",
+        formatDuration(validation_duration)
+    ))
+    
+    return valid
+
+def reportDecoderPrecisionDrift(model, reference_model, training_set,
+    batch_size = 100, learning_rate = 1e-4, number_of_evaluations = 10,
+    number_of_steps = 10, relative_tolerance = 1e-3):
+    
+    # Compares the lower bound and the training step duration of a model
+    # using reduced decoder precision with those of the same model using
+    # single precision for the same parameters and batch
+    
+    print("Comparing {} decoder with float32 decoder.".format(
+        model.decoder_precision))
+    comparison_time_start = time.time()
+    
+    batch_indices = numpy.random.permutation(
+        training_set.number_of_examples)
+    
+    lower_bounds = {}
+    step_durations = {}
+    variable_values = None
+    
+    for precision, precision_model in [
+        ("float32", reference_model),
+        (model.decoder_precision, model)
+        ]:
+        
+        feed_dict = precision_model.trainingFeedDictionary(
+            training_set,
+            batch_size = batch_size,
+            learning_rate = learning_rate,
+            batch_indices = batch_indices
+        )
+        
+        lower_bounds[precision], step_durations[precision], \
+            variable_values = lowerBoundsAndStepDuration(
+                precision_model, feed_dict, precision_model.config,
+                variable_values = variable_values,
+                number_of_evaluations = number_of_evaluations,
+                number_of_steps = number_of_steps
+            )
+    
+    lower_bound_drift, tolerance = compareLowerBounds(
+        lower_bounds["float32"],
+        lower_bounds[model.decoder_precision],
+        relative_tolerance
+    )
+    
+    for precision in lower_bounds:
+        print("    {}: lower bound {:.6g}, {} per training step.".format(
+            precision,
+            lower_bounds[precision].mean(),
+            formatDuration(step_durations[precision])
+        ))
+    
+    print("    Drift in lower bound: {:.3g} ({:.3g} %; tolerance: {:.3g}).".format(
+        lower_bound_drift,
+        100 * lower_bound_drift / abs(lower_bounds["float32"].mean()),
+        tolerance
+    ))
+    print("    Speed-up: {:.2f}×.".format(
+        step_durations["float32"] / step_durations[model.decoder_precision]))
+    
+    comparison_duration = time.time() - comparison_time_start
+    print("Decoder precisions compared ({}).".format(
+        formatDuration(comparison_duration)))
+    
+    return {
+        "lower bound drift": lower_bound_drift,
+        "tolerance": tolerance,
+        "step durations": step_durations
+    }
+
+def lowerBoundsAndStepDuration(model, feed_dict, config,
+    variable_values = None, number_of_evaluations = 10, number_of_steps = 10):
+    
+    # Parameters are initialised randomly unless values are given for them
+    # (by variable name), in which case these are used instead
+    
+    evaluation_feed_dict = dict(feed_dict)
+    evaluation_feed_dict[model.is_training] = False
+    if hasattr(model, "use_deterministic_z"):
+        evaluation_feed_dict[model.use_deterministic_z] = True
+    
+    with model.graph.as_default():
+        initialiser = tf.global_variables_initializer()
+        variables = tf.global_variables()
+    
+    with tf.Session(graph = model.graph, config = config) as session:
+        
+        session.run(initialiser)
+        
+        if variable_values is None:
+            variable_values = {
+                variable.op.name: value
+                for variable, value in zip(variables, session.run(variables))
+            }
+        else:
+            for variable in variables:
+                if variable.op.name in variable_values:
+                    variable.load(variable_values[variable.op.name], session)
+        
+        lower_bounds = numpy.array([
+            session.run(model.ELBO, feed_dict = evaluation_feed_dict)
+            for i in range(number_of_evaluations)
+        ])
+    
+    step_duration = timeTrainingSteps(
+        model, feed_dict, config, number_of_steps)
+    
+    return lower_bounds, step_duration, variable_values
+
+def compareLowerBounds(reference_lower_bounds, lower_bounds,
+    relative_tolerance = 1e-3):
+    
+    lower_bound_difference = abs(
+        lower_bounds.mean() - reference_lower_bounds.mean())
+    
+    # Lower bounds are stochastic, so their standard error is also allowed
+    standard_error = numpy.sqrt(
+        (reference_lower_bounds.var() + lower_bounds.var())
+        / len(lower_bounds)
+    )
+    tolerance = max(
+        relative_tolerance * abs(reference_lower_bounds.mean()),
+        3 * standard_error
+    )
+    
+    return lower_bound_difference, tolerance
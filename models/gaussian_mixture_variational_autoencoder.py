@@ -25,7 +25,10 @@ from models.auxiliary import (
     trainingString, dataString,
     generateUniqueRunIDForModel,
     correctModelCheckpointPath, copyModelDirectory, removeOldCheckpoints,
-    clearLogDirectory
+    clearLogDirectory,
+    sessionConfiguration, parseGraphOptimisation, parseDecoderPrecision,
+    EvaluationSessionCache,
+    HALF_PRECISION_LOSS_SCALE, trainingOperation
 )
 
 from tensorflow.python.ops.nn import relu, softmax
@@ -35,7 +38,10 @@ from tensorflow.contrib.distributions import (
     Normal, Bernoulli, Categorical,
     kl_divergence
 )
-from distributions import distributions, latent_distributions, Categorized
+from distributions import (
+    distributions, latent_distributions, Categorized,
+    MixtureOfDiagonalNormals
+)
 
 import numpy
 from numpy import inf
@@ -73,6 +79,10 @@ class GaussianMixtureVariationalAutoencoder(object):
         clf_weight = 1.0,
         number_of_labeled_examples = 0,
         epsilon = 1e-6,
+        number_of_intra_op_threads = None,
+        number_of_inter_op_threads = None,
+        graph_optimisation = None,
+        decoder_precision = None,
         log_directory = "log",
         results_directory = "results"):
         
@@ -179,8 +189,24 @@ class GaussianMixtureVariationalAutoencoder(object):
         self.stopped_early = None
         
         # Graph setup
-        self.config = tf.ConfigProto()
-        self.config.gpu_options.allow_growth = True
+        self.number_of_intra_op_threads = number_of_intra_op_threads
+        self.number_of_inter_op_threads = number_of_inter_op_threads
+        self.graph_optimisation = parseGraphOptimisation(graph_optimisation)
+        self.config = sessionConfiguration(
+            number_of_intra_op_threads = number_of_intra_op_threads,
+            number_of_inter_op_threads = number_of_inter_op_threads,
+            graph_optimisation = self.graph_optimisation
+        )
+        
+        # Dense layers of the decoder can use reduced precision for their
+        # matrix multiplications, in which case the loss is scaled for
+        # half precision to avoid underflowing gradients
+        self.decoder_precision = parseDecoderPrecision(decoder_precision)
+        if self.decoder_precision == "float16":
+            self.loss_scale = HALF_PRECISION_LOSS_SCALE
+        else:
+            self.loss_scale = 1
+        
         self.graph = tf.Graph()
         
         self.parameter_summary_list = []
@@ -240,15 +266,13 @@ class GaussianMixtureVariationalAutoencoder(object):
                 )
             if self.count_sum:
                 self.n = tf.placeholder(tf.float32, [None, 1], 'count_sum')
-                self.replicated_n = tf.tile(
-                    self.n,
-                    [self.S_iw*self.S_mc, 1]
-                )
             self.model_graph()
             self.loss()
             self.training()
             
             self.saver = tf.train.Saver(max_to_keep = 1)
+        
+        self.evaluation_session_cache = EvaluationSessionCache(self)
     
     @property
     def name(self):
@@ -288,6 +312,9 @@ class GaussianMixtureVariationalAutoencoder(object):
         
         if self.batch_normalisation:
             reconstruction_parts.append("bn")
+        
+        if self.decoder_precision:
+            reconstruction_parts.append("p_{}".format(self.decoder_precision))
 
         if len(self.dropout_parts) > 0:
             reconstruction_parts.append(
@@ -436,6 +463,10 @@ class GaussianMixtureVariationalAutoencoder(object):
         
         if self.batch_normalisation:
             description_parts.append("using batch normalisation")
+        
+        if self.decoder_precision:
+            description_parts.append("decoder precision: {}".format(
+                self.decoder_precision))
 
         if self.number_of_warm_up_epochs:
             description_parts.append("using linear warm-up weighting for " + \
@@ -553,6 +584,10 @@ class GaussianMixtureVariationalAutoencoder(object):
     def p_z_given_y_graph(self, y, distribution_name = "modified gaussian",
         reuse = False):
         
+        # All components are parameterised at once from the stacked one-hot
+        # encodings, y: (K, B, K), and are stacked on the second-to-last
+        # axis of the returned mixture: (1, 1, B, K, L)
+        
         with tf.variable_scope("P"):
             with tf.variable_scope(normaliseString(distribution_name).upper()):
                 distribution = distributions[distribution_name]
@@ -565,24 +600,31 @@ class GaussianMixtureVariationalAutoencoder(object):
                     p_min, p_max = \
                         distribution["parameters"][parameter]["support"]
                     theta[parameter] = tf.expand_dims(tf.expand_dims(
-                        dense_layer(
-                            inputs = y,
-                            num_outputs = self.latent_size,
-                            activation_fn = lambda x: tf.clip_by_value(
-                                parameter_activation_function(x),
-                                p_min + self.epsilon,
-                                p_max - self.epsilon
+                        tf.transpose(
+                            dense_layer(
+                                inputs = y,
+                                num_outputs = self.latent_size,
+                                activation_fn = lambda x: tf.clip_by_value(
+                                    parameter_activation_function(x),
+                                    p_min + self.epsilon,
+                                    p_max - self.epsilon
+                                ),
+                                is_training = self.is_training,
+                                dropout_keep_probability =
+                                    self.dropout_keep_probability_y,
+                                scope = parameter.upper(),
+                                reuse = reuse
                             ),
-                            is_training = self.is_training,
-                            dropout_keep_probability =
-                                self.dropout_keep_probability_y,
-                            scope = parameter.upper(),
-                            reuse = reuse
-                    ), 0), 0)
-
-                p_z_given_y = distribution["class"](theta)
-                p_z_mean = tf.reduce_mean(p_z_given_y.mean())
-        return p_z_given_y, p_z_mean
+                            [1, 0, 2]
+                        ), 0), 0)
+                
+                p_z_given_y_components = distribution["class"](theta)
+                p_z_given_y = MixtureOfDiagonalNormals(
+                    logits = tf.reshape(self.p_y_logits, [1, 1, 1, self.K]),
+                    locs = p_z_given_y_components.mean(),
+                    scale_diags = p_z_given_y_components.stddev()
+                )
+        return p_z_given_y
 
     def q_y_given_x_graph(self, x, distribution_name = "categorical",
         reuse = False):
@@ -648,6 +690,7 @@ class GaussianMixtureVariationalAutoencoder(object):
             is_training = self.is_training,
             input_dropout_keep_probability = self.dropout_keep_probability_z,
             hidden_dropout_keep_probability = self.dropout_keep_probability_h,
+            precision = self.decoder_precision,
             scope = "DECODER",
             layer_name = "LAYER",
             reuse = reuse
@@ -678,20 +721,29 @@ class GaussianMixtureVariationalAutoencoder(object):
                     ),
                     is_training = self.is_training,
                     dropout_keep_probability = self.dropout_keep_probability_h,
+                    precision = self.decoder_precision,
                     scope = parameter.upper(),
                     reuse = reuse
                 )
+                
+                # Give parameters a leading sample axis, so that targets and
+                # count sums are broadcast across samples instead of tiled:
+                # (R * L * B, F) --> (R * L, B, F)
+                x_theta[parameter] = tf.reshape(
+                    x_theta[parameter],
+                    [self.S_iw * self.S_mc, -1, self.feature_size]
+                )
             
             if "constrained" in self.reconstruction_distribution_name or \
                 "multinomial" in self.reconstruction_distribution_name:
                 p_x_given_z = self.reconstruction_distribution["class"](
                     x_theta,
-                    self.replicated_n
+                    self.n
                 )
             elif "multinomial" in self.reconstruction_distribution_name:
                 p_x_given_z = self.reconstruction_distribution["class"](
                     x_theta,
-                    self.replicated_n
+                    self.n
                 )
             else:
                 p_x_given_z = self.reconstruction_distribution["class"](
@@ -706,12 +758,13 @@ class GaussianMixtureVariationalAutoencoder(object):
                     activation_fn = None,
                     is_training = self.is_training,
                     dropout_keep_probability = self.dropout_keep_probability_h,
+                    precision = self.decoder_precision,
                     scope = "P_K",
                     reuse = reuse
                 )
                 
                 x_logits = tf.reshape(x_logits,
-                    [-1, self.feature_size,
+                    [self.S_iw * self.S_mc, -1, self.feature_size,
                         self.number_of_reconstruction_classes])
                 
                 p_x_given_z = Categorized(
@@ -763,12 +816,20 @@ class GaussianMixtureVariationalAutoencoder(object):
             self.q_z_given_x_y = [None]*self.K
             z_mean = [None]*self.K
             self.z = [None]*self.K
-            self.p_z_given_y = [None]*self.K
             self.p_z_mean = [None]*self.K
             self.p_z_means = []
             self.p_z_variances = []
             self.q_z_means = []
             self.q_z_variances = []
+            
+            # Latent prior distribution for all K gaussians
+            self.p_z_given_y = self.p_z_given_y_graph(tf.stack(y))
+            
+            # (1, 1, B, K, L) --> (K, L)
+            p_z_means = tf.reduce_mean(self.p_z_given_y.locs, [0, 1, 2])
+            p_z_stddevs = tf.reduce_mean(self.p_z_given_y.scale_diags,
+                [0, 1, 2])
+            
             # Loop over parameter layers for all K gaussians.
             for k in range(self.K):
                 if k >= 1:
@@ -779,15 +840,10 @@ class GaussianMixtureVariationalAutoencoder(object):
                 ## Latent prior distribution
                 self.q_z_given_x_y[k], z_mean[k], self.z[k] = \
                 self.q_z_given_x_y_graph(self.x, y[k], reuse = reuse_weights) 
-                # Latent prior distribution
-                self.p_z_given_y[k], self.p_z_mean[k] = \
-                    self.p_z_given_y_graph(y[k], reuse = reuse_weights)
-                
-                self.p_z_means.append(
-                    tf.reduce_mean(self.p_z_given_y[k].mean(), [0, 1, 2]))
-                self.p_z_variances.append(
-                    tf.square(tf.reduce_mean(self.p_z_given_y[k].stddev(),
-                        [0, 1, 2])))
+                
+                self.p_z_mean[k] = tf.reduce_mean(p_z_means[k])
+                self.p_z_means.append(p_z_means[k])
+                self.p_z_variances.append(tf.square(p_z_stddevs[k]))
                     
                 self.q_z_means.append(
                     tf.reduce_mean(self.q_z_given_x_y[k].mean(), [0, 1, 2]))
@@ -838,10 +894,7 @@ class GaussianMixtureVariationalAutoencoder(object):
     
 
     def loss(self):
-        # Prepare replicated and reshaped arrays
-        ## Replicate out batches in tiles pr. sample into: 
-        ### shape = (R * L * batchsize, N_x)
-        t_tiled = tf.tile(self.t, [self.S_iw*self.S_mc, 1])
+        # Prepare reshaped arrays
         ## Reshape samples back to: 
         ### shape = (R, L, batchsize, N_z)
         z_reshaped = [
@@ -870,6 +923,12 @@ class GaussianMixtureVariationalAutoencoder(object):
 
         KL_z = [None] * self.K
         KL_z_mean = [None] * self.K
+        
+        # Evaluate all K latent prior components at once:
+        # K * [(R, L, B, L)] --> (R, L, B, K, L) --> (R, L, B, K)
+        log_p_z_given_y_components = self.p_z_given_y.component_log_prob(
+            tf.stack(z_reshaped, axis = -2))
+        
         log_p_x_given_z_mean = [None] * self.K
         log_likelihood_x_z = [None] * self.K
         p_x_means = [None] * self.K
@@ -885,13 +944,8 @@ class GaussianMixtureVariationalAutoencoder(object):
                 ),
                 axis = -1
             )
-            # (R, L, B, L) --> (R, L, B)
-            log_p_z_given_y = tf.reduce_sum(
-                self.p_z_given_y[k].log_prob(
-                    z_reshaped[k]
-                ),
-                axis = -1
-            )
+            # (R, L, B, K) --> (R, L, B)
+            log_p_z_given_y = log_p_z_given_y_components[..., k]
             # (R, L, B)
             KL_z[k] = log_q_z_given_x_y - log_p_z_given_y
 
@@ -901,8 +955,8 @@ class GaussianMixtureVariationalAutoencoder(object):
                 axis=(0,1)
             ) * self.q_y_given_x_probs[:, k]
 
-            # (R, L, B, F)
-            p_x_given_z_log_prob = self.p_x_given_z[k].log_prob(t_tiled)
+            # (B, F) broadcast to (R * L, B, F)
+            p_x_given_z_log_prob = self.p_x_given_z[k].log_prob(self.t)
 
             # (R, L, B, F) --> (R, L, B)
             log_p_x_given_z = tf.reshape(
@@ -943,7 +997,7 @@ class GaussianMixtureVariationalAutoencoder(object):
             #     tf.reshape(-KL_z[k][:,0,:], [self.S_iw, -1, 1])
             # )
 
-            # (R * L * B, F) --> (R, L, B, F) 
+            # (R * L, B, F) --> (R, L, B, F) 
             p_x_given_z_mean = tf.reshape(
                 self.p_x_given_z[k].mean(),
                 [self.S_iw, self.S_mc, -1, self.feature_size]
@@ -962,7 +1016,7 @@ class GaussianMixtureVariationalAutoencoder(object):
 
             # Ê[V[x|z]] \approx q(y|x) * 1/(R*L) \sum^R_r w_r \sum^L_{l=1}
             #                 * E[x|z_lr]
-            # (R * L * B, F) --> (R, L, B, F) --> (R, B, F) --> (B, F)
+            # (R * L, B, F) --> (R, L, B, F) --> (R, B, F) --> (B, F)
             mean_of_p_x_given_z_variances[k] = tf.reduce_mean(
                 tf.reduce_mean(
                     tf.reshape(
@@ -1104,14 +1158,13 @@ class GaussianMixtureVariationalAutoencoder(object):
             #     global_step = self.global_step
             # )
         
-            gradients = optimiser.compute_gradients(-self.total_loss)
-            # gradients = optimiser.compute_gradients(-self.ELBO_train_modified)
-            clipped_gradients = [
-                (tf.clip_by_value(gradient, -1., 1.), variable)
-                for gradient, variable in gradients
-            ]
-            self.train_op = optimiser.apply_gradients(clipped_gradients,
-                global_step = self.global_step)
+            self.train_op, self.loss_scale_variable, \
+                self.number_of_skipped_steps = trainingOperation(
+                    optimiser,
+                    -self.total_loss,
+                    global_step = self.global_step,
+                    loss_scale = self.loss_scale
+                )
         # Make sure that the updates of the moving_averages in batch_norm
         # layers are performed before the train_step.
         
@@ -1154,6 +1207,58 @@ class GaussianMixtureVariationalAutoencoder(object):
         
         return stopped_early, epochs_with_no_improvement
     
+    def trainingFeedDictionary(self, training_set, batch_size = 100,
+        learning_rate = 1e-3, batch_indices = None):
+        
+        # Feed dictionary for a single random training batch without
+        # labelled examples, which is used when timing training steps
+        # (examples are taken from the start of `batch_indices`, if given,
+        # so models can be fed the same batch)
+        
+        batch_size /= self.number_of_importance_samples["training"] \
+            * self.number_of_monte_carlo_samples["training"]
+        batch_size = int(numpy.ceil(batch_size))
+        
+        if batch_indices is None:
+            batch_indices = numpy.random.permutation(
+                training_set.number_of_examples)
+        
+        batch_indices = batch_indices[:batch_size]
+        
+        if training_set.has_preprocessed_values:
+            x_train = training_set.preprocessed_values
+        else:
+            x_train = training_set.values
+        
+        if self.reconstruction_distribution_name == "bernoulli":
+            t_train = training_set.binarised_values
+        else:
+            t_train = training_set.values
+        
+        feed_dict_batch = {
+            self.x: x_train[batch_indices].toarray(),
+            self.t: t_train[batch_indices].toarray(),
+            self.labels: numpy.zeros((len(batch_indices), self.K)),
+            self.clf_mask: numpy.zeros(len(batch_indices)),
+            self.clf_weight: self.clf_weight_value,
+            self.is_training: True,
+            self.learning_rate: learning_rate,
+            self.warm_up_weight: 1.0,
+            self.S_iw:
+                self.number_of_importance_samples["training"],
+            self.S_mc:
+                self.number_of_monte_carlo_samples["training"]
+        }
+        
+        if self.count_sum:
+            feed_dict_batch[self.n] = training_set.count_sum[batch_indices]
+        
+        if self.count_sum_feature:
+            feed_dict_batch[self.n_feature] = \
+                training_set.normalised_count_sum[batch_indices]
+        
+        return feed_dict_batch
+    
     def train(self, training_set, validation_set = None,
         number_of_epochs = 100, batch_size = 100, learning_rate = 1e-3,
         plotting_interval = None, acquisition = 'random',
@@ -1178,6 +1283,9 @@ class GaussianMixtureVariationalAutoencoder(object):
         else:
             model_string = "model"
         
+        # Parameters restored for evaluation are outdated after training
+        self.evaluation_session_cache.clear()
+        
         # Remove model run if prompted
         
         permanent_log_directory = self.logDirectory(run_id=run_id)
@@ -1639,6 +1747,14 @@ class GaussianMixtureVariationalAutoencoder(object):
                 # With warmup or not
                 if warm_up_weight < 1:
                     print('    Warm-up weight: {:.2g}'.format(warm_up_weight))
+                
+                # Steps skipped because of gradients that are not finite
+                if self.number_of_skipped_steps is not None:
+                    number_of_skipped_steps, loss_scale = session.run(
+                        [self.number_of_skipped_steps,
+                         self.loss_scale_variable])
+                    print("    Loss scale: {:.0f} ({} steps skipped in "
+                        "total).".format(loss_scale, number_of_skipped_steps))
 
                 # Export parameter summaries
                 parameter_summary_string = session.run(
@@ -2477,27 +2593,36 @@ class GaussianMixtureVariationalAutoencoder(object):
         
         # Evaluation
         
-        with tf.Session(graph = self.graph, config=self.config) as session:
+        if not checkpoint:
+            print(
+                "Cannot evaluate {} when it has not been trained.".format(
+                    model_string)
+            )
+            return [None] * len(output_versions)
+        
+        model_checkpoint_path = correctModelCheckpointPath(
+            checkpoint.model_checkpoint_path,
+            log_directory
+        )
+        epoch = int(os.path.split(model_checkpoint_path)[-1].split('-')[-1])
+        
+        if use_best_model:
+            model_version = "best_model"
+        elif use_early_stopping_model:
+            model_version = "early_stopping"
+        else:
+            model_version = "end_of_training"
+        
+        # The session and restored parameters are reused between evaluations
+        session = self.evaluation_session_cache.restore(
+            model_checkpoint_path, model_version)
+        
+        with session.as_default():
             
             if log_results:
                 eval_summary_writer = tf.summary.FileWriter(
                     eval_summary_directory)
             
-            if checkpoint:
-                model_checkpoint_path = correctModelCheckpointPath(
-                    checkpoint.model_checkpoint_path,
-                    log_directory
-                )
-                self.saver.restore(session, model_checkpoint_path)
-                epoch = int(os.path.split(model_checkpoint_path)[-1]
-                    .split('-')[-1])
-            else:
-                print(
-                    "Cannot evaluate {} when it has not been trained.".format(
-                        model_string)
-                )
-                return [None] * len(output_versions)
-            
             data_string = dataString(evaluation_set,
                 self.reconstruction_distribution_name)
             print('Evaluating trained {} on {}.'.format(model_string,
@@ -2531,6 +2656,53 @@ class GaussianMixtureVariationalAutoencoder(object):
                     numpy.float32)
                 y_mean_eval = numpy.zeros((M_eval, self.K), numpy.float32)
             
+            # The decoder is only evaluated for reconstructions and losses,
+            # so only the encoder is run when just the latent representations
+            # and the clusters are needed
+            evaluate_decoder = "reconstructed" in output_versions \
+                or log_results
+            
+            if evaluate_decoder:
+                number_of_iw_samples = \
+                    self.number_of_importance_samples["evaluation"]
+                number_of_mc_samples = \
+                    self.number_of_monte_carlo_samples["evaluation"]
+            else:
+                number_of_iw_samples = 1
+                number_of_mc_samples = 1
+            
+            fetches = {
+                "q_y_logits": self.q_y_logits
+            }
+            
+            if log_results:
+                fetches.update({
+                    "ELBO": self.ELBO,
+                    "ENRE": self.ENRE,
+                    "KL_z": self.KL_z,
+                    "KL_y": self.KL_y,
+                    "q_y_probabilities": self.q_y_probabilities,
+                    "q_z_means": self.q_z_means,
+                    "q_z_variances": self.q_z_variances,
+                    "p_y_probabilities": self.p_y_probabilities,
+                    "p_z_means": self.p_z_means,
+                    "p_z_variances": self.p_z_variances
+                })
+            
+            if "reconstructed" in output_versions:
+                fetches.update({
+                    "p_x_mean": self.p_x_mean,
+                    "p_x_stddev": self.p_x_stddev,
+                    "stddev_of_p_x_given_z_mean":
+                        self.stddev_of_p_x_given_z_mean
+                })
+            
+            if "latent" in output_versions:
+                fetches.update({
+                    "y_mean": self.y_mean,
+                    "z_mean": self.z_mean
+                })
+            
             for i in range(0, M_eval, batch_size):
                 
                 indices = numpy.arange(i, min(i + batch_size, M_eval))
@@ -2539,67 +2711,60 @@ class GaussianMixtureVariationalAutoencoder(object):
                     evaluation_subset_indices.intersection(indices)))
                 feed_dict_batch = {
                     self.x: x_eval[indices].toarray(),
-                    self.t: t_eval[indices].toarray(),
-                    self.labels: labels_eval[indices],
-                    self.clf_mask: mask_eval[indices],
                     self.is_training: False,
                     self.warm_up_weight: 1.0,
-                    self.S_iw:
-                        self.number_of_importance_samples["evaluation"],
-                    self.S_mc:
-                        self.number_of_monte_carlo_samples["evaluation"]
+                    self.S_iw: number_of_iw_samples,
+                    self.S_mc: number_of_mc_samples
                 }
-                if self.count_sum:
-                    feed_dict_batch[self.n] = n_eval[indices]
+                
+                if evaluate_decoder:
+                    feed_dict_batch[self.t] = t_eval[indices].toarray()
+                    feed_dict_batch[self.labels] = labels_eval[indices]
+                    feed_dict_batch[self.clf_mask] = mask_eval[indices]
+                    
+                    if self.count_sum:
+                        feed_dict_batch[self.n] = n_eval[indices]
 
                 if self.count_sum_feature:
                     feed_dict_batch[self.n_feature] = n_feature_eval[indices]
 
-                (ELBO_i, ENRE_i, KL_z_i, KL_y_i,
-                    q_y_probabilities_i, q_z_means_i, q_z_variances_i,
-                    p_y_probabilities_i, p_z_means_i, p_z_variances_i,
-                    q_y_logits_i, p_x_mean_i,
-                    p_x_stddev_i, stddev_of_p_x_given_z_mean_i,
-                    y_mean_i, z_mean_i) = session.run(
-                        [
-                            self.ELBO, self.ENRE, self.KL_z, self.KL_y,
-                            self.q_y_probabilities, self.q_z_means, 
-                            self.q_z_variances, self.p_y_probabilities, 
-                            self.p_z_means, self.p_z_variances,
-                            self.q_y_logits, self.p_x_mean,
-                            self.p_x_stddev, self.stddev_of_p_x_given_z_mean,
-                            self.y_mean, self.z_mean
-                        ],
-                        feed_dict = feed_dict_batch
-                    )
-                
-                ELBO_eval += ELBO_i
-                KL_z_eval += KL_z_i
-                KL_y_eval += KL_y_i
-                ENRE_eval += ENRE_i
+                fetched_values = session.run(
+                    fetches,
+                    feed_dict = feed_dict_batch
+                )
                 
                 if log_results:
-                    q_y_probabilities += numpy.array(q_y_probabilities_i)
-                    q_z_means += numpy.array(q_z_means_i)
-                    q_z_variances += numpy.array(q_z_variances_i)
-                    p_y_probabilities += numpy.array(p_y_probabilities_i)
-                    p_z_means += numpy.array(p_z_means_i)
-                    p_z_variances += numpy.array(p_z_variances_i)
-                
-                q_y_logits[indices] = q_y_logits_i
+                    ELBO_eval += fetched_values["ELBO"]
+                    KL_z_eval += fetched_values["KL_z"]
+                    KL_y_eval += fetched_values["KL_y"]
+                    ENRE_eval += fetched_values["ENRE"]
+                    
+                    q_y_probabilities += numpy.array(
+                        fetched_values["q_y_probabilities"])
+                    q_z_means += numpy.array(fetched_values["q_z_means"])
+                    q_z_variances += numpy.array(
+                        fetched_values["q_z_variances"])
+                    p_y_probabilities += numpy.array(
+                        fetched_values["p_y_probabilities"])
+                    p_z_means += numpy.array(fetched_values["p_z_means"])
+                    p_z_variances += numpy.array(
+                        fetched_values["p_z_variances"])
+                
+                q_y_logits[indices] = fetched_values["q_y_logits"]
                 
                 if "reconstructed" in output_versions:
-                    p_x_mean_eval[indices] = p_x_mean_i 
+                    p_x_mean_eval[indices] = fetched_values["p_x_mean"]
                 
                     if subset_indices.size > 0:
                         p_x_stddev_eval[subset_indices] = \
-                            p_x_stddev_i[subset_indices - i]
+                            fetched_values["p_x_stddev"][subset_indices - i]
                         stddev_of_p_x_given_z_mean_eval[subset_indices] = \
-                            stddev_of_p_x_given_z_mean_i[subset_indices - i]
+                            fetched_values["stddev_of_p_x_given_z_mean"]\
+                                [subset_indices - i]
                 
                 if "latent" in output_versions:
-                    y_mean_eval[indices] = y_mean_i 
-                    z_mean_eval[indices] = z_mean_i 
+                    y_mean_eval[indices] = fetched_values["y_mean"]
+                    z_mean_eval[indices] = fetched_values["z_mean"]
             
             ELBO_eval /= M_eval / batch_size
             KL_z_eval /= M_eval / batch_size
@@ -2704,20 +2869,23 @@ class GaussianMixtureVariationalAutoencoder(object):
             
             evaluating_duration = time() - evaluating_time_start
             
-            evaluation_string = "    {} set ({}): ".format(
+            evaluation_string = "    {} set ({})".format(
                 evaluation_set.kind.capitalize(),
                 formatDuration(evaluating_duration))
-            evaluation_metrics = [
-                "ELBO: {:.5g}".format(ELBO_eval),
-                "ENRE: {:.5g}".format(ENRE_eval),
-                "KL_z: {:.5g}".format(KL_z_eval),
-                "KL_y: {:.5g}".format(KL_y_eval)
-            ]
+            evaluation_metrics = []
+            if log_results:
+                evaluation_metrics.extend([
+                    "ELBO: {:.5g}".format(ELBO_eval),
+                    "ENRE: {:.5g}".format(ENRE_eval),
+                    "KL_z: {:.5g}".format(KL_z_eval),
+                    "KL_y: {:.5g}".format(KL_y_eval)
+                ])
             if accuracy_display:
                 evaluation_metrics.append(
                     "Acc: {:.5g}".format(accuracy_display)
                 )
-            evaluation_string += ", ".join(evaluation_metrics)
+            if evaluation_metrics:
+                evaluation_string += ": " + ", ".join(evaluation_metrics)
             evaluation_string += "."
             
             print(evaluation_string)
@@ -0,0 +1,328 @@
+# ======================================================================== #
+# 
+# Copyright (c) 2017 - 2018 scVAE authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# 
+# ======================================================================== #
+
+import tensorflow as tf
+
+import numpy
+import scipy.sparse
+
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from time import time
+
+from models.auxiliary import correctModelCheckpointPath
+from auxiliary import formatDuration
+from data import SparseRowMatrix
+
+INFERENCE_OUTPUTS = ["encode", "cluster", "reconstruct"]
+
+# Queued to stop request coalescers, since `None` marks that no request is
+# pending
+STOP_REQUEST = object()
+
+class InferenceSession(object):
+    
+    # Trained model with its checkpoint restored once into a session, which
+    # is kept open for encoding, clustering, and reconstructing new examples
+    
+    def __init__(self, model, run_id = None,
+        use_early_stopping_model = False, use_best_model = False,
+        batch_size = 100, preprocess = None, maximum_count_sum = None):
+        
+        self.model = model
+        self.batch_size = batch_size
+        
+        # Raw counts are preprocessed in the same way as the values the
+        # model was trained on, and count sums are normalised using the
+        # maximum count sum of the training set
+        self.preprocess = preprocess
+        self.maximum_count_sum = maximum_count_sum
+        
+        self.is_gaussian_mixture_model = hasattr(model, "q_y_given_x_probs")
+        
+        self.fetches = {
+            "reconstruct": model.p_x_mean
+        }
+        
+        if self.is_gaussian_mixture_model:
+            self.fetches["encode"] = model.z_mean
+            self.fetches["cluster"] = model.q_y_given_x_probs
+        else:
+            # Clustering is only possible with a latent mixture model
+            self.fetches["encode"] = model.q_z_mean
+        
+        log_directory = model.logDirectory(
+            run_id = run_id,
+            early_stopping = use_early_stopping_model,
+            best_model = use_best_model
+        )
+        checkpoint = tf.train.get_checkpoint_state(log_directory)
+        
+        if not checkpoint:
+            raise ValueError(
+                "Cannot serve model in `{}` when it has not been trained."
+                .format(log_directory)
+            )
+        
+        self.model_checkpoint_path = correctModelCheckpointPath(
+            checkpoint.model_checkpoint_path,
+            log_directory
+        )
+        self.epoch = int(os.path.split(self.model_checkpoint_path)[-1]
+            .split('-')[-1])
+        
+        restoring_time_start = time()
+        
+        self.session = tf.Session(graph = model.graph, config = model.config)
+        model.saver.restore(self.session, self.model_checkpoint_path)
+        
+        restoring_duration = time() - restoring_time_start
+        print("Model restored from epoch {} ({}).".format(
+            self.epoch, formatDuration(restoring_duration)))
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.close()
+    
+    def close(self):
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+    
+    def encode(self, values):
+        return self.run("encode", values)
+    
+    def cluster(self, values):
+        return self.run("cluster", values)
+    
+    def reconstruct(self, values):
+        return self.run("reconstruct", values)
+    
+    def run(self, output, values):
+        
+        # Values are evaluated in batches of sparse rows, which are only
+        # made dense one batch at a time
+        
+        if output not in self.fetches:
+            raise ValueError(
+                "Output `{}` not available for this model.".format(output))
+        
+        if self.session is None:
+            raise ValueError("Inference session has been closed.")
+        
+        values = sparseRowMatrix(values)
+        number_of_examples, number_of_features = values.shape
+        
+        if number_of_features != self.model.feature_size:
+            raise ValueError(
+                "Expected {} features, but got {}.".format(
+                    self.model.feature_size, number_of_features)
+            )
+        
+        fetch = self.fetches[output]
+        
+        outputs = []
+        
+        for i in range(0, number_of_examples, self.batch_size):
+            
+            values_batch = SparseRowMatrix(values[i:i + self.batch_size])
+            
+            output_batch = self.session.run(
+                fetch,
+                feed_dict = self.feedDictionary(values_batch)
+            )
+            
+            outputs.append(
+                output_batch.reshape(values_batch.shape[0], -1))
+        
+        return numpy.concatenate(outputs)
+    
+    def feedDictionary(self, values):
+        
+        number_of_examples = values.shape[0]
+        
+        if self.preprocess:
+            preprocessed_values = self.preprocess(values)
+        else:
+            preprocessed_values = values
+        
+        values = values.toarray()
+        
+        model = self.model
+        
+        feed_dict = {
+            model.x: preprocessed_values.toarray(),
+            model.t: values,
+            model.is_training: False,
+            model.warm_up_weight: 1.0
+        }
+        
+        if self.is_gaussian_mixture_model:
+            feed_dict[model.labels] = numpy.zeros(
+                (number_of_examples, model.K), numpy.int32)
+            feed_dict[model.clf_mask] = numpy.zeros(
+                number_of_examples, numpy.int32)
+            feed_dict[model.S_iw] = \
+                model.number_of_importance_samples["evaluation"]
+            feed_dict[model.S_mc] = \
+                model.number_of_monte_carlo_samples["evaluation"]
+        else:
+            # Latent means are used for reconstructions
+            feed_dict[model.use_deterministic_z] = True
+            feed_dict[model.number_of_iw_samples] = 1
+            feed_dict[model.number_of_mc_samples] = 1
+        
+        if model.count_sum or model.count_sum_feature:
+            count_sum = values.sum(axis = 1, keepdims = True)
+        
+        if model.count_sum:
+            feed_dict[model.n] = count_sum
+        
+        if model.count_sum_feature:
+            maximum_count_sum = self.maximum_count_sum or count_sum.max()
+            feed_dict[model.n_feature] = count_sum / maximum_count_sum
+        
+        return feed_dict
+
+class RequestCoalescer(object):
+    
+    # Requests from several threads are queued and coalesced into full
+    # batches for the inference session, which is only used from the
+    # thread of the coalescer
+    
+    def __init__(self, inference_session, maximum_waiting_time = 0.01):
+        
+        self.inference_session = inference_session
+        self.batch_size = inference_session.batch_size
+        self.maximum_waiting_time = maximum_waiting_time
+        
+        self.requests = queue.Queue()
+        
+        self.number_of_requests = 0
+        self.number_of_batches = 0
+        
+        self.thread = threading.Thread(
+            target = self.serveRequests,
+            name = "RequestCoalescer",
+            daemon = True
+        )
+        self.thread.start()
+    
+    def submit(self, output, values):
+        
+        # Returns a future for the outputs of the values
+        
+        values = sparseRowMatrix(values)
+        
+        future = Future()
+        self.requests.put((output, values, future))
+        
+        return future
+    
+    def stop(self):
+        self.requests.put(STOP_REQUEST)
+        self.thread.join()
+    
+    def serveRequests(self):
+        
+        pending_request = None
+        
+        while True:
+            
+            if pending_request is None:
+                request = self.requests.get()
+            else:
+                request = pending_request
+                pending_request = None
+            
+            if request is STOP_REQUEST:
+                break
+            
+            output, values, future = request
+            batch = [request]
+            number_of_examples = values.shape[0]
+            
+            # Wait briefly for more requests for the same output until the
+            # batch is full
+            
+            deadline = time() + self.maximum_waiting_time
+            
+            while number_of_examples < self.batch_size:
+                
+                remaining_time = deadline - time()
+                
+                if remaining_time <= 0:
+                    break
+                
+                try:
+                    next_request = self.requests.get(
+                        timeout = remaining_time)
+                except queue.Empty:
+                    break
+                
+                if next_request is STOP_REQUEST \
+                    or next_request[0] != output:
+                    pending_request = next_request
+                    break
+                
+                batch.append(next_request)
+                number_of_examples += next_request[1].shape[0]
+            
+            self.serveBatch(output, batch)
+    
+    def serveBatch(self, output, batch):
+        
+        values = scipy.sparse.vstack(
+            [values for _, values, _ in batch],
+            format = "csr"
+        )
+        
+        try:
+            outputs = self.inference_session.run(output, values)
+        except Exception as exception:
+            for _, _, future in batch:
+                future.set_exception(exception)
+            return
+        
+        self.number_of_requests += len(batch)
+        self.number_of_batches += 1
+        
+        i = 0
+        
+        for _, request_values, future in batch:
+            number_of_examples = request_values.shape[0]
+            future.set_result(outputs[i:i + number_of_examples])
+            i += number_of_examples
+
+def sparseRowMatrix(values):
+    
+    # Values are raw counts given as a dense or sparse matrix with examples
+    # as rows, or a path to a sparse matrix saved using
+    # `scipy.sparse.save_npz`
+    
+    if isinstance(values, str):
+        values = scipy.sparse.load_npz(values)
+    
+    if not scipy.sparse.issparse(values):
+        values = numpy.atleast_2d(numpy.asarray(values))
+    
+    return SparseRowMatrix(values, dtype = numpy.float32)
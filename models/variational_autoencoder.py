@@ -24,7 +24,10 @@ from models.auxiliary import (
     trainingString, dataString,
     generateUniqueRunIDForModel,
     correctModelCheckpointPath, copyModelDirectory, removeOldCheckpoints,
-    clearLogDirectory
+    clearLogDirectory,
+    sessionConfiguration, parseGraphOptimisation, parseDecoderPrecision,
+    EvaluationSessionCache,
+    HALF_PRECISION_LOSS_SCALE, trainingOperation
 )
 
 from tensorflow.python.ops.nn import relu, softmax
@@ -69,6 +72,10 @@ class VariationalAutoencoder(object):
         number_of_warm_up_epochs = 0,
         kl_weight = 1,
         epsilon = 1e-6,
+        number_of_intra_op_threads = None,
+        number_of_inter_op_threads = None,
+        graph_optimisation = None,
+        decoder_precision = None,
         log_directory = "log",
         results_directory = "results"):
         
@@ -162,6 +169,24 @@ class VariationalAutoencoder(object):
         
         # Graph setup
         
+        self.number_of_intra_op_threads = number_of_intra_op_threads
+        self.number_of_inter_op_threads = number_of_inter_op_threads
+        self.graph_optimisation = parseGraphOptimisation(graph_optimisation)
+        self.config = sessionConfiguration(
+            number_of_intra_op_threads = number_of_intra_op_threads,
+            number_of_inter_op_threads = number_of_inter_op_threads,
+            graph_optimisation = self.graph_optimisation
+        )
+        
+        # Dense layers of the decoder can use reduced precision for their
+        # matrix multiplications, in which case the loss is scaled for
+        # half precision to avoid underflowing gradients
+        self.decoder_precision = parseDecoderPrecision(decoder_precision)
+        if self.decoder_precision == "float16":
+            self.loss_scale = HALF_PRECISION_LOSS_SCALE
+        else:
+            self.loss_scale = 1
+        
         self.graph = tf.Graph()
         
         self.parameter_summary_list = []
@@ -223,6 +248,8 @@ class VariationalAutoencoder(object):
             self.training()
             
             self.saver = tf.train.Saver(max_to_keep = 1)
+        
+        self.evaluation_session_cache = EvaluationSessionCache(self)
     
     @property
     def name(self):
@@ -268,6 +295,9 @@ class VariationalAutoencoder(object):
         
         if self.batch_normalisation:
             minor_parts.append("bn")
+        
+        if self.decoder_precision:
+            minor_parts.append("p_{}".format(self.decoder_precision))
 
         if len(self.dropout_parts) > 0:
             minor_parts.append(
@@ -403,6 +433,10 @@ class VariationalAutoencoder(object):
         
         if self.batch_normalisation:
             description_parts.append("using batch normalisation")
+        
+        if self.decoder_precision:
+            description_parts.append("decoder precision: {}".format(
+                self.decoder_precision))
 
         if self.number_of_warm_up_epochs:
             description_parts.append("using linear warm-up weighting for " + \
@@ -612,13 +646,16 @@ class VariationalAutoencoder(object):
         self.p_z_variances = []
         
         if "mixture" in self.latent_distribution["prior"]["name"]:
+            p_z_probabilities = tf.reshape(self.p_z.cat.probs,
+                [self.number_of_latent_clusters])
+            p_z_means = tf.reshape(self.p_z.locs,
+                [self.number_of_latent_clusters, self.latent_size])
+            p_z_variances = tf.square(tf.reshape(self.p_z.scale_diags,
+                [self.number_of_latent_clusters, self.latent_size]))
             for k in range(self.number_of_latent_clusters):
-                self.p_z_probabilities.append(
-                    tf.squeeze(self.p_z.cat.probs)[k])
-                self.p_z_means.append(
-                    tf.squeeze(self.p_z.components[k].mean()))
-                self.p_z_variances.append(tf.diag_part(tf.squeeze(
-                    self.p_z.components[k].covariance())))
+                self.p_z_probabilities.append(p_z_probabilities[k])
+                self.p_z_means.append(p_z_means[k])
+                self.p_z_variances.append(p_z_variances[k])
         else:
             self.p_z_probabilities.append(tf.constant(1.))
             self.p_z_means.append(tf.squeeze(self.p_z.mean()))
@@ -628,12 +665,6 @@ class VariationalAutoencoder(object):
         
         # Make sure we use a replication pr. sample of the feature sum, 
         # when adding this to the features.  
-        if self.count_sum:
-            replicated_n = tf.tile(
-                self.n,
-                [self.number_of_iw_samples*self.number_of_mc_samples, 1]
-                )
-
         if self.count_sum_feature:
             replicated_n_feature = tf.tile(
                 self.n_feature,
@@ -657,6 +688,7 @@ class VariationalAutoencoder(object):
                 is_training = self.is_training,
                 input_dropout_keep_probability = self.dropout_keep_probability_z,
                 hidden_dropout_keep_probability = self.dropout_keep_probability_h,
+                precision = self.decoder_precision,
                 scope = "DECODER"
             )
         elif self.generative_architecture == "LFM":
@@ -692,19 +724,32 @@ class VariationalAutoencoder(object):
                     ),
                     is_training = self.is_training,
                     dropout_keep_probability = self.dropout_keep_probability_h,
+                    precision = self.decoder_precision,
                     scope = parameter.upper()
                 )
+                
+                # Give parameters a leading sample axis, so that targets and
+                # count sums are broadcast across samples instead of tiled:
+                # (R * L * B, F) --> (R * L, B, F)
+                x_theta[parameter] = tf.reshape(
+                    x_theta[parameter],
+                    [
+                        self.number_of_iw_samples * self.number_of_mc_samples,
+                        -1,
+                        self.feature_size
+                    ]
+                )
             
             if "constrained" in self.reconstruction_distribution_name or \
                 "multinomial" in self.reconstruction_distribution_name:
                 self.p_x_given_z = self.reconstruction_distribution["class"](
                     x_theta,
-                    replicated_n
+                    self.n
                 )
             elif "multinomial" in self.reconstruction_distribution_name:
                 self.p_x_given_z = self.reconstruction_distribution["class"](
                     x_theta,
-                    replicated_n
+                    self.n
                 )
             else:
                 self.p_x_given_z = self.reconstruction_distribution["class"](
@@ -719,11 +764,13 @@ class VariationalAutoencoder(object):
                     activation_fn = None,
                     is_training = self.is_training,
                     dropout_keep_probability = self.dropout_keep_probability_h,
+                    precision = self.decoder_precision,
                     scope = "P_K"
                 )
                 
                 x_logits = tf.reshape(x_logits,
-                    [-1, self.feature_size,
+                    [self.number_of_iw_samples * self.number_of_mc_samples,
+                        -1, self.feature_size,
                         self.number_of_reconstruction_classes])
                 
                 self.p_x_given_z = Categorized(
@@ -771,11 +818,7 @@ class VariationalAutoencoder(object):
         #     p_z_p = tf.constant(0.0, dtype = tf.float32)
         #     p_z = Bernoulli(p = p_z_p)
         
-        # Prepare replicated and reshaped arrays
-        ## Replicate out batches in tiles pr. sample into: 
-        ### shape = (R * L * batchsize, D_x)
-        t_tiled = tf.tile(self.t,
-            [self.number_of_iw_samples*self.number_of_mc_samples, 1])
+        # Prepare reshaped arrays
         ## Reshape samples back to: 
         ### shape = (R, L, batchsize, D_z)
         z_reshaped = tf.reshape(self.z, [self.number_of_iw_samples,
@@ -783,11 +826,12 @@ class VariationalAutoencoder(object):
 
         # Loss
         ## Reconstruction error
-        ## 1. Evaluate all log(p(x|z)) (R * L * batchsize, D_x) target values
-        ##    in the (R * L * batchsize, D_x) probability distributions learned
+        ## 1. Evaluate all log(p(x|z)) (batchsize, D_x) target values
+        ##    broadcast in the (R * L, batchsize, D_x) probability
+        ##    distributions learned
         ## 2. Sum over all N_x features
         ## 3. and reshape it back to (R, L, batchsize) 
-        p_x_given_z_log_prob = self.p_x_given_z.log_prob(t_tiled)
+        p_x_given_z_log_prob = self.p_x_given_z.log_prob(self.t)
         log_p_x_given_z = tf.reshape(
             tf.reduce_sum(
                 p_x_given_z_log_prob,
@@ -985,11 +1029,13 @@ class VariationalAutoencoder(object):
             #     global_step = self.global_step
             # )
         
-            gradients = optimiser.compute_gradients(-self.lower_bound_weighted)
-            clipped_gradients = [(tf.clip_by_value(gradient, -1., 1.),
-                variable) for gradient, variable in gradients]
-            self.train_op = optimiser.apply_gradients(clipped_gradients,
-                global_step = self.global_step)
+            self.train_op, self.loss_scale_variable, \
+                self.number_of_skipped_steps = trainingOperation(
+                    optimiser,
+                    -self.lower_bound_weighted,
+                    global_step = self.global_step,
+                    loss_scale = self.loss_scale
+                )
         # Make sure that the updates of the moving_averages in batch_norm
         # layers are performed before the train_step.
         
@@ -1031,6 +1077,55 @@ class VariationalAutoencoder(object):
         
         return stopped_early, epochs_with_no_improvement
     
+    def trainingFeedDictionary(self, training_set, batch_size = 100,
+        learning_rate = 1e-3, batch_indices = None):
+        
+        # Feed dictionary for a single random training batch, which is used
+        # when timing training steps (examples are taken from the start of
+        # `batch_indices`, if given, so models can be fed the same batch)
+        
+        batch_size /= self.number_of_importance_samples["training"] \
+            * self.number_of_monte_carlo_samples["training"]
+        batch_size = int(numpy.ceil(batch_size))
+        
+        if batch_indices is None:
+            batch_indices = numpy.random.permutation(
+                training_set.number_of_examples)
+        
+        batch_indices = batch_indices[:batch_size]
+        
+        if training_set.has_preprocessed_values:
+            x_train = training_set.preprocessed_values
+        else:
+            x_train = training_set.values
+        
+        if self.reconstruction_distribution_name == "bernoulli":
+            t_train = training_set.binarised_values
+        else:
+            t_train = training_set.values
+        
+        feed_dict_batch = {
+            self.x: x_train[batch_indices].toarray(),
+            self.t: t_train[batch_indices].toarray(),
+            self.is_training: True,
+            self.use_deterministic_z: False,
+            self.learning_rate: learning_rate,
+            self.warm_up_weight: 1.0,
+            self.number_of_iw_samples:
+                self.number_of_importance_samples["training"],
+            self.number_of_mc_samples:
+                self.number_of_monte_carlo_samples["training"]
+        }
+        
+        if self.count_sum:
+            feed_dict_batch[self.n] = training_set.count_sum[batch_indices]
+        
+        if self.count_sum_feature:
+            feed_dict_batch[self.n_feature] = \
+                training_set.normalised_count_sum[batch_indices]
+        
+        return feed_dict_batch
+    
     def train(self, training_set, validation_set = None,
         number_of_epochs = 100, batch_size = 100, learning_rate = 1e-3,
         plotting_interval = None,
@@ -1055,6 +1150,9 @@ class VariationalAutoencoder(object):
         else:
             model_string = "model"
         
+        # Parameters restored for evaluation are outdated after training
+        self.evaluation_session_cache.clear()
+        
         # Remove model run if prompted
         
         permanent_log_directory = self.logDirectory(run_id=run_id)
@@ -1256,7 +1354,7 @@ class VariationalAutoencoder(object):
                 "kl_divergence": [],
             }
         
-        with tf.Session(graph = self.graph) as session:
+        with tf.Session(graph = self.graph, config = self.config) as session:
             
             parameter_summary_writer = tf.summary.FileWriter(
                 log_directory)
@@ -1430,6 +1528,14 @@ class VariationalAutoencoder(object):
                 # With warmup or not
                 if warm_up_weight < 1:
                     print('    Warm-up weight: {:.2g}'.format(warm_up_weight))
+                
+                # Steps skipped because of gradients that are not finite
+                if self.number_of_skipped_steps is not None:
+                    number_of_skipped_steps, loss_scale = session.run(
+                        [self.number_of_skipped_steps,
+                         self.loss_scale_variable])
+                    print("    Loss scale: {:.0f} ({} steps skipped in "
+                        "total).".format(loss_scale, number_of_skipped_steps))
 
                 # Export parameter summaries
                 parameter_summary_string = session.run(
@@ -1895,9 +2001,15 @@ class VariationalAutoencoder(object):
         
         evaluation_set_transformed = False
         
-        batch_size /= self.number_of_importance_samples["evaluation"] \
-            * self.number_of_monte_carlo_samples["evaluation"]
-        batch_size = int(numpy.ceil(batch_size))
+        # The decoder is only evaluated for reconstructions and losses, so
+        # only the encoder is run when just the latent representation is
+        # needed
+        evaluate_decoder = "reconstructed" in output_versions or log_results
+        
+        if evaluate_decoder:
+            batch_size /= self.number_of_importance_samples["evaluation"] \
+                * self.number_of_monte_carlo_samples["evaluation"]
+            batch_size = int(numpy.ceil(batch_size))
         
         if self.count_sum:
             n_eval = evaluation_set.count_sum
@@ -1949,27 +2061,36 @@ class VariationalAutoencoder(object):
             if os.path.exists(eval_summary_directory):
                 shutil.rmtree(eval_summary_directory)
         
-        with tf.Session(graph = self.graph) as session:
+        if not checkpoint:
+            print(
+                "Cannot evaluate {} when it has not been trained.".format(
+                    model_string)
+            )
+            return [None] * len(output_versions)
+        
+        model_checkpoint_path = correctModelCheckpointPath(
+            checkpoint.model_checkpoint_path,
+            log_directory
+        )
+        epoch = int(os.path.split(model_checkpoint_path)[-1].split('-')[-1])
+        
+        if use_best_model:
+            model_version = "best_model"
+        elif use_early_stopping_model:
+            model_version = "early_stopping"
+        else:
+            model_version = "end_of_training"
+        
+        # The session and restored parameters are reused between evaluations
+        session = self.evaluation_session_cache.restore(
+            model_checkpoint_path, model_version)
+        
+        with session.as_default():
             
             if log_results:
                 eval_summary_writer = tf.summary.FileWriter(
                     eval_summary_directory)
             
-            if checkpoint:
-                model_checkpoint_path = correctModelCheckpointPath(
-                    checkpoint.model_checkpoint_path,
-                    log_directory
-                )
-                self.saver.restore(session, model_checkpoint_path)
-                epoch = int(os.path.split(model_checkpoint_path)[-1]
-                    .split('-')[-1])
-            else:
-                print(
-                    "Cannot evaluate {} when it has not been trained.".format(
-                        model_string)
-                )
-                return [None] * len(output_versions)
-            
             data_string = dataString(evaluation_set,
                 self.reconstruction_distribution_name)
             print('Evaluating trained {} on {}.'.format(model_string,
@@ -1991,7 +2112,7 @@ class VariationalAutoencoder(object):
                 q_z_mean_eval = numpy.empty([M_eval, self.latent_size],
                     numpy.float32)
             
-            if use_deterministic_z:
+            if use_deterministic_z or not evaluate_decoder:
                 number_of_iw_samples = 1
                 number_of_mc_samples = 1
             else:
@@ -1999,6 +2120,22 @@ class VariationalAutoencoder(object):
                     self.number_of_importance_samples["evaluation"]
                 number_of_mc_samples = \
                     self.number_of_monte_carlo_samples["evaluation"]
+            
+            fetches = {}
+            
+            if log_results:
+                fetches["ELBO"] = self.ELBO
+                fetches["KL"] = self.KL
+                fetches["ENRE"] = self.ENRE
+            
+            if "reconstructed" in output_versions:
+                fetches["p_x_mean"] = self.p_x_mean
+                fetches["p_x_stddev"] = self.p_x_stddev
+                fetches["stddev_of_p_x_mean"] = \
+                    self.stddev_of_p_x_given_z_mean
+            
+            if "latent" in output_versions:
+                fetches["q_z_mean"] = self.q_z_mean
 
             for i in range(0, M_eval, batch_size):
                 
@@ -2009,31 +2146,31 @@ class VariationalAutoencoder(object):
                 
                 feed_dict_batch = {
                     self.x: x_eval[indices].toarray(),
-                    self.t: t_eval[indices].toarray(),
                     self.is_training: False,
                     self.use_deterministic_z: use_deterministic_z,
                     self.warm_up_weight: 1.0,
                     self.number_of_iw_samples: number_of_iw_samples,
                     self.number_of_mc_samples: number_of_mc_samples
                 }
-                if self.count_sum:
-                    feed_dict_batch[self.n] = n_eval[indices]
+                
+                if evaluate_decoder:
+                    feed_dict_batch[self.t] = t_eval[indices].toarray()
+                    
+                    if self.count_sum:
+                        feed_dict_batch[self.n] = n_eval[indices]
                 
                 if self.count_sum_feature:
                     feed_dict_batch[self.n_feature] = n_feature_eval[indices]
                 
-                (ELBO_i, KL_i, ENRE_i, p_x_mean_i,
-                    p_x_stddev_i, stddev_of_p_x_mean_i,
-                    q_z_mean_i) = session.run(
-                    [self.ELBO, self.KL, self.ENRE, self.p_x_mean,
-                        self.p_x_stddev, self.stddev_of_p_x_given_z_mean,
-                        self.q_z_mean],
+                fetched_values = session.run(
+                    fetches,
                     feed_dict = feed_dict_batch
                 )
                 
-                ELBO_eval += ELBO_i
-                KL_eval += KL_i
-                ENRE_eval += ENRE_i
+                if log_results:
+                    ELBO_eval += fetched_values["ELBO"]
+                    KL_eval += fetched_values["KL"]
+                    ENRE_eval += fetched_values["ENRE"]
                 
                 if "reconstructed" in output_versions:
                     # Save Importance weighted Monte Carlo estimates of: 
@@ -2042,7 +2179,7 @@ class VariationalAutoencoder(object):
                     #           = E_z[p_x_given_z.mean]
                     #     \approx 1/(R*L) \sum^R_r w_r \sum^L_{l=1}
                     # p_x_given_z.mean
-                    p_x_mean_eval[indices] = p_x_mean_i
+                    p_x_mean_eval[indices] = fetched_values["p_x_mean"]
                     
                     if subset_indices.size > 0:
                         
@@ -2051,16 +2188,17 @@ class VariationalAutoencoder(object):
                         #     = E_z[p_x_given_z.var] + E_z[(p_x_given_z.mean
                         #       - E[x])^2]
                         p_x_stddev_eval[subset_indices] = \
-                            p_x_stddev_i[subset_indices - i]
+                            fetched_values["p_x_stddev"][subset_indices - i]
                     
                         # Estimated standard deviation of Monte Carlo estimate
                         # E[x].
                         stddev_of_p_x_mean_eval[subset_indices] = \
-                            stddev_of_p_x_mean_i[subset_indices - i]
+                            fetched_values["stddev_of_p_x_mean"]\
+                                [subset_indices - i]
                 
                 if "latent" in output_versions:
                     # Latent space
-                    q_z_mean_eval[indices] = q_z_mean_i
+                    q_z_mean_eval[indices] = fetched_values["q_z_mean"]
             
             ELBO_eval /= M_eval / batch_size
             KL_eval /= M_eval / batch_size
@@ -2114,11 +2252,17 @@ class VariationalAutoencoder(object):
                 eval_summary_writer.flush()
             
             evaluating_duration = time() - evaluating_time_start
-            print("    {} set ({}): ".format(
-                evaluation_set.kind.capitalize(),
-                formatDuration(evaluating_duration)) + \
-                "ELBO: {:.5g}, ENRE: {:.5g}, KL: {:.5g}.".format(
-                ELBO_eval, ENRE_eval, KL_eval))
+            
+            if log_results:
+                print("    {} set ({}): ".format(
+                    evaluation_set.kind.capitalize(),
+                    formatDuration(evaluating_duration)) + \
+                    "ELBO: {:.5g}, ENRE: {:.5g}, KL: {:.5g}.".format(
+                    ELBO_eval, ENRE_eval, KL_eval))
+            else:
+                print("    {} set ({}).".format(
+                    evaluation_set.kind.capitalize(),
+                    formatDuration(evaluating_duration)))
             
             # Data sets
             
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+
+# ======================================================================== #
+# 
+# Copyright (c) 2017 - 2018 scVAE authors
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#    http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# 
+# ======================================================================== #
+
+import data
+
+from main import (
+    setupModel, parseDistribution, parseModelVersions,
+    parser as main_parser
+)
+
+from models.inference import (
+    InferenceSession, RequestCoalescer,
+    INFERENCE_OUTPUTS
+)
+
+from auxiliary import title, checkRunID
+
+import numpy
+import scipy.sparse
+
+import os
+import json
+import argparse
+import socketserver
+
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+import warnings
+
+# TODO Remove when TensorFlow Probability library is updated to v0.6
+warnings.filterwarnings(action="ignore", category=DeprecationWarning)
+warnings.filterwarnings(action="ignore", category=FutureWarning)
+warnings.filterwarnings(action="ignore", category=PendingDeprecationWarning)
+
+def main(input_file_or_name, data_directory = "data",
+    log_directory = "log", results_directory = "results",
+    map_features = False, feature_selection = [], example_filter = [],
+    preprocessing_methods = [],
+    split_data_set = True,
+    splitting_method = "default", splitting_fraction = 0.9,
+    model_type = "VAE", latent_size = 50, hidden_sizes = [500],
+    number_of_importance_samples = [5],
+    number_of_monte_carlo_samples = [10],
+    inference_architecture = "MLP",
+    latent_distribution = "gaussian",
+    number_of_classes = None,
+    parameterise_latent_posterior = False,
+    generative_architecture = "MLP",
+    reconstruction_distribution = "poisson",
+    number_of_reconstruction_classes = 0,
+    prior_probabilities_method = "uniform",
+    number_of_warm_up_epochs = 0,
+    kl_weight = 1,
+    proportion_of_free_KL_nats = 0.0,
+    clf_weight = 1.0,
+    number_of_labeled_examples = 0,
+    batch_normalisation = True,
+    dropout_keep_probabilities = [],
+    count_sum = True,
+    batch_size = 100,
+    number_of_intra_op_threads = None, number_of_inter_op_threads = None,
+    graph_optimisation = None, decoder_precision = None,
+    run_id = None, model_version = "end_of_training",
+    host = "localhost", port = 8000, unix_socket = None,
+    maximum_waiting_time = 0.01, request_directory = None,
+    **remaining_arguments):
+    
+    # Setup
+    
+    reconstruction_distribution = parseDistribution(
+        reconstruction_distribution)
+    latent_distribution = parseDistribution(latent_distribution)
+    
+    if reconstruction_distribution == "bernoulli":
+        raise ValueError(
+            "Serving models with a Bernoulli reconstruction distribution "
+            "is not supported, since their targets are binarised."
+        )
+    
+    if run_id:
+        run_id = checkRunID(run_id)
+    
+    model_version = parseModelVersions(model_version)[0]
+    
+    # Data
+    
+    print(title("Data"))
+    
+    data_set = data.DataSet(
+        input_file_or_name,
+        directory = data_directory,
+        map_features = map_features,
+        feature_selection = feature_selection,
+        example_filter = example_filter,
+        preprocessing_methods = preprocessing_methods
+    )
+    
+    if split_data_set:
+        training_set, _, _ = data_set.split(
+            splitting_method, splitting_fraction)
+    else:
+        splitting_method = None
+        data_set.load()
+        training_set = data_set
+    
+    log_directory = data.directory(log_directory, data_set,
+        splitting_method, splitting_fraction)
+    results_directory = data.directory(results_directory, data_set,
+        splitting_method, splitting_fraction)
+    
+    # New examples are preprocessed in the same way as the training set
+    preprocess = data.preprocessingFunctionForDataSet(
+        data_set.title,
+        data_set.preprocessing_methods,
+        data_set.preprocessedPath
+    )
+    maximum_count_sum = training_set.count_sum.max()
+    
+    # Model
+    
+    print(title("Inference"))
+    
+    model, _ = setupModel(
+        training_set = training_set,
+        model_type = model_type,
+        latent_size = latent_size,
+        hidden_sizes = hidden_sizes,
+        number_of_importance_samples = number_of_importance_samples,
+        number_of_monte_carlo_samples = number_of_monte_carlo_samples,
+        inference_architecture = inference_architecture,
+        latent_distribution = latent_distribution,
+        number_of_classes = number_of_classes,
+        parameterise_latent_posterior = parameterise_latent_posterior,
+        generative_architecture = generative_architecture,
+        reconstruction_distribution = reconstruction_distribution,
+        number_of_reconstruction_classes = number_of_reconstruction_classes,
+        prior_probabilities_method = prior_probabilities_method,
+        number_of_warm_up_epochs = number_of_warm_up_epochs,
+        kl_weight = kl_weight,
+        proportion_of_free_KL_nats = proportion_of_free_KL_nats,
+        clf_weight = clf_weight,
+        number_of_labeled_examples = number_of_labeled_examples,
+        batch_normalisation = batch_normalisation,
+        dropout_keep_probabilities = dropout_keep_probabilities,
+        count_sum = count_sum,
+        number_of_intra_op_threads = number_of_intra_op_threads,
+        number_of_inter_op_threads = number_of_inter_op_threads,
+        graph_optimisation = graph_optimisation,
+        decoder_precision = decoder_precision,
+        log_directory = log_directory,
+        results_directory = results_directory
+    )
+    
+    del training_set
+    
+    print(model.description)
+    print()
+    
+    inference_session = InferenceSession(
+        model,
+        run_id = run_id,
+        use_early_stopping_model = model_version == "early_stopping",
+        use_best_model = model_version == "best_model",
+        batch_size = batch_size,
+        preprocess = preprocess,
+        maximum_count_sum = maximum_count_sum
+    )
+    coalescer = RequestCoalescer(
+        inference_session,
+        maximum_waiting_time = maximum_waiting_time
+    )
+    
+    status = {
+        "model": model.name,
+        "model version": model_version,
+        "epoch": inference_session.epoch,
+        "number of features": model.feature_size,
+        "outputs": [output for output in INFERENCE_OUTPUTS
+            if output in inference_session.fetches],
+        "batch size": batch_size
+    }
+    
+    # Server
+    
+    RequestHandler = requestHandlerForCoalescer(
+        coalescer, status, request_directory)
+    
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        server = ThreadingUnixHTTPServer(unix_socket, RequestHandler)
+        address = unix_socket
+    else:
+        server = ThreadingHTTPServer((host, port), RequestHandler)
+        address = "http://{}:{}".format(host, port)
+    
+    print("Serving {} on {}.".format(
+        ", ".join(status["outputs"]), address))
+    print()
+    
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print()
+    finally:
+        server.server_close()
+        coalescer.stop()
+        inference_session.close()
+        if unix_socket and os.path.exists(unix_socket):
+            os.remove(unix_socket)
+    
+    print("Served {} requests in {} batches.".format(
+        coalescer.number_of_requests, coalescer.number_of_batches))
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn,
+    socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def requestHandlerForCoalescer(coalescer, status, request_directory = None):
+    
+    class RequestHandler(BaseHTTPRequestHandler):
+        
+        def do_GET(self):
+            if self.path.strip("/") == "status":
+                self.respond(200, dict(status,
+                    requests = coalescer.number_of_requests,
+                    batches = coalescer.number_of_batches
+                ))
+            else:
+                self.respond(404, {"error": "Unknown path."})
+        
+        def do_POST(self):
+            
+            output = self.path.strip("/")
+            
+            if output not in status["outputs"]:
+                self.respond(404, {
+                    "error": "Output `{}` not available.".format(output)})
+                return
+            
+            try:
+                content_length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(
+                    self.rfile.read(content_length).decode("utf-8"))
+                values = valuesFromRequest(request, request_directory)
+                outputs = coalescer.submit(output, values).result()
+            except ValueError as error:
+                self.respond(400, {"error": str(error)})
+                return
+            except Exception as error:
+                self.respond(500, {"error": "{}: {}".format(
+                    type(error).__name__, error)})
+                return
+            
+            self.respond(200, {output: outputs.tolist()})
+        
+        def respond(self, status_code, content):
+            body = json.dumps(content).encode("utf-8")
+            self.send_response(status_code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def address_string(self):
+            # Clients on Unix sockets have no address
+            if isinstance(self.client_address, tuple):
+                return super().address_string()
+            else:
+                return "unix"
+        
+        def log_message(self, format, *arguments):
+            pass
+    
+    return RequestHandler
+
+def valuesFromRequest(request, request_directory = None):
+    
+    # Values are given either as dense rows, as the compressed sparse rows of
+    # a matrix, or as a path to a sparse matrix saved using
+    # `scipy.sparse.save_npz`, which has to be in the request directory
+    
+    if "values" in request:
+        values = numpy.array(request["values"], numpy.float32)
+    
+    elif "indptr" in request:
+        values = scipy.sparse.csr_matrix(
+            (request["data"], request["indices"], request["indptr"]),
+            shape = request["shape"],
+            dtype = numpy.float32
+        )
+    
+    elif "path" in request:
+        
+        if not request_directory:
+            raise ValueError("Requests with paths are not accepted.")
+        
+        request_directory = os.path.realpath(request_directory)
+        path = os.path.realpath(
+            os.path.join(request_directory, request["path"]))
+        
+        if os.path.commonpath([request_directory, path]) \
+            != request_directory:
+            raise ValueError(
+                "Path `{}` is not in the request directory.".format(
+                    request["path"]))
+        
+        if not os.path.isfile(path):
+            raise ValueError("Cannot find `{}`.".format(request["path"]))
+        
+        values = path
+    
+    else:
+        raise ValueError(
+            "Request should contain values, sparse values, or a path.")
+    
+    return values
+
+parser = argparse.ArgumentParser(
+    description='Serve trained scVAE models.',
+    parents = [main_parser],
+    # The help option is inherited from the parser of `main.py`
+    add_help = False,
+    formatter_class=argparse.ArgumentDefaultsHelpFormatter
+)
+parser.add_argument(
+    "--model-version",
+    type = str,
+    default = "end_of_training",
+    help = "version of the model to serve: end of training, best model, "
+        "or early stopping"
+)
+parser.add_argument(
+    "--host",
+    type = str,
+    default = "localhost",
+    help = "host name to serve on"
+)
+parser.add_argument(
+    "--port",
+    type = int,
+    default = 8000,
+    help = "port to serve on"
+)
+parser.add_argument(
+    "--unix-socket",
+    type = str,
+    default = None,
+    help = "path to Unix socket to serve on instead of host and port"
+)
+parser.add_argument(
+    "--maximum-waiting-time",
+    type = float,
+    default = 0.01,
+    help = "maximum time in seconds to wait for requests to fill a batch"
+)
+parser.add_argument(
+    "--request-directory",
+    type = str,
+    default = None,
+    help = "directory of sparse matrices that requests can refer to by path "
+        "(default: requests with paths are not accepted)"
+)
+
+if __name__ == '__main__':
+    arguments = parser.parse_args()
+    main(**vars(arguments))
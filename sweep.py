@@ -0,0 +1,675 @@
+#!/usr/bin/env python3
+
+# ======================================================================== #
+# 
+# Copyright (c) 2017 - 2018 scVAE authors
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#    http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# 
+# ======================================================================== #
+
+import data
+
+from main import (
+    setupModel, saveModelStatus,
+    parseDistribution, validateModelParameters,
+    addDataArguments, addTrainingArguments
+)
+
+from auxiliary import (
+    title, subtitle,
+    formatDuration,
+    checkRunID,
+    loadLearningCurves
+)
+
+import os
+import sys
+import argparse
+import itertools
+import multiprocessing
+import traceback
+
+from contextlib import redirect_stdout
+from time import time, strftime
+
+import warnings
+
+# TODO Remove when TensorFlow Probability library is updated to v0.6
+warnings.filterwarnings(action="ignore", category=DeprecationWarning)
+warnings.filterwarnings(action="ignore", category=FutureWarning)
+warnings.filterwarnings(action="ignore", category=PendingDeprecationWarning)
+
+SWEEP_TABLE_COLUMN_NAMES = [
+    "ID",
+    "model type",
+    "latent size",
+    "hidden sizes",
+    "likelihood",
+    "classes",
+    "completed",
+    "message",
+    "epochs trained",
+    "training duration",
+    "training ELBO",
+    "validation ELBO",
+    "validation ENRE",
+    "validation KL",
+    "log"
+]
+
+# Memory (in bytes) set aside for TensorFlow and Python in every worker
+BASE_MEMORY_PER_WORKER = 1024**3
+
+# Copies of each parameter kept during training: values, gradients, and the
+# two moment estimates of Adam
+NUMBER_OF_COPIES_PER_PARAMETER = 4
+
+# Copies of each activation kept during training: values, gradients, and
+# temporary tensors
+NUMBER_OF_COPIES_PER_ACTIVATION = 3
+
+# Upper bound on the number of parameters of reconstruction distributions
+MAXIMUM_NUMBER_OF_DISTRIBUTION_PARAMETERS = 3
+
+BYTES_PER_VALUE = 4
+
+def main(input_file_or_name, data_directory = "data",
+    log_directory = "log", results_directory = "results",
+    map_features = False, feature_selection = [], example_filter = [],
+    preprocessing_methods = [],
+    splitting_method = "default", splitting_fraction = 0.9,
+    model_types = ["VAE"], latent_sizes = [50], hidden_sizes = ["250,250"],
+    reconstruction_distributions = ["poisson"],
+    numbers_of_classes = [None],
+    number_of_importance_samples = [1],
+    number_of_monte_carlo_samples = [1],
+    number_of_reconstruction_classes = 0,
+    prior_probabilities_method = "uniform",
+    number_of_warm_up_epochs = 0, kl_weight = 1.0,
+    batch_normalisation = True, count_sum = False,
+    number_of_epochs = 200, batch_size = 100, learning_rate = 1e-4,
+    run_id = None, reset_training = False,
+    number_of_workers = None, memory_per_worker = None):
+    
+    # Setup
+    
+    if run_id:
+        run_id = checkRunID(run_id)
+    
+    ## Configurations
+    
+    configurations = sweepConfigurations(
+        model_types = model_types,
+        latent_sizes = latent_sizes,
+        hidden_sizes = hidden_sizes,
+        reconstruction_distributions = reconstruction_distributions,
+        numbers_of_classes = numbers_of_classes,
+        number_of_reconstruction_classes = number_of_reconstruction_classes
+    )
+    
+    if not configurations:
+        print("No valid model configurations to sweep over.")
+        return
+    
+    shared_model_parameters = {
+        "number_of_importance_samples": number_of_importance_samples,
+        "number_of_monte_carlo_samples": number_of_monte_carlo_samples,
+        "number_of_reconstruction_classes": number_of_reconstruction_classes,
+        "prior_probabilities_method": prior_probabilities_method,
+        "number_of_warm_up_epochs": number_of_warm_up_epochs,
+        "kl_weight": kl_weight,
+        "batch_normalisation": batch_normalisation,
+        "count_sum": count_sum
+    }
+    
+    training_parameters = {
+        "number_of_epochs": number_of_epochs,
+        "batch_size": batch_size,
+        "learning_rate": learning_rate,
+        "run_id": run_id,
+        "reset_training": reset_training
+    }
+    
+    # Data
+    
+    print(title("Data"))
+    
+    data_set = data.DataSet(
+        input_file_or_name,
+        directory = data_directory,
+        map_features = map_features,
+        feature_selection = feature_selection,
+        example_filter = example_filter,
+        preprocessing_methods = preprocessing_methods
+    )
+    
+    training_set, validation_set, test_set = data_set.split(
+        splitting_method, splitting_fraction)
+    
+    number_of_features = training_set.number_of_features
+    
+    log_directory = data.directory(log_directory, data_set,
+        splitting_method, splitting_fraction)
+    results_directory = data.directory(results_directory, data_set,
+        splitting_method, splitting_fraction)
+    
+    data_set.clear()
+    test_set.clear()
+    
+    ## Shared memory
+    
+    # Workers attach to the data sets in shared memory instead of
+    # receiving copies, so the copies in this process are not needed
+    training_set_handle = training_set.exportToSharedMemory()
+    validation_set_handle = validation_set.exportToSharedMemory()
+    
+    training_set.clear()
+    validation_set.clear()
+    
+    # Sweep
+    
+    print(title("Sweep"))
+    
+    sweep_id = strftime("%Y%m%d-%H%M%S")
+    sweep_directory = os.path.join(results_directory, "sweeps", sweep_id)
+    
+    if not os.path.exists(sweep_directory):
+        os.makedirs(sweep_directory)
+    
+    if memory_per_worker is None:
+        memory_per_worker = estimatedMemoryPerWorker(
+            configurations,
+            number_of_features = number_of_features,
+            batch_size = batch_size,
+            number_of_samples = max(number_of_importance_samples) \
+                * max(number_of_monte_carlo_samples)
+        )
+    else:
+        memory_per_worker = memory_per_worker * 1024**3
+    
+    number_of_workers = numberOfWorkers(
+        number_of_configurations = len(configurations),
+        number_of_workers = number_of_workers,
+        memory_per_worker = memory_per_worker
+    )
+    
+    # Cores are divided between workers to avoid oversubscription
+    number_of_threads_per_worker = max(
+        1, (os.cpu_count() or 1) // number_of_workers)
+    
+    print("Sweeping over {} model configurations using {} worker{}.".format(
+        len(configurations),
+        number_of_workers,
+        "s" if number_of_workers > 1 else ""
+    ))
+    print("Worker logs and results table are saved in {}.".format(
+        sweep_directory))
+    print()
+    
+    tasks = []
+    
+    for configuration_id, configuration in enumerate(configurations, 1):
+        task = {
+            "ID": configuration_id,
+            "configuration": configuration,
+            "shared model parameters": shared_model_parameters,
+            "training parameters": training_parameters,
+            "number of threads per worker": number_of_threads_per_worker,
+            "training set": training_set_handle,
+            "validation set": validation_set_handle,
+            "log directory": log_directory,
+            "results directory": results_directory,
+            "worker log path": os.path.join(
+                sweep_directory,
+                "configuration-{}.log".format(configuration_id)
+            )
+        }
+        tasks.append(task)
+    
+    sweep_time_start = time()
+    
+    results = []
+    
+    # Workers are spawned rather than forked, since TensorFlow is not
+    # safe to fork
+    context = multiprocessing.get_context("spawn")
+    
+    try:
+        
+        # Only one configuration per worker process, so that TensorFlow
+        # releases its memory between models
+        with context.Pool(processes = number_of_workers,
+            maxtasksperchild = 1) as pool:
+            
+            for result in pool.imap_unordered(trainConfiguration, tasks):
+                
+                results.append(result)
+                
+                print("Configuration {} ({}/{}): {}.".format(
+                    result["ID"],
+                    len(results),
+                    len(tasks),
+                    "completed" if result["completed"]
+                        else "failed ({})".format(result["message"])
+                ))
+    
+    finally:
+        training_set.releaseSharedMemory()
+        validation_set.releaseSharedMemory()
+    
+    sweep_duration = time() - sweep_time_start
+    print()
+    print("Sweep finished ({}).".format(formatDuration(sweep_duration)))
+    print()
+    
+    # Results
+    
+    print(subtitle("Results"))
+    
+    results.sort(key = lambda result: result["ID"])
+    
+    results_table = formatResultsTable(results)
+    print(results_table)
+    print()
+    
+    results_table_path = os.path.join(sweep_directory, "results.tsv")
+    
+    with open(results_table_path, "w") as results_table_file:
+        results_table_file.write(
+            formatResultsTable(results, separator = "\t", aligned = False))
+    
+    print("Results table saved to {}.".format(results_table_path))
+    
+    return results
+
+def sweepConfigurations(model_types, latent_sizes, hidden_sizes,
+    reconstruction_distributions, numbers_of_classes,
+    number_of_reconstruction_classes = 0):
+    
+    configurations = []
+    configuration_keys = set()
+    
+    for model_type, latent_size, hidden_sizes_string, \
+        reconstruction_distribution, number_of_classes \
+        in itertools.product(model_types, latent_sizes, hidden_sizes,
+            reconstruction_distributions, numbers_of_classes):
+        
+        reconstruction_distribution = parseDistribution(
+            reconstruction_distribution)
+        
+        if model_type == "GMVAE":
+            latent_distribution = "gaussian mixture"
+        else:
+            latent_distribution = "gaussian"
+        
+        model_valid, model_errors = validateModelParameters(
+            model_type, latent_distribution,
+            reconstruction_distribution, number_of_reconstruction_classes,
+            parameterise_latent_posterior = False
+        )
+        
+        if not model_valid:
+            print("Skipping invalid model configuration:")
+            for model_error in model_errors:
+                print("    ", model_error)
+            print()
+            continue
+        
+        configuration = {
+            "model_type": model_type,
+            "latent_size": latent_size,
+            "hidden_sizes": parseHiddenSizes(hidden_sizes_string),
+            "latent_distribution": latent_distribution,
+            "reconstruction_distribution": reconstruction_distribution,
+            "number_of_classes": number_of_classes
+        }
+        
+        # Repeated values would otherwise give several tasks training the
+        # same model in the same directory at the same time
+        configuration_key = tuple(
+            tuple(value) if isinstance(value, list) else value
+            for value in configuration.values()
+        )
+        
+        if configuration_key in configuration_keys:
+            continue
+        
+        configuration_keys.add(configuration_key)
+        configurations.append(configuration)
+    
+    return configurations
+
+def parseHiddenSizes(hidden_sizes_string):
+    
+    if isinstance(hidden_sizes_string, (list, tuple)):
+        return list(hidden_sizes_string)
+    
+    hidden_sizes_string = str(hidden_sizes_string)
+    
+    try:
+        hidden_sizes = [
+            int(hidden_size)
+            for hidden_size in hidden_sizes_string.split(",")
+        ]
+    except ValueError:
+        raise ValueError(
+            "Hidden sizes `{}` should be integers separated by commas."
+                .format(hidden_sizes_string)
+        )
+    
+    return hidden_sizes
+
+def numberOfWorkers(number_of_configurations,
+    number_of_workers = None, memory_per_worker = None):
+    
+    number_of_cores = os.cpu_count() or 1
+    
+    if number_of_workers is None:
+        number_of_workers = number_of_cores
+    
+    # Memory limit (data sets are shared, so they are not counted per worker)
+    
+    available_memory = availableMemory()
+    
+    if available_memory is not None and memory_per_worker:
+        number_of_workers = min(
+            number_of_workers,
+            max(1, available_memory // memory_per_worker)
+        )
+    
+    return int(max(1, min(
+        number_of_workers,
+        number_of_cores,
+        number_of_configurations
+    )))
+
+def estimatedMemoryPerWorker(configurations, number_of_features,
+    batch_size = 100, number_of_samples = 1):
+    
+    # Memory (in bytes) needed to train the largest model, estimated from
+    # its parameters and the activations of a batch
+    
+    memory_per_worker = 0
+    
+    for configuration in configurations:
+        
+        hidden_sizes = configuration["hidden_sizes"]
+        latent_size = configuration["latent_size"]
+        
+        # Each cluster of Gaussian-mixture models is passed the batch
+        number_of_clusters = configuration["number_of_classes"] or 1
+        
+        encoder_sizes = [number_of_features] + hidden_sizes \
+            + [2 * latent_size]
+        decoder_sizes = [latent_size] + hidden_sizes[::-1] \
+            + [MAXIMUM_NUMBER_OF_DISTRIBUTION_PARAMETERS * number_of_features]
+        
+        number_of_parameters = 0
+        number_of_activations = 0
+        
+        for layer_sizes in [encoder_sizes, decoder_sizes]:
+            number_of_parameters += sum(
+                (input_size + 1) * output_size
+                for input_size, output_size
+                in zip(layer_sizes[:-1], layer_sizes[1:])
+            )
+            number_of_activations += sum(layer_sizes)
+        
+        number_of_activations *= batch_size * number_of_samples \
+            * number_of_clusters
+        
+        memory = BASE_MEMORY_PER_WORKER + BYTES_PER_VALUE * (
+            NUMBER_OF_COPIES_PER_PARAMETER * number_of_parameters
+            + NUMBER_OF_COPIES_PER_ACTIVATION * number_of_activations
+        )
+        
+        memory_per_worker = max(memory_per_worker, memory)
+    
+    return memory_per_worker
+
+def availableMemory():
+    
+    # Available memory includes reclaimable page cache, which free pages
+    # alone do not
+    try:
+        with open("/proc/meminfo", "r") as meminfo_file:
+            for line in meminfo_file:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_AVPHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+def trainConfiguration(task):
+    
+    configuration = task["configuration"]
+    training_parameters = task["training parameters"]
+    
+    result = {
+        "ID": task["ID"],
+        "model type": configuration["model_type"],
+        "latent size": configuration["latent_size"],
+        "hidden sizes": "×".join(map(str, configuration["hidden_sizes"])),
+        "likelihood": configuration["reconstruction_distribution"],
+        "classes": configuration["number_of_classes"],
+        "completed": False,
+        "message": None,
+        "log": task["worker log path"]
+    }
+    
+    training_set = data.attachSharedDataSet(task["training set"])
+    validation_set = data.attachSharedDataSet(task["validation set"])
+    
+    with open(task["worker log path"], "w") as worker_log_file, \
+        redirect_stdout(worker_log_file):
+        
+        try:
+            
+            model, number_of_classes = setupModel(
+                training_set = training_set,
+                model_type = configuration["model_type"],
+                latent_size = configuration["latent_size"],
+                hidden_sizes = configuration["hidden_sizes"],
+                inference_architecture = "MLP",
+                latent_distribution = configuration["latent_distribution"],
+                number_of_classes = configuration["number_of_classes"],
+                parameterise_latent_posterior = False,
+                generative_architecture = "MLP",
+                reconstruction_distribution = \
+                    configuration["reconstruction_distribution"],
+                proportion_of_free_KL_nats = 0.0,
+                clf_weight = 1.0,
+                number_of_labeled_examples = 0,
+                dropout_keep_probabilities = [],
+                number_of_intra_op_threads = \
+                    task["number of threads per worker"],
+                log_directory = task["log directory"],
+                results_directory = task["results directory"],
+                **task["shared model parameters"]
+            )
+            
+            result["classes"] = number_of_classes
+            
+            print(model.description)
+            print()
+            
+            print(model.parameters)
+            print()
+            
+            status, run_id = model.train(
+                training_set,
+                validation_set,
+                number_of_epochs = training_parameters["number_of_epochs"],
+                batch_size = training_parameters["batch_size"],
+                learning_rate = training_parameters["learning_rate"],
+                run_id = training_parameters["run_id"],
+                reset_training = training_parameters["reset_training"]
+            )
+            
+            result["completed"] = status["completed"]
+            result["message"] = status["message"]
+            result["epochs trained"] = status["epochs trained"]
+            result["training duration"] = status["training duration"]
+            
+            if status["completed"]:
+                saveModelStatus(status, model, run_id)
+                result.update(finalLosses(model, run_id))
+        
+        except Exception as exception:
+            traceback.print_exc()
+            result["completed"] = False
+            result["message"] = "{}: {}".format(
+                type(exception).__name__, exception)
+        
+        sys.stdout.flush()
+    
+    training_set.releaseSharedMemory()
+    validation_set.releaseSharedMemory()
+    
+    return result
+
+def finalLosses(model, run_id = None):
+    
+    losses = {}
+    
+    learning_curves = loadLearningCurves(
+        model,
+        data_set_kinds = ["training", "validation"],
+        run_id = run_id
+    )
+    
+    loss_names = {
+        "ELBO": "lower_bound",
+        "ENRE": "reconstruction_error",
+        "KL": "kl_divergence"
+    }
+    
+    if model.type == "GMVAE":
+        loss_names["KL"] = "kl_divergence_z"
+    
+    for data_set_kind in ["training", "validation"]:
+        
+        learning_curve_set = learning_curves.get(data_set_kind, {})
+        
+        for loss_name, loss in loss_names.items():
+            learning_curve = learning_curve_set.get(loss)
+            if learning_curve is not None and len(learning_curve) > 0:
+                losses["{} {}".format(data_set_kind, loss_name)] = \
+                    learning_curve[-1]
+    
+    return losses
+
+def formatResultsTable(results, separator = "  ", aligned = True):
+    
+    rows = [SWEEP_TABLE_COLUMN_NAMES]
+    
+    for result in results:
+        row = []
+        for column_name in SWEEP_TABLE_COLUMN_NAMES:
+            value = result.get(column_name)
+            if value is None:
+                value = ""
+            elif isinstance(value, float):
+                value = "{:.4g}".format(value)
+            else:
+                value = str(value)
+            row.append(value)
+        rows.append(row)
+    
+    if aligned:
+        
+        # The worker log is left out of the printed table
+        rows = [row[:-1] for row in rows]
+        
+        column_widths = [
+            max(len(row[i]) for row in rows)
+            for i in range(len(rows[0]))
+        ]
+        rows = [
+            [value.ljust(width) for value, width in zip(row, column_widths)]
+            for row in rows
+        ]
+    
+    table = "\n".join(separator.join(row).rstrip() for row in rows)
+    
+    if not aligned:
+        table += "\n"
+    
+    return table
+
+parser = argparse.ArgumentParser(
+    description='Train several model configurations in parallel '
+        'on a data set loaded and split once.',
+    formatter_class=argparse.ArgumentDefaultsHelpFormatter
+)
+
+addDataArguments(parser)
+parser.add_argument(
+    "--model-types", "-m",
+    type = str,
+    nargs = "+",
+    default = ["VAE"],
+    help = "types of model to sweep over"
+)
+parser.add_argument(
+    "--latent-sizes", "-l",
+    type = int,
+    nargs = "+",
+    default = [50],
+    help = "sizes of latent space to sweep over"
+)
+parser.add_argument(
+    "--hidden-sizes", "-H",
+    type = str,
+    nargs = "+",
+    default = ["250,250"],
+    help = "sizes of hidden layers to sweep over, each given as sizes separated by commas (for example, `500 250,250`)"
+)
+parser.add_argument(
+    "--reconstruction-distributions", "-r",
+    type = str,
+    nargs = "+",
+    default = ["poisson"],
+    help = "distributions for the reconstructions to sweep over"
+)
+parser.add_argument(
+    "--numbers-of-classes", "-K",
+    type = int,
+    nargs = "+",
+    default = [None],
+    help = "numbers of proposed clusters in data set to sweep over"
+)
+addTrainingArguments(parser)
+parser.add_argument(
+    "--number-of-workers", "-W",
+    type = int,
+    nargs = "?",
+    default = None,
+    help = "maximum number of models trained in parallel (default: number of cores, limited by available memory)"
+)
+parser.add_argument(
+    "--memory-per-worker",
+    type = float,
+    nargs = "?",
+    default = None,
+    help = "memory in GB reserved for each worker when limiting the number of workers (default: estimated from the numbers of features, hidden units, and samples and the batch size)"
+)
+
+if __name__ == '__main__':
+    arguments = parser.parse_args()
+    main(**vars(arguments))